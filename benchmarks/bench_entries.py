@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Listing entries parsed per second, for each kind of entry.
+
+Parses synthetic 1000-key pages from memory, so only CPU time is measured::
+
+    $ python benchmarks/bench_entries.py -p 50
+"""
+
+import os
+import sys
+import time
+import datetime
+import optparse
+from cStringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Listing
+from simples3.utils import iso8601_fmt
+from bench_listing import make_page
+
+class FindTextListing(S3Listing):
+    """How entries used to be made: findtext per field, strptime per date."""
+
+    def _el2fields(self, el):
+        get = lambda tag: el.findtext(self._mktag(tag))
+        return (get("Key"), get("LastModified"), get("ETag"),
+                int(get("Size")))
+
+    @staticmethod
+    def make_item(key, timestamp, etag, size):
+        modify = datetime.datetime.strptime(timestamp, iso8601_fmt)
+        return (key, modify, etag, size)
+
+variants = [("findtext", FindTextListing, {}),
+            ("tuples", S3Listing, {}),
+            ("lazy", S3Listing, {"lazy": True}),
+            ("key,size", S3Listing, {"fields": ("key", "size")})]
+
+def bench(cls, kwds, page, n_pages):
+    n = 0
+    t0 = time.time()
+    for i in xrange(n_pages):
+        for item in cls.parse(StringIO(page), **kwds):
+            n += 1
+    return n / (time.time() - t0)
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-p", "--pages", type="int", default=50)
+    parser.add_option("-r", "--rounds", type="int", default=3)
+    opts, args = parser.parse_args()
+    page = make_page(1000)
+    for name, cls, kwds in variants:
+        rate = max(bench(cls, kwds, page, opts.pages)
+                   for i in xrange(opts.rounds))
+        print "%-10s %9.0f keys/s" % (name, rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Time taken to import simples3, in fresh interpreters.
+
+Each scenario runs in a new process, so nothing is imported beforehand but
+what the interpreter itself loads; the best of a few runs is kept, less the
+time the interpreter takes to do nothing:
+
+import
+    ``import simples3``
+make_url_authed
+    importing, then making one authenticated URL
+request
+    importing, then building the transport a first request would use
+
+Importing simples3 must not load any of `heavy_modules`, and with
+``--budget``, must take no more than that many milliseconds; if either fails,
+the exit status is 1::
+
+    $ python benchmarks/bench_import.py --budget 15
+"""
+
+import os
+import sys
+import optparse
+import subprocess
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Loaded by sending requests, and by nothing before that.
+heavy_modules = ("urllib2", "httplib", "socket", "email", "cgi", "mimetypes",
+                 "xml.etree.cElementTree", "simples3.connpool")
+
+setup = """\
+import sys, time
+before = set(sys.modules)
+t0 = time.time()
+"""
+report = """\
+dt = time.time() - t0
+loaded = sorted(m for m in set(sys.modules) - before if sys.modules[m])
+print "%r %s" % (dt, " ".join(loaded))
+"""
+
+scenarios = [
+    ("nothing", ""),
+    ("import", "import simples3\n"),
+    ("make_url_authed",
+     "import simples3\n"
+     "simples3.S3Bucket('johnsmith', access_key='a', secret_key='s')"
+     ".make_url_authed('photos/puppy.jpg')\n"),
+    ("request",
+     "import simples3\n"
+     "simples3.S3Bucket('johnsmith', access_key='a', secret_key='s')"
+     ".transport\n"),
+]
+
+def run(code):
+    """Run *code* in a new interpreter, returning (seconds, modules loaded)."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    out = subprocess.check_output([sys.executable, "-c", setup + code + report],
+                                  cwd=root, env=env)
+    dt, _, loaded = out.strip().partition(" ")
+    return float(dt), loaded.split()
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-r", "--rounds", type="int", default=10)
+    parser.add_option("-b", "--budget", type="float", default=None,
+                      help="milliseconds ``import simples3`` may take")
+    opts, args = parser.parse_args()
+    # Write bytecode first, or the first rounds would measure compiling.
+    run(scenarios[-1][1])
+    results = {}
+    for name, code in scenarios:
+        best = min(run(code)[0] for i in xrange(opts.rounds))
+        results[name] = best, run(code)[1]
+    base = results.pop("nothing")[0]
+    failed = False
+    for name, code in scenarios[1:]:
+        dt, loaded = results[name]
+        print "%-16s %7.1f ms %4d modules" % (name, (dt - base) * 1000,
+                                              len(loaded))
+    dt, loaded = results["import"]
+    heavy = [m for m in heavy_modules if m in loaded]
+    if heavy:
+        print "import simples3 loads %s" % (", ".join(heavy),)
+        failed = True
+    if opts.budget is not None and (dt - base) * 1000 > opts.budget:
+        print "import simples3 is over budget of %.1f ms" % (opts.budget,)
+        failed = True
+    sys.exit(int(failed))
+
+if __name__ == "__main__":
+    main()
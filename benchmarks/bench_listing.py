@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Parse a synthetic 1000-key ListBucketResult page.
+
+The page is fed through a pipe throttled to a given bandwidth to mimic a
+download in progress, which is what makes time-to-first-key interesting::
+
+    $ python benchmarks/bench_listing.py
+"""
+
+import os
+import sys
+import time
+import optparse
+import threading
+from xml.etree import cElementTree as ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Listing
+
+entry = """<Contents><Key>some/prefix/key-%08d.dat</Key>
+<LastModified>2009-10-12T17:50:30.000Z</LastModified>
+<ETag>&quot;fba9dede5f27731c9771645a39863328&quot;</ETag>
+<Size>%d</Size><StorageClass>STANDARD</StorageClass>
+<Owner><ID>0123456789abcdef0123456789abcdef</ID>
+<DisplayName>johndoe</DisplayName></Owner></Contents>
+"""
+
+def make_page(n_keys):
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/'
+             '2006-03-01/"><Name>bucket</Name><Prefix></Prefix>'
+             '<Marker></Marker><MaxKeys>1000</MaxKeys>'
+             '<IsTruncated>false</IsTruncated>']
+    parts.extend(entry % (i, i) for i in xrange(n_keys))
+    parts.append("</ListBucketResult>")
+    return "".join(parts)
+
+def slow_reader(data, rate, chunk_size=16384):
+    """Get a pipe fed with *data* at *rate* bytes per second by a thread."""
+    rfd, wfd = os.pipe()
+    def feed():
+        for i in xrange(0, len(data), chunk_size):
+            chunk = data[i:i + chunk_size]
+            if rate:
+                time.sleep(len(chunk) / rate)
+            os.write(wfd, chunk)
+        os.close(wfd)
+    t = threading.Thread(target=feed)
+    t.daemon = True
+    t.start()
+    return os.fdopen(rfd, "rb")
+
+def parse_tree(fp):
+    """How S3Listing used to do it: build the tree, then walk it."""
+    root = ElementTree.parse(fp).getroot()
+    listing = S3Listing.__new__(S3Listing)
+    for el in root.findall(listing._mktag("Contents")):
+        yield listing._el2item(el)[0]
+
+def parse_incremental(fp):
+    for item in S3Listing.parse(fp):
+        yield item[0]
+
+def bench(fun, page, rate, rounds):
+    first = total = 0.0
+    for i in xrange(rounds):
+        t0 = time.time()
+        it = fun(slow_reader(page, rate))
+        next(it)
+        first += time.time() - t0
+        for key in it:
+            pass
+        total += time.time() - t0
+    return first / rounds, total / rounds
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-k", "--keys", type="int", default=1000)
+    parser.add_option("-r", "--rounds", type="int", default=20)
+    parser.add_option("-b", "--bandwidth", type="float", default=10.0,
+                      help="simulated download speed in MB/s, 0 for none")
+    opts, args = parser.parse_args()
+    page = make_page(opts.keys)
+    print "page of %d keys, %d bytes" % (opts.keys, len(page))
+    for name, fun in (("tree", parse_tree),
+                      ("incremental", parse_incremental)):
+        first, total = bench(fun, page, opts.bandwidth * 1e6, opts.rounds)
+        print "%-12s first key %7.2f ms, all keys %7.2f ms" % (
+            name, first * 1e3, total * 1e3)
+
+if __name__ == "__main__":
+    main()
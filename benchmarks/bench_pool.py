@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Small-object GET throughput with and without connection pooling.
+
+Both runs use the same `HTTPTransport`; without pooling, its pool keeps no
+idle connections, so every request connects anew. They run against the
+in-process stand-in (see `s3standin`), so what is measured is mostly
+connection setup and request overhead::
+
+    $ python benchmarks/bench_pool.py -n 2000
+"""
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Bucket
+from simples3.connpool import ConnectionPool
+from simples3.transport import HTTPTransport
+
+import s3standin
+
+body = "x" * 512
+
+def run(bucket, n):
+    t0 = time.time()
+    for i in xrange(n):
+        fp = bucket.get("key%d" % (i % 100))
+        fp.read()
+        fp.close()
+    return n / (time.time() - t0)
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", type="int", default=1000, help="requests per run")
+    opts, args = parser.parse_args()
+
+    server = s3standin.start()
+    for i in xrange(100):
+        server.objects["key%d" % i] = s3standin.StoredObject(body)
+
+    for name, pool in (("unpooled", ConnectionPool(maxsize=0)),
+                       ("pooled", ConnectionPool())):
+        bucket = S3Bucket("bench", access_key="AKID", secret_key="secret",
+                          base_url=server.url, transport=HTTPTransport(pool))
+        print "%-16s %8.1f req/s" % (name, run(bucket, opts.n))
+        bucket.transport.close()
+    server.shutdown()
+    server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Authenticated URLs made per second, one at a time and in batches.
+
+Makes URLs for pages of keys, like a page embedding that many links would:
+with `make_url_authed` per key, with `make_urls_authed` per page, and with a
+`Presigner` caching URLs, which after the first page costs a lookup::
+
+    $ python benchmarks/bench_presign.py -k 200
+"""
+
+import os
+import sys
+import time
+import datetime
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Bucket
+
+bucket = S3Bucket("johnsmith", access_key="0PN5J17HBGZHT7JJ3X82",
+                  secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+                  base_url="http://johnsmith.s3.amazonaws.com")
+expire = datetime.timedelta(hours=1)
+
+def one_at_a_time(keys):
+    return [bucket.make_url_authed(key, expire=expire) for key in keys]
+
+def batch(keys):
+    return bucket.make_urls_authed(keys, expire=expire, granularity=600)
+
+presigner = bucket.presigner(expire=expire, granularity=600,
+                             cache_size=100000)
+
+def cached(keys):
+    return presigner.urls(keys)
+
+variants = [("make_url_authed", one_at_a_time),
+            ("make_urls_authed", batch),
+            ("cached", cached)]
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-k", "--keys", type="int", default=200,
+                      help="keys per page")
+    parser.add_option("-p", "--pages", type="int", default=100)
+    parser.add_option("-r", "--rounds", type="int", default=3)
+    opts, args = parser.parse_args()
+    keys = ["photos/%d/puppy %d.jpg" % (i % 10, i)
+            for i in xrange(opts.keys)]
+    for name, fun in variants:
+        best = None
+        for i in xrange(opts.rounds):
+            t0 = time.time()
+            for j in xrange(opts.pages):
+                fun(keys)
+            dt = time.time() - t0
+            best = dt if best is None else min(best, dt)
+        print "%-17s %10.0f URLs/s" % (name, opts.keys * opts.pages / best)
+
+if __name__ == "__main__":
+    main()
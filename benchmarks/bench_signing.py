@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Per-request CPU cost of signing and URL building.
+
+Prints operations per second for each of the benchmarks; give benchmark
+names as arguments to only run some of them::
+
+    $ python benchmarks/bench_signing.py sign make_url_authed
+"""
+
+import os
+import sys
+import timeit
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Bucket
+
+bucket = S3Bucket("johnsmith", access_key="0PN5J17HBGZHT7JJ3X82",
+                  secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+                  base_url="http://johnsmith.s3.amazonaws.com")
+headers = {"Content-Type": "image/jpeg", "X-AMZ-Meta-Owner": "john",
+           "X-AMZ-ACL": "public-read", "Content-MD5": "lS0sVtBIWVgzZ0e83ZhZDQ=="}
+
+def bench_sign():
+    bucket.request(method="PUT", key="photos/puppy.jpg",
+                   headers=headers).sign(bucket)
+
+def bench_url():
+    bucket.request(key="photos/puppy dog.jpg").url(bucket.base_url)
+
+def bench_make_url_authed():
+    bucket.make_url_authed("photos/puppy.jpg", expire=1175139620)
+
+benchmarks = [(name[6:], fun) for (name, fun) in sorted(globals().items())
+              if name.startswith("bench_")]
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] [benchmark ...]")
+    parser.add_option("-n", type="int", default=20000, help="calls per round")
+    parser.add_option("-r", "--rounds", type="int", default=3)
+    opts, names = parser.parse_args()
+    for name, fun in benchmarks:
+        if names and name not in names:
+            continue
+        best = min(timeit.repeat(fun, number=opts.n, repeat=opts.rounds))
+        print "%-16s %10.0f ops/s" % (name, opts.n / best)
+
+if __name__ == "__main__":
+    main()
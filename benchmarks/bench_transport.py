@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Time per request with each transport, against a local S3 stand-in.
+
+Small objects are put, got and headed one request at a time over keep-alive
+connections, so that the time per request is mostly simples3 itself; the
+server is the same for both transports, and the difference between them is
+what going through urllib2 costs::
+
+    $ python benchmarks/bench_transport.py -n 2000
+"""
+
+import os
+import sys
+import time
+import optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Bucket
+from simples3.transport import HTTPTransport
+from simples3.opener import Urllib2Transport
+import s3standin
+
+transports = [("http", HTTPTransport), ("urllib2", Urllib2Transport)]
+
+def put(bucket, keys, data):
+    for key in keys:
+        bucket.put(key, data)
+
+def get(bucket, keys, data):
+    for key in keys:
+        fp = bucket.get(key)
+        fp.read()
+        fp.close()
+
+def head(bucket, keys, data):
+    for key in keys:
+        bucket.info(key)
+
+operations = [("put", put), ("get", get), ("head", head)]
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--ops", type="int", default=2000,
+                      help="requests per operation")
+    parser.add_option("-s", "--size", type="int", default=1024,
+                      help="object size in bytes")
+    parser.add_option("-r", "--rounds", type="int", default=3)
+    opts, args = parser.parse_args()
+    keys = ["small/%06d" % i for i in xrange(opts.ops)]
+    data = "x" * opts.size
+    print "%-6s %s" % ("", "".join("%12s" % name for name, cls in transports))
+    for op_name, op in operations:
+        row = []
+        for name, transport_cls in transports:
+            best = None
+            for i in xrange(opts.rounds):
+                server = s3standin.start()
+                bucket = S3Bucket("bench", access_key="key",
+                                  secret_key="secret", base_url=server.url,
+                                  transport=transport_cls())
+                try:
+                    if op is not put:
+                        put(bucket, keys, data)
+                    t0 = time.time()
+                    op(bucket, keys, data)
+                    dt = time.time() - t0
+                finally:
+                    bucket.transport.close()
+                    server.shutdown()
+                    server.server_close()
+                best = dt if best is None else min(best, dt)
+            row.append(best / opts.ops * 1e6)
+        print "%-6s %s" % (op_name, "".join("%9.0f us" % v for v in row))
+
+if __name__ == "__main__":
+    main()
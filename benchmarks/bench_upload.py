@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Wall time and bytes copied for uploading a large file.
+
+Uploads a file to a server on localhost that reads and discards request
+bodies, first from a file object, then from a string read from the file, and
+last with `S3Bucket.put_buffer`, which hashes and sends from a memory mapping.
+"Copied" counts the bytes read from the file into Python strings::
+
+    $ python benchmarks/bench_upload.py -s 1024
+"""
+
+import os
+import sys
+import time
+import socket
+import optparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from simples3.bucket import S3Bucket
+
+reply = 'HTTP/1.1 200 OK\r\nETag: "x"\r\nContent-Length: 0\r\n\r\n'
+
+def sink(conn):
+    """Read requests off *conn*, throwing their bodies away."""
+    buf = bytearray(1 << 20)
+    fp = conn.makefile("rb", 0)
+    while True:
+        length = 0
+        while True:
+            line = fp.readline()
+            if not line:
+                return
+            elif line in ("\r\n", "\n"):
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        while length:
+            n = conn.recv_into(buf, min(length, len(buf)))
+            if not n:
+                return
+            length -= n
+        conn.sendall(reply)
+
+def serve(sock):
+    while True:
+        conn, addr = sock.accept()
+        t = threading.Thread(target=sink, args=(conn,))
+        t.daemon = True
+        t.start()
+
+class CountingFile(object):
+    """File wrapper counting the bytes read through it."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, *a):
+        data = self.fp.read(*a)
+        self.count += len(data)
+        return data
+
+    def seek(self, *a): return self.fp.seek(*a)
+    def tell(self): return self.fp.tell()
+
+def put_file(bucket, path):
+    with open(path, "rb") as fp:
+        fp = CountingFile(fp)
+        bucket.put("big", data=fp, headers={
+            "Content-Length": str(os.path.getsize(path))})
+        return fp.count
+
+def put_string(bucket, path):
+    with open(path, "rb") as fp:
+        fp = CountingFile(fp)
+        bucket.put("big", data=fp.read())
+        return fp.count
+
+def put_buffer(bucket, path):
+    bucket.put_buffer("big", path)
+    return 0
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-s", "--size", type="int", default=1024,
+                      help="file size in MiB")
+    opts, args = parser.parse_args()
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(5)
+    t = threading.Thread(target=serve, args=(sock,))
+    t.daemon = True
+    t.start()
+    bucket = S3Bucket("bench", access_key="key", secret_key="secret",
+                      base_url="http://127.0.0.1:%d" % sock.getsockname()[1])
+    # Compare single requests; multipart would split all three alike.
+    bucket.multipart_threshold = 1 << 62
+
+    fd, path = tempfile.mkstemp()
+    try:
+        block = os.urandom(1 << 20)
+        with os.fdopen(fd, "wb") as fp:
+            for i in xrange(opts.size):
+                fp.write(block)
+        size = opts.size << 20
+        for name, fun in [("file object", put_file), ("string", put_string),
+                          ("put_buffer", put_buffer)]:
+            t0 = time.time()
+            copied = fun(bucket, path)
+            dt = time.time() - t0
+            print "%-12s %7.2f s %8.1f MiB/s  copied %6.1f MiB (%.1fx size)" % (
+                name, dt, size / dt / (1 << 20), copied / float(1 << 20),
+                copied / float(size))
+    finally:
+        os.unlink(path)
+
+if __name__ == "__main__":
+    main()
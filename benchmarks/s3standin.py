@@ -0,0 +1,348 @@
+"""An in-process stand-in for S3, for benchmarking and testing
+
+Serves a single bucket kept in memory at ``http://127.0.0.1:<port>``, with
+keep-alive connections and enough of the S3 REST API for simples3: object
+PUT, GET (with ranges and conditions), HEAD, DELETE and copy (with
+conditions), multi-object delete, paged listing with prefixes, markers and
+delimiters, and multipart uploads. Signatures are not checked::
+
+    >>> server = start()
+    >>> bucket = S3Bucket("bench", access_key="key", secret_key="secret",
+    ...                   base_url=server.url)
+    >>> server.objects["foo"] = StoredObject("bar")
+
+The server keeps the addresses of its clients in *peers*, and if *requests*
+is set to a list, it logs (method, path, headers) for each request there.
+Failures are made by setting a function in *faults* for a key, which is
+called with the handler to reply in place of the request to that key::
+
+    >>> server.faults["foo"] = lambda h: h.error(503, "SlowDown", "Slow down")
+"""
+
+import time
+import bisect
+import random
+import socket
+import itertools
+import hashlib
+import urllib
+import threading
+import BaseHTTPServer
+from SocketServer import ThreadingMixIn
+from xml.etree import cElementTree as ElementTree
+from cgi import escape
+from urlparse import parse_qs
+
+ns = "http://s3.amazonaws.com/doc/2006-03-01/"
+xml_head = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+class StoredObject(object):
+    __slots__ = ("data", "etag", "modified", "headers")
+
+    def __init__(self, data, headers=None, etag=None):
+        self.data = data
+        self.etag = etag or '"%s"' % hashlib.md5(data).hexdigest()
+        self.modified = time.time()
+        self.headers = headers or {"content-type": "application/octet-stream"}
+
+    def timestamp(self):
+        return time.strftime("%Y-%m-%dT%H:%M:%S.000Z",
+                             time.gmtime(self.modified))
+
+    def http_date(self):
+        return time.strftime("%a, %d %b %Y %H:%M:%S GMT",
+                             time.gmtime(self.modified))
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # Replies bigger than the write buffer go out in several writes, and
+        # Nagle's algorithm would hold back the last one for a delayed ACK.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *a):
+        pass
+
+    def handle_one_request(self):
+        self.server.peers.add(self.client_address)
+        BaseHTTPServer.BaseHTTPRequestHandler.handle_one_request(self)
+
+    def parse_request(self):
+        if not BaseHTTPServer.BaseHTTPRequestHandler.parse_request(self):
+            return False
+        path, _, query = self.path.partition("?")
+        self.key = urllib.unquote(path[1:])
+        self.args = dict((k, v[0]) for (k, v)
+                         in parse_qs(query, keep_blank_values=True).items())
+        length = int(self.headers.get("content-length") or 0)
+        self.body = self.rfile.read(length) if length else ""
+        if self.server.requests is not None:
+            self.server.requests.append((self.command, self.path,
+                                         dict(self.headers)))
+        fault = self.server.faults.get(self.key)
+        if fault is not None:
+            fault(self)
+            self.wfile.flush()
+            return False
+        return True
+
+    def reply(self, status, body="", headers={}, send_body=True):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def error(self, status, code, message):
+        self.reply(status, "%s<Error><Code>%s</Code><Message>%s</Message>"
+                           "</Error>" % (xml_head, code, message),
+                   {"Content-Type": "application/xml"},
+                   send_body=self.command != "HEAD")
+
+    def failed_condition(self):
+        self.error(412, "PreconditionFailed", "At least one of the "
+                   "preconditions you specified did not hold.")
+
+    def truncated_error(self, status, code, message):
+        """Reply with an error whose body is cut short by closing the
+        connection.
+        """
+        body = "%s<Error><Code>%s</Code><Message>%s</Message></Error>" % (
+            xml_head, code, message)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:len(body) // 2])
+        self.close_connection = 1
+
+    def check_conditions(self, obj, prefix=""):
+        """Whether the If-* headers starting with *prefix* hold for *obj*."""
+        etag = obj.etag if obj is not None else None
+        if_match = self.headers.get(prefix + "if-match")
+        if if_match and if_match not in (etag, "*" if etag else None):
+            return False
+        if_none_match = self.headers.get(prefix + "if-none-match")
+        if if_none_match and if_none_match in (etag, "*" if etag else None):
+            return False
+        return True
+
+    def do_GET(self):
+        objects = self.server.objects
+        if not self.key:
+            return self.list_objects(objects)
+        obj = objects.get(self.key)
+        if obj is None:
+            return self.error(404, "NoSuchKey",
+                              "The specified key does not exist.")
+        if_match = self.headers.get("if-match")
+        if if_match and if_match != obj.etag:
+            return self.failed_condition()
+        if self.headers.get("if-none-match") == obj.etag:
+            return self.reply(304, headers={"ETag": obj.etag})
+        headers = dict(obj.headers)
+        headers.update({"ETag": obj.etag, "Last-Modified": obj.http_date()})
+        data, status = obj.data, 200
+        rng = self.headers.get("range")
+        if rng and rng.startswith("bytes="):
+            first, _, last = rng[6:].partition("-")
+            first = int(first)
+            last = min(int(last) if last else len(data) - 1, len(data) - 1)
+            data, status = data[first:last + 1], 206
+            headers["Content-Range"] = "bytes %d-%d/%d" % (first, last,
+                                                           len(obj.data))
+        self.reply(status, data, headers, send_body=self.command != "HEAD")
+
+    do_HEAD = do_GET
+
+    def do_PUT(self):
+        objects = self.server.objects
+        if "uploadId" in self.args:
+            upload = self.server.uploads.get(self.args["uploadId"])
+            if upload is None:
+                return self.error(404, "NoSuchUpload", "No such upload.")
+            part = StoredObject(self.body)
+            upload[int(self.args["partNumber"])] = part
+            return self.reply(200, headers={"ETag": part.etag})
+        headers = dict((k.lower(), v) for (k, v) in self.headers.items()
+                       if k.lower() in ("content-type", "content-encoding")
+                       or k.lower().startswith("x-amz-meta-"))
+        source = self.headers.get("x-amz-copy-source")
+        if source is not None:
+            src_key = urllib.unquote(source.lstrip("/").partition("/")[2])
+            src = objects.get(src_key)
+            if src is None:
+                return self.error(404, "NoSuchKey",
+                                  "The specified key does not exist.")
+            if not self.check_conditions(src, "x-amz-copy-source-"):
+                return self.failed_condition()
+            if self.headers.get("x-amz-metadata-directive") != "REPLACE":
+                headers = dict(src.headers)
+            obj = objects[self.key] = StoredObject(src.data, headers)
+            return self.reply(200, "%s<CopyObjectResult><LastModified>%s"
+                                   "</LastModified><ETag>%s</ETag>"
+                                   "</CopyObjectResult>" % (
+                                       xml_head, obj.timestamp(),
+                                       escape(obj.etag)),
+                              {"Content-Type": "application/xml"})
+        if not self.check_conditions(objects.get(self.key)):
+            return self.failed_condition()
+        obj = objects[self.key] = StoredObject(self.body, headers)
+        self.reply(200, headers={"ETag": obj.etag})
+
+    def do_POST(self):
+        objects = self.server.objects
+        if "delete" in self.args:
+            return self.delete_objects(objects)
+        elif "uploads" in self.args:
+            upload_id = "%016x" % random.getrandbits(64)
+            self.server.uploads[upload_id] = {}
+            return self.reply(200, "%s<InitiateMultipartUploadResult xmlns="
+                                   '"%s"><Key>%s</Key><UploadId>%s</UploadId>'
+                                   "</InitiateMultipartUploadResult>" % (
+                                       xml_head, ns, escape(self.key),
+                                       upload_id),
+                              {"Content-Type": "application/xml"})
+        elif "uploadId" in self.args:
+            parts = self.server.uploads.pop(self.args["uploadId"], None)
+            if parts is None:
+                return self.error(404, "NoSuchUpload", "No such upload.")
+            data = "".join(parts[n].data for n in sorted(parts))
+            digest = hashlib.md5("".join(
+                hashlib.md5(parts[n].data).digest() for n in sorted(parts)))
+            etag = '"%s-%d"' % (digest.hexdigest(), len(parts))
+            objects[self.key] = StoredObject(data, etag=etag)
+            return self.reply(200, "%s<CompleteMultipartUploadResult xmlns="
+                                   '"%s"><Key>%s</Key><ETag>%s</ETag>'
+                                   "</CompleteMultipartUploadResult>" % (
+                                       xml_head, ns, escape(self.key),
+                                       escape(etag)),
+                              {"Content-Type": "application/xml"})
+        self.error(400, "InvalidRequest", "Unsupported POST.")
+
+    def do_DELETE(self):
+        objects = self.server.objects
+        if "uploadId" in self.args:
+            self.server.uploads.pop(self.args["uploadId"], None)
+        else:
+            objects.pop(self.key, None)
+        self.reply(204)
+
+    def delete_objects(self, objects):
+        root = ElementTree.fromstring(self.body)
+        deleted = []
+        for el in root.getiterator("Key"):
+            key = el.text
+            if isinstance(key, unicode):
+                key = key.encode("utf-8")
+            objects.pop(key, None)
+            deleted.append("<Deleted><Key>%s</Key></Deleted>" % escape(key))
+        self.reply(200, '%s<DeleteResult xmlns="%s">%s</DeleteResult>' % (
+            xml_head, ns, "".join(deleted)),
+            {"Content-Type": "application/xml"})
+
+    def list_objects(self, objects):
+        prefix = self.args.get("prefix", "")
+        marker = self.args.get("marker", "")
+        delimiter = self.args.get("delimiter")
+        max_keys = int(self.args.get("max-keys", 1000))
+        parts = []
+        n = 0
+        last = None
+        truncated = False
+        keys = self.server.sorted_keys()
+        start = max(bisect.bisect_right(keys, marker),
+                    bisect.bisect_left(keys, prefix))
+        for key in itertools.islice(keys, start, None):
+            if not key.startswith(prefix):
+                break
+            if delimiter:
+                idx = key.find(delimiter, len(prefix))
+                if idx >= 0:
+                    common = key[:idx + len(delimiter)]
+                    if last is not None and last.startswith(common):
+                        continue
+            if n == max_keys:
+                truncated = True
+                break
+            if delimiter and idx >= 0:
+                parts.append("<CommonPrefixes><Prefix>%s</Prefix>"
+                             "</CommonPrefixes>" % escape(common))
+                last = common
+            else:
+                obj = objects[key]
+                parts.append("<Contents><Key>%s</Key><LastModified>%s"
+                             "</LastModified><ETag>%s</ETag><Size>%d</Size>"
+                             "<StorageClass>STANDARD</StorageClass>"
+                             "</Contents>" % (escape(key), obj.timestamp(),
+                                              escape(obj.etag),
+                                              len(obj.data)))
+                last = key
+            n += 1
+        next_marker = ""
+        if truncated and delimiter:
+            next_marker = "<NextMarker>%s</NextMarker>" % escape(last)
+        self.reply(200, '%s<ListBucketResult xmlns="%s"><Name>bench</Name>'
+                        "<Prefix>%s</Prefix><Marker>%s</Marker>"
+                        "<MaxKeys>%d</MaxKeys><IsTruncated>%s</IsTruncated>"
+                        "%s%s</ListBucketResult>" % (
+                            xml_head, ns, escape(prefix), escape(marker),
+                            max_keys, str(truncated).lower(), next_marker,
+                            "".join(parts)),
+                   {"Content-Type": "application/xml"})
+
+class ObjectStore(dict):
+    """Objects by key, keeping a sorted list of keys for listings."""
+
+    def __init__(self, *a, **k):
+        super(ObjectStore, self).__init__(*a, **k)
+        self.sorted = None
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.sorted = None
+        super(ObjectStore, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.sorted = None
+        super(ObjectStore, self).__delitem__(key)
+
+    def pop(self, key, *default):
+        self.sorted = None
+        return super(ObjectStore, self).pop(key, *default)
+
+    def clear(self):
+        self.sorted = None
+        super(ObjectStore, self).clear()
+
+class Server(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    # Lots of concurrent clients connect at once.
+    request_queue_size = 128
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        BaseHTTPServer.HTTPServer.__init__(self, address, Handler)
+        self.objects = ObjectStore()
+        self.uploads = {}
+        self.peers = set()
+        self.requests = None
+        self.faults = {}
+        self.url = "http://%s:%d" % self.server_address
+
+    def sorted_keys(self):
+        keys = self.objects.sorted
+        if keys is None:
+            keys = self.objects.sorted = sorted(self.objects)
+        return keys
+
+def start(address=("127.0.0.1", 0)):
+    """Start a stand-in server on a daemon thread, and return it."""
+    server = Server(address)
+    t = threading.Thread(target=server.serve_forever, args=(0.05,))
+    t.daemon = True
+    t.start()
+    return server
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""Throughput of common operations against a local S3 stand-in.
+
+Each scenario runs against an in-process server (see `s3standin`), so what is
+measured is simples3 itself plus loopback HTTP. Scenarios:
+
+small_put, small_get, small_head, small_delete
+    operations per second on small objects
+large_put, large_get
+    megabytes per second for one large object
+list_keys, list_keys_parallel
+    keys per second listed from a populated bucket
+sign
+    requests signed per second
+
+Give scenario names as arguments to only run some of them. With ``--json``,
+results are written as JSON for comparing runs::
+
+    $ python benchmarks/suite.py -c 8 --json results.json small_get list_keys
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import optparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import simples3
+from simples3.bucket import S3Bucket
+from simples3.concurrency import imap
+import s3standin
+
+scenarios = []
+
+def scenario(unit):
+    def deco(fun):
+        scenarios.append((fun.__name__, unit, fun))
+        return fun
+    return deco
+
+def run_ops(opts, fun, items):
+    """Run *fun* on each of *items* with the configured concurrency,
+    returning the wall time taken.
+    """
+    t0 = time.time()
+    if opts.concurrency > 1:
+        for rv in imap(fun, items, n_workers=opts.concurrency, ordered=False):
+            pass
+    else:
+        for item in items:
+            fun(item)
+    return time.time() - t0
+
+def small_keys(opts):
+    return ["small/%06d" % i for i in xrange(opts.n_ops)]
+
+def populate_small(opts, server):
+    data = "x" * opts.small_size
+    for key in small_keys(opts):
+        server.objects[key] = s3standin.StoredObject(data)
+
+@scenario("ops/s")
+def small_put(opts, server, bucket):
+    data = "x" * opts.small_size
+    return opts.n_ops / run_ops(opts, lambda key: bucket.put(key, data),
+                                small_keys(opts))
+
+@scenario("ops/s")
+def small_get(opts, server, bucket):
+    populate_small(opts, server)
+    def get(key):
+        fp = bucket.get(key)
+        fp.read()
+        fp.close()
+    return opts.n_ops / run_ops(opts, get, small_keys(opts))
+
+@scenario("ops/s")
+def small_head(opts, server, bucket):
+    populate_small(opts, server)
+    return opts.n_ops / run_ops(opts, bucket.info, small_keys(opts))
+
+@scenario("ops/s")
+def small_delete(opts, server, bucket):
+    populate_small(opts, server)
+    return opts.n_ops / run_ops(opts, bucket.delete, small_keys(opts))
+
+def large_data(opts):
+    return os.urandom(1 << 20) * opts.large_size
+
+@scenario("MB/s")
+def large_put(opts, server, bucket):
+    data = bytearray(large_data(opts))
+    bucket.multipart_workers = opts.concurrency
+    t0 = time.time()
+    bucket.put_buffer("large", data)
+    return len(data) / (time.time() - t0) / 1e6
+
+@scenario("MB/s")
+def large_get(opts, server, bucket):
+    data = large_data(opts)
+    server.objects["large"] = s3standin.StoredObject(data)
+    t0 = time.time()
+    if opts.concurrency > 1:
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            bucket.get_file("large", path, n_workers=opts.concurrency)
+        finally:
+            os.unlink(path)
+    else:
+        fp = bucket.get("large")
+        while fp.read(1 << 20):
+            pass
+        fp.close()
+    return len(data) / (time.time() - t0) / 1e6
+
+def populate_listing(opts, server):
+    obj = s3standin.StoredObject("x")
+    for i in xrange(opts.n_keys):
+        server.objects["list/%02d/%08d" % (i % 64, i)] = obj
+
+@scenario("keys/s")
+def list_keys(opts, server, bucket):
+    populate_listing(opts, server)
+    t0 = time.time()
+    n = sum(1 for item in bucket.listdir(prefix="list/"))
+    return n / (time.time() - t0)
+
+@scenario("keys/s")
+def list_keys_parallel(opts, server, bucket):
+    populate_listing(opts, server)
+    t0 = time.time()
+    n = sum(1 for item in bucket.listdir_parallel(
+        prefix="list/", delimiter="/", ordered=False,
+        n_workers=opts.concurrency))
+    return n / (time.time() - t0)
+
+@scenario("ops/s")
+def sign(opts, server, bucket):
+    headers = {"Content-Type": "image/jpeg", "X-AMZ-Meta-Owner": "john"}
+    n = opts.n_ops * 10
+    t0 = time.time()
+    for i in xrange(n):
+        bucket.request(method="PUT", key="photos/puppy.jpg",
+                       headers=headers).sign(bucket)
+    return n / (time.time() - t0)
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] [scenario ...]")
+    parser.add_option("-c", "--concurrency", type="int", default=1,
+                      help="threads making requests")
+    parser.add_option("-n", "--ops", dest="n_ops", type="int", default=2000,
+                      help="operations per small-object scenario")
+    parser.add_option("--small-size", type="int", default=1024,
+                      help="small object size in bytes")
+    parser.add_option("--large-size", type="int", default=64,
+                      help="large object size in MiB")
+    parser.add_option("-k", "--keys", dest="n_keys", type="int",
+                      default=20000, help="keys in listing scenarios")
+    parser.add_option("-r", "--rounds", type="int", default=3,
+                      help="runs per scenario, the best one counts")
+    parser.add_option("--json", metavar="FILE",
+                      help="write results as JSON to FILE, - for stdout")
+    opts, names = parser.parse_args()
+    unknown = set(names) - set(name for (name, unit, fun) in scenarios)
+    if unknown:
+        parser.error("unknown scenarios: %s" % ", ".join(sorted(unknown)))
+
+    results = []
+    for name, unit, fun in scenarios:
+        if names and name not in names:
+            continue
+        best = 0.0
+        for i in xrange(opts.rounds):
+            server = s3standin.start()
+            bucket = S3Bucket("bench", access_key="key", secret_key="secret",
+                              base_url=server.url)
+            try:
+                best = max(best, fun(opts, server, bucket))
+            finally:
+                # Close pooled connections so the server's threads finish.
+                bucket.transport.close()
+                server.shutdown()
+                server.server_close()
+        results.append({"scenario": name, "value": best, "unit": unit})
+        if opts.json != "-":
+            print "%-20s %12.1f %s" % (name, best, unit)
+
+    if opts.json:
+        doc = {"simples3": simples3.__version__,
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+               "options": {"concurrency": opts.concurrency,
+                           "ops": opts.n_ops,
+                           "small_size": opts.small_size,
+                           "large_size": opts.large_size,
+                           "keys": opts.n_keys,
+                           "rounds": opts.rounds},
+               "results": results}
+        if opts.json == "-":
+            json.dump(doc, sys.stdout, indent=2)
+            print
+        else:
+            with open(opts.json, "w") as fp:
+                json.dump(doc, fp, indent=2)
+
+if __name__ == "__main__":
+    main()
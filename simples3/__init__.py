@@ -123,6 +123,8 @@ from __future__ import absolute_import
 
 __version__ = "1.1.0"
 
-from .bucket import S3File, S3Bucket, S3Error, KeyNotFound
+from .bucket import (S3File, S3Bucket, S3Error, KeyNotFound, NotModified,
+                     PreconditionFailed)
 S3File, S3Bucket, S3Error, KeyNotFound  # pyflakes
+NotModified, PreconditionFailed  # pyflakes
 __all__ = "S3File", "S3Bucket", "S3Error"
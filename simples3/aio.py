@@ -0,0 +1,482 @@
+"""Asynchronous bucket access on :mod:`asyncio` streams
+
+:class:`AsyncS3Bucket` has coroutine versions of the basic bucket operations,
+all running on one event loop over a pool of keep-alive connections, with at
+most *max_concurrency* requests in flight at a time. Requests are built and
+signed just like for :class:`simples3.bucket.S3Bucket`, and listings are parsed
+by the same :class:`simples3.bucket.S3Listing`.
+
+On Python 2, asyncio comes from its backport, ``trollius``, and so coroutines
+are written in its style::
+
+    >>> from trollius import From, Return, coroutine, get_event_loop
+    >>> bucket = AsyncS3Bucket("foo.com", access_key=..., secret_key=...)
+    >>> @coroutine
+    ... def fetch(key):
+    ...     fp = yield From(bucket.get(key))
+    ...     data = yield From(fp.read())
+    ...     raise Return(data)
+    >>> get_event_loop().run_until_complete(fetch("my file"))
+    'my content'
+
+Responses from `get` hold on to a connection until they have been read to the
+end or closed, so don't forget to do either. Requests are made conditional,
+and responses decompressed, with the same arguments as for `S3Bucket`.
+"""
+
+from __future__ import absolute_import
+
+import time
+import zlib
+import urlparse
+from cStringIO import StringIO
+
+try:
+    import trollius as asyncio
+    from trollius import From, Return, coroutine
+except ImportError:
+    asyncio = None
+    coroutine = lambda f: f
+
+from .bucket import (BaseS3Bucket, S3Error, KeyNotFound, S3Listing,
+                     listdir_args, parse_delete_result, error_classes,
+                     condition_headers, _argstr, _rewinder)
+from .compression import _wbits
+from .utils import info_dict, rfc822_fmtdate
+
+class AsyncResponse(object):
+    """Response to a request, with a coroutine `read` for its body.
+
+    Has *code*, *msg* and *headers* (with lower-case names) like the responses
+    of :class:`S3Bucket`. The connection is handed back once the body has been
+    read to the end.
+    """
+
+    def __init__(self, bucket, conn, status, reason, headers, has_body=True):
+        self.bucket = bucket
+        self.conn = conn
+        self.code = status
+        self.msg = reason
+        self.headers = headers
+        self.chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+        self.remaining = None
+        if "content-length" in headers:
+            self.remaining = int(headers["content-length"])
+        if not has_body:
+            self.chunked, self.remaining = False, 0
+        self.will_close = (headers.get("connection", "").lower() == "close" or
+                           (self.remaining is None and not self.chunked))
+        self.chunk_left = 0
+        if self.remaining == 0:
+            self._done()
+
+    def info(self):
+        return self.headers
+
+    @coroutine
+    def read(self, n=-1):
+        """Read up to *n* bytes, or all that is left if *n* is negative."""
+        if n < 0:
+            chunks = []
+            while True:
+                chunk = yield From(self.read(1 << 16))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            raise Return("".join(chunks))
+        if self.conn is None:
+            raise Return("")
+        reader = self.conn.reader
+        try:
+            if self.chunked:
+                data = yield From(self._read_chunk(n))
+            elif self.remaining is None:
+                data = yield From(reader.read(n))
+                if not data:
+                    self._done()
+            else:
+                data = yield From(reader.readexactly(min(n, self.remaining)))
+                self.remaining -= len(data)
+                if not self.remaining:
+                    self._done()
+        except _conn_errors:
+            # Whatever is left of the body can't be read, so the connection
+            # is no good for another request.
+            self.close()
+            raise
+        raise Return(data)
+
+    @coroutine
+    def _read_chunk(self, n):
+        reader = self.conn.reader
+        if not self.chunk_left:
+            line = yield From(reader.readline())
+            self.chunk_left = int(line.split(";", 1)[0].strip(), 16)
+            if not self.chunk_left:
+                while (yield From(reader.readline())) not in ("\r\n", "\n", ""):
+                    pass
+                self._done()
+                raise Return("")
+        data = yield From(reader.readexactly(min(n, self.chunk_left)))
+        self.chunk_left -= len(data)
+        if not self.chunk_left:
+            yield From(reader.readexactly(2))
+        raise Return(data)
+
+    def _done(self):
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            self.bucket._release(conn, reuse=not self.will_close)
+
+    def close(self):
+        """Close the response, dropping its connection if not read to the end."""
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            self.bucket._release(conn, reuse=False)
+
+class AsyncDecompressingResponse(object):
+    """`AsyncResponse` *resp*, with a coroutine `read` decompressing its body
+    from *encoding*.
+
+    Other attributes, such as *s3_info* and *code*, are those of *resp*.
+    """
+
+    chunk_size = 64 << 10
+
+    def __init__(self, resp, encoding="gzip"):
+        self.resp = resp
+        self.decompressor = zlib.decompressobj(_wbits[encoding])
+        self.buf = ""
+        self.eof = False
+
+    def __getattr__(self, name):
+        return getattr(self.resp, name)
+
+    @coroutine
+    def read(self, n=-1):
+        """Read up to *n* bytes, or all that is left if *n* is negative."""
+        while not self.eof and (n < 0 or len(self.buf) < n):
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = yield From(self.resp.read(self.chunk_size))
+            if data:
+                self.buf += self.decompressor.decompress(data,
+                                                         self.chunk_size)
+            else:
+                self.buf += self.decompressor.flush()
+                self.eof = True
+        if n < 0:
+            n = len(self.buf)
+        data, self.buf = self.buf[:n], self.buf[n:]
+        raise Return(data)
+
+    def close(self):
+        self.resp.close()
+
+class _Connection(object):
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.time()
+
+    def close(self):
+        self.writer.close()
+
+_conn_errors = (EnvironmentError, EOFError)
+
+class AsyncListing(object):
+    """Asynchronous iteration over a bucket listing.
+
+    Call the coroutine `next_entry` for each (key, modified, etag, size) tuple
+    in turn; it gives None once the listing is exhausted.
+    """
+
+    def __init__(self, bucket, args):
+        self.bucket = bucket
+        self.args = args.copy()
+        self.page = iter(())
+        self.done = False
+
+    @coroutine
+    def next_entry(self):
+        while True:
+            for item in self.page:
+                raise Return(item)
+            if self.done:
+                raise Return(None)
+            yield From(self._fetch_page())
+
+    @coroutine
+    def _fetch_page(self):
+        s3req = self.bucket.request(key="", args=self.args)
+        resp = yield From(self.bucket._send_read(s3req))
+        listing = S3Listing.parse(StringIO(resp.data))
+        self.page = iter(list(listing))
+        if listing.truncated:
+            self.args["marker"] = _argstr(listing.next_marker)
+        else:
+            self.done = True
+
+class AsyncS3Bucket(BaseS3Bucket):
+    """S3 bucket with coroutine methods, see the module documentation.
+
+    Only the operations defined here are available; the others of
+    :class:`simples3.bucket.S3Bucket` wait on responses, and aren't.
+
+    *loop* is the event loop to run on, by default the current one.
+    """
+
+    max_concurrency = 100
+    max_idle = 10
+    idle_timeout = 60.0
+
+    def __init__(self, name=None, access_key=None, secret_key=None,
+                 base_url=None, timeout=None, secure=False, retry_policy=None,
+                 loop=None, max_concurrency=None):
+        if asyncio is None:
+            raise NotImplementedError("asynchronous buckets require asyncio; "
+                                      "on Python 2, install trollius")
+        super(AsyncS3Bucket, self).__init__(name, access_key=access_key,
+                                            secret_key=secret_key,
+                                            base_url=base_url,
+                                            timeout=timeout, secure=secure,
+                                            retry_policy=retry_policy)
+        self.loop = loop or asyncio.get_event_loop()
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        self.slots = asyncio.Semaphore(self.max_concurrency, loop=self.loop)
+        self.idle = {}
+
+    @coroutine
+    def send(self, s3req, read=False):
+        """Send *s3req*, retrying under *retry_policy*.
+
+        With *read*, the body is read as part of each attempt, and is the
+        *data* of the response given, so that a failure to read it is
+        retried too and the connection is given back right away.
+        """
+        retries = self.retry_policy.begin()
+        rewind = _rewinder(s3req.data)
+        while True:
+            s3req.headers["Date"] = rfc822_fmtdate()
+            s3req.sign(self)
+            try:
+                resp = yield From(self._attempt(s3req, read))
+                raise Return(resp)
+            except S3Error, e:
+                delay = retries.next_delay(e) if rewind else None
+                if delay is None:
+                    raise
+            yield From(asyncio.sleep(delay, loop=self.loop))
+            rewind()
+
+    @coroutine
+    def _attempt(self, s3req, read=False):
+        resp = yield From(self._request(s3req))
+        ok = 200 <= resp.code < 300
+        if ok and not read:
+            raise Return(resp)
+        body = read_error = None
+        try:
+            body = yield From(resp.read())
+        except _conn_errors, read_error:
+            pass
+        finally:
+            resp.close()
+        if ok:
+            if read_error is not None:
+                raise S3Error("read error", key=s3req.key, reason=read_error)
+            resp.data = body
+            raise Return(resp)
+        exc_cls = error_classes.get(resp.code, S3Error)
+        e = exc_cls("HTTP error", reason=resp.msg, code=resp.code,
+                    key=s3req.key)
+        e.headers = resp.headers
+        if read_error is not None:
+            e.extra["read_error"] = read_error
+        elif body:
+            e.set_data(body)
+        raise e
+
+    @coroutine
+    def _request(self, s3req):
+        split = urlparse.urlsplit(s3req.url(self.base_url))
+        path = split.path or "/"
+        if split.query:
+            path += "?" + split.query
+        headers = dict(s3req.headers)
+        data = s3req.data
+        if "Content-Length" not in headers:
+            if hasattr(data, "__len__"):
+                headers["Content-Length"] = str(len(data))
+            elif data is None and s3req.method in ("PUT", "POST"):
+                headers["Content-Length"] = "0"
+        headers["Host"] = split.netloc
+        head = "%s %s HTTP/1.1\r\n%s\r\n" % (s3req.method, path, "".join(
+            "%s: %s\r\n" % item for item in headers.iteritems()))
+        if isinstance(head, unicode):
+            head = head.encode("utf-8")
+        pos = data.tell() if hasattr(data, "tell") else None
+
+        yield From(self.slots.acquire())
+        try:
+            while True:
+                conn, reused = yield From(self._connect(split))
+                try:
+                    exchange = self._exchange(conn, head, data, s3req.method)
+                    if self.timeout:
+                        exchange = asyncio.wait_for(exchange, self.timeout,
+                                                    loop=self.loop)
+                    resp = yield From(exchange)
+                except _conn_errors + (asyncio.TimeoutError,), e:
+                    conn.close()
+                    # A reused connection may have been closed by S3 while it
+                    # was idle, so try again on a fresh one.
+                    if reused and not isinstance(e, asyncio.TimeoutError):
+                        if pos is not None:
+                            data.seek(pos)
+                        if pos is not None or not hasattr(data, "read"):
+                            continue
+                    raise S3Error("connection error", key=s3req.key, reason=e)
+                raise Return(resp)
+        except BaseException, e:
+            if not isinstance(e, Return):
+                self.slots.release()
+            raise
+
+    @coroutine
+    def _exchange(self, conn, head, data, method):
+        writer, reader = conn.writer, conn.reader
+        writer.write(head)
+        if hasattr(data, "read"):
+            while True:
+                chunk = data.read(1 << 16)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                yield From(writer.drain())
+        elif data:
+            writer.write(data)
+        yield From(writer.drain())
+
+        line = yield From(reader.readline())
+        if not line:
+            raise EOFError("connection closed before response")
+        version, status, reason = (line.rstrip("\r\n").split(" ", 2) + [""])[:3]
+        headers = {}
+        while True:
+            line = yield From(reader.readline())
+            if line in ("\r\n", "\n", ""):
+                break
+            name, value = line.split(":", 1)
+            name, value = name.strip().lower(), value.strip()
+            if name in headers:
+                value = headers[name] + ", " + value
+            headers[name] = value
+        status = int(status)
+        has_body = not (method == "HEAD" or status in (204, 304)
+                        or 100 <= status < 200)
+        raise Return(AsyncResponse(self, conn, status, reason, headers,
+                                   has_body=has_body))
+
+    @coroutine
+    def _connect(self, split):
+        port = split.port or (443 if split.scheme == "https" else 80)
+        key = (split.scheme, split.hostname, port)
+        idle = self.idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if (conn.reader.at_eof() or
+                    time.time() - conn.last_used > self.idle_timeout):
+                conn.close()
+                continue
+            raise Return((conn, True))
+        reader, writer = yield From(asyncio.open_connection(
+            split.hostname, port, ssl=(split.scheme == "https") or None,
+            loop=self.loop))
+        raise Return((_Connection(key, reader, writer), False))
+
+    def _release(self, conn, reuse=True):
+        self.slots.release()
+        idle = self.idle.setdefault(conn.key, [])
+        if reuse and len(idle) < self.max_idle:
+            conn.last_used = time.time()
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        """Close all idle connections."""
+        for idle in self.idle.itervalues():
+            for conn in idle:
+                conn.close()
+        self.idle.clear()
+
+    @coroutine
+    def _send_read(self, s3req):
+        """Send *s3req*, reading the response body; see `send`."""
+        resp = yield From(self.send(s3req, read=True))
+        raise Return(resp)
+
+    @coroutine
+    def get(self, key, headers={}, decompress=None, **conditions):
+        """Get *key* like `S3Bucket.get`, conditions and *decompress*
+        included; a decompressed response is an `AsyncDecompressingResponse`.
+        """
+        if conditions:
+            headers = dict(headers, **condition_headers(**conditions))
+        resp = yield From(self.send(self.request(key=key, headers=headers)))
+        resp.s3_info = info_dict(resp.headers)
+        raise Return(self._decoded(resp, decompress))
+
+    def _decoded(self, response, decompress=None):
+        if decompress is None:
+            decompress = self.decompress_responses
+        encoding = response.headers.get("content-encoding")
+        if decompress and encoding in _wbits:
+            response = AsyncDecompressingResponse(response, encoding)
+        return response
+
+    @coroutine
+    def info(self, key, **conditions):
+        s3req = self.request(method="HEAD", key=key,
+                             headers=condition_headers(**conditions))
+        resp = yield From(self._send_read(s3req))
+        raise Return(info_dict(resp.headers))
+
+    @coroutine
+    def put(self, key, data=None, acl=None, metadata={}, mimetype=None,
+            transformer=None, headers={}, **conditions):
+        yield From(self._send_read(self.put_request(
+            key, data=data, acl=acl, metadata=metadata, mimetype=mimetype,
+            transformer=transformer, headers=headers, **conditions)))
+
+    @coroutine
+    def delete(self, *keys):
+        if not keys:
+            raise TypeError("required one key at least")
+        elif len(keys) == 1:
+            s3req = self.request(method="DELETE", key=keys[0])
+            try:
+                resp = yield From(self._send_read(s3req))
+            except KeyNotFound:
+                raise Return(False)
+            raise Return(200 <= resp.code < 300)
+        elif len(keys) > 1000:
+            raise ValueError("cannot delete more than 1000 keys at a time")
+        resp = yield From(self._send_read(self.delete_request(keys)))
+        raise Return(not parse_delete_result(StringIO(resp.data)))
+
+    @coroutine
+    def copy(self, source, key, acl=None, metadata=None, mimetype=None,
+             headers={}, **conditions):
+        yield From(self._send_read(self.copy_request(
+            source, key, acl=acl, metadata=metadata, mimetype=mimetype,
+            headers=headers, **conditions)))
+
+    def listdir(self, prefix=None, marker=None, limit=None, delimiter=None):
+        """List bucket contents, returning an `AsyncListing`."""
+        return AsyncListing(self, listdir_args(prefix=prefix, marker=marker,
+                                               limit=limit,
+                                               delimiter=delimiter))
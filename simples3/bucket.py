@@ -2,27 +2,35 @@
 
 from __future__ import absolute_import
 
+import os
+import sys
+import mmap
 import time
+import types
 import hmac
 import hashlib
-import httplib
-import urllib2
 import datetime
 import warnings
-from xml.etree import cElementTree as ElementTree
+import itertools
 from contextlib import contextmanager
-from urllib import quote_plus
 from base64 import b64encode
-from cgi import escape
 
 from .utils import (_amz_canonicalize, metadata_headers, rfc822_fmtdate, _iso8601_dt,
-                    aws_md5, aws_urlquote, guess_mimetype, info_dict, expire2datetime)
+                    _iso8601_epoch, aws_md5, aws_urlquote, guess_mimetype, info_dict,
+                    expire2datetime, chunked, xml_escape, quote_plus)
+from .concurrency import imap, chain_ahead, interleave
+from .retry import RetryPolicy
+from .metrics import RequestEvent
 
 amazon_s3_domain = "s3.amazonaws.com"
 amazon_s3_ns_url = "http://%s/doc/2006-03-01/" % amazon_s3_domain
+# Sorts after any other character, so `prefix + c + max_key_char` is a marker
+# that skips past all keys starting with `prefix + c`.
+max_key_char = u"\U0010ffff"
 
 class S3Error(Exception):
     fp = None
+    headers = None
 
     def __init__(self, message, **kwds):
         self.args = message, kwds.copy()
@@ -39,25 +47,33 @@ class S3Error(Exception):
     @classmethod
     def from_urllib(cls, e, **extra):
         """Try to read the real error from AWS."""
+        import httplib, urllib2
         self = cls("HTTP error", **extra)
         for attr in ("reason", "code", "filename"):
             if attr not in extra and hasattr(e, attr):
                 self.extra[attr] = getattr(e, attr)
+        if getattr(e, "hdrs", None) is not None:
+            self.headers = dict(e.hdrs)
         self.fp = getattr(e, "fp", None)
         if self.fp:
             # The except clause is to avoid a bug in urllib2 which has it read
             # as in chunked mode, but S3 gives an empty reply.
             try:
-                self.data = data = self.fp.read()
+                data = self.fp.read()
             except (httplib.HTTPException, urllib2.URLError), e:
                 self.extra["read_error"] = e
             else:
-                data = data.decode("utf-8")
-                begin, end = data.find("<Message>"), data.find("</Message>")
-                if min(begin, end) >= 0:
-                    self.msg = data[begin + 9:end]
+                self.set_data(data)
         return self
 
+    def set_data(self, data):
+        """Set the error response body *data*, and its message if any."""
+        self.data = data
+        data = data.decode("utf-8")
+        begin, end = data.find("<Message>"), data.find("</Message>")
+        if min(begin, end) >= 0:
+            self.msg = data[begin + 9:end]
+
     @property
     def code(self): return self.extra.get("code")
 
@@ -65,22 +81,40 @@ class KeyNotFound(S3Error, KeyError):
     @property
     def key(self): return self.extra.get("key")
 
-class StreamHTTPHandler(urllib2.HTTPHandler):
-    pass
+class NotModified(S3Error):
+    """A conditional GET or HEAD found the object unchanged (304).
+
+    *info* is made from the headers S3 sent with the 304, which include the
+    ETag and Last-Modified of the object as it is stored.
+    """
 
-class StreamHTTPSHandler(urllib2.HTTPSHandler):
-    pass
+    @property
+    def info(self): return info_dict(self.headers or {})
 
-class AnyMethodRequest(urllib2.Request):
-    def __init__(self, method, *args, **kwds):
-        self.method = method
-        urllib2.Request.__init__(self, *args, **kwds)
+class PreconditionFailed(S3Error):
+    """A condition such as *if_match* didn't hold for the object (412)."""
 
-    def get_method(self):
-        return self.method
+# Exception classes for error responses with a code of their own.
+error_classes = {304: NotModified, 404: KeyNotFound, 412: PreconditionFailed}
+
+# Names that moved to `simples3.opener`, where urllib2 is imported; they are
+# still found here, importing that module on first access.
+_opener_names = ("AnyMethodRequest", "StreamHTTPHandler", "StreamHTTPSHandler")
+
+class _OpenerAttribute(object):
+    """Class attribute that is *name* of `simples3.opener`, imported on first
+    access.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        from . import opener
+        return getattr(opener, self.name)
 
 class S3Request(object):
-    urllib_request_cls = AnyMethodRequest
+    urllib_request_cls = _OpenerAttribute("AnyMethodRequest")
 
     def __init__(self, bucket=None, key=None, method="GET", headers={},
                  args=None, data=None, subresource=None):
@@ -102,36 +136,36 @@ class S3Request(object):
     def __str__(self):
         return "<S3 %s request bucket %r key %r>" % (self.method, self.bucket, self.key)
 
-    def descriptor(self):
+    def descriptor(self, quote_bucket=aws_urlquote):
         # The signature descriptor is detalied in the developer's PDF on p. 65.
-        lines = (self.method,
-                 self.headers.get("Content-MD5", ""),
-                 self.headers.get("Content-Type", ""),
-                 self.headers.get("Date", ""))
-        preamb = "\n".join(str(line) for line in lines) + "\n"
-        headers = _amz_canonicalize(self.headers)
-        res = self.canonical_resource
-        return "".join((preamb, headers, res))
+        headers = self.headers
+        return "%s\n%s\n%s\n%s\n%s%s" % (self.method,
+                                         headers.get("Content-MD5", ""),
+                                         headers.get("Content-Type", ""),
+                                         headers.get("Date", ""),
+                                         _amz_canonicalize(headers),
+                                         self.resource(quote_bucket))
 
     @property
     def canonical_resource(self):
+        return self.resource()
+
+    def resource(self, quote_bucket=aws_urlquote):
         res = "/"
         if self.bucket:
-            res += aws_urlquote(self.bucket)
+            res += quote_bucket(self.bucket)
         if self.key is not None:
-            res += "/%s" % aws_urlquote(self.key)
+            res += "/" + aws_urlquote(self.key)
         if self.subresource:
-            res += "?%s" % aws_urlquote(self.subresource)
+            res += "?" + aws_urlquote(self.subresource, "/=&")
         return res
 
     def sign(self, cred):
         "Sign the request with credentials *cred*."
-        desc = self.descriptor()
-        key = cred.secret_key.encode("utf-8")
-        hasher = hmac.new(key, desc.encode("utf-8"), hashlib.sha1)
-        sign = b64encode(hasher.digest())
-        self.headers["Authorization"] = "AWS %s:%s" % (cred.access_key, sign)
-        return sign
+        signer = getattr(cred, "signer", None)
+        if signer is None:
+            signer = S3Signer(cred.access_key, cred.secret_key)
+        return signer.sign(self)
 
     def urllib(self, bucket):
         return self.urllib_request_cls(self.method, self.url(bucket.base_url),
@@ -155,6 +189,38 @@ class S3Request(object):
             url += "?" + "&".join(ps)
         return url
 
+class S3Signer(object):
+    """Signs requests with the credentials *access_key* and *secret_key*.
+
+    The HMAC key setup is done once and copied for each request, and bucket
+    names are quoted once.
+    """
+
+    def __init__(self, access_key, secret_key):
+        self.access_key = access_key
+        self.access_key_arg = "AWSAccessKeyId=" + quote_plus(access_key or "")
+        self.hmac = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha1)
+        self.quoted_buckets = {}
+
+    def quote_bucket(self, bucket):
+        try:
+            return self.quoted_buckets[bucket]
+        except KeyError:
+            rv = self.quoted_buckets[bucket] = aws_urlquote(bucket)
+            return rv
+
+    def signature(self, desc):
+        """Compute the base64-encoded signature of descriptor *desc*."""
+        hasher = self.hmac.copy()
+        hasher.update(desc.encode("utf-8"))
+        return b64encode(hasher.digest())
+
+    def sign(self, s3req):
+        """Set the Authorization header of *s3req*, returning the signature."""
+        sign = self.signature(s3req.descriptor(self.quote_bucket))
+        s3req.headers["Authorization"] = "AWS %s:%s" % (self.access_key, sign)
+        return sign
+
 class S3File(str):
     def __new__(cls, value, **kwds):
         return super(S3File, cls).__new__(cls, value)
@@ -166,50 +232,169 @@ class S3File(str):
     def put_into(self, bucket, key):
         return bucket.put(key, **self.kwds)
 
+class ListEntry(object):
+    """A listing entry, compact and with its modification date parsed lazily.
+
+    Works like the (key, modified, etag, size) tuple `S3Listing` otherwise
+    gives, and also has the modification time as seconds since the epoch,
+    *mtime*, which is cheaper to get than the datetime *modified*.
+    """
+
+    __slots__ = ("key", "etag", "size", "timestamp")
+
+    def __init__(self, key, timestamp, etag, size):
+        self.key = key
+        self.timestamp = timestamp
+        self.etag = etag
+        self.size = size
+
+    @property
+    def modified(self): return _iso8601_dt(self.timestamp)
+    @property
+    def mtime(self): return _iso8601_epoch(self.timestamp)
+
+    def __repr__(self):
+        return "%s(%r, %r, %r, %r)" % ((self.__class__.__name__,) + tuple(
+            (self.key, self.timestamp, self.etag, self.size)))
+
+    def __iter__(self):
+        return iter((self.key, self.modified, self.etag, self.size))
+
+    def __len__(self): return 4
+    def __getitem__(self, idx): return tuple(self)[idx]
+    def __eq__(self, other): return tuple(self) == tuple(other)
+    def __ne__(self, other): return not self == other
+    def __hash__(self): return hash(tuple(self))
+
+list_fields = ("key", "modified", "etag", "size")
+
 class S3Listing(object):
-    """Representation of a single pageful of S3 bucket listing data."""
+    """Representation of a single pageful of S3 bucket listing data.
+
+    The page is parsed incrementally while it is iterated over, so entries are
+    yielded as soon as they arrive and parsed elements are discarded right
+    away. Consequently, *truncated*, *next_marker* and *prefixes* (the common
+    prefixes of a listing with a delimiter) are only known once the listing has
+    been iterated through.
+
+    Entries are (key, modified, etag, size) tuples, or if *fields* is given,
+    tuples of just those fields, e.g. ``("key", "size")``. If *lazy*, entries
+    are `ListEntry` records instead.
+    """
 
     truncated = None
+    next_marker = None
 
-    def __init__(self, etree):
-        # TODO Use SAX - processes XML before downloading entire response
-        root = etree.getroot()
+    def __init__(self, events, fields=None, lazy=False):
+        self.events = events
+        self.prefixes = []
+        event, root = next(events)
         expect_tag = self._mktag("ListBucketResult")
         if root.tag != expect_tag:
             raise ValueError("root tag mismatch, wanted %r but got %r"
                              % (expect_tag, root.tag))
-        self.etree = etree
-        trunc_text = root.findtext(self._mktag("IsTruncated"))
-        self.truncated = {"true": True, "false": False}[trunc_text]
+        self.root = root
+        if lazy:
+            if fields is not None:
+                raise TypeError("lazy entries have all fields")
+            self.make_item = ListEntry
+        elif fields is not None:
+            self.make_item = _fields_maker(fields)
 
     def __iter__(self):
-        root = self.etree.getroot()
-        for entry in root.findall(self._mktag("Contents")):
-            item = self._el2item(entry)
-            yield item
-            self.next_marker = item[0]
+        root = self.root
+        contents_tag = self._mktag("Contents")
+        trunc_tag = self._mktag("IsTruncated")
+        marker_tag = self._mktag("NextMarker")
+        common_tag = self._mktag("CommonPrefixes")
+        prefix_tag = self._mktag("Prefix")
+        el2fields = self._el2fields
+        make_item = self.make_item
+        next_marker = None
+        for event, el in self.events:
+            if event != "end":
+                continue
+            elif el.tag == contents_tag:
+                key, timestamp, etag, size = el2fields(el)
+                # Drop what has been parsed so far; root is the only element
+                # holding on to it.
+                root.clear()
+                self.next_marker = key
+                yield make_item(key, timestamp, etag, size)
+            elif el.tag == trunc_tag:
+                self.truncated = {"true": True, "false": False}[el.text]
+            elif el.tag == marker_tag:
+                next_marker = el.text
+            elif el.tag == common_tag:
+                self.prefixes.append(el.findtext(prefix_tag))
+                root.clear()
+        if next_marker:
+            self.next_marker = next_marker
 
     @classmethod
-    def parse(cls, resp):
-        return cls(ElementTree.parse(resp))
+    def parse(cls, resp, fields=None, lazy=False):
+        from xml.etree import cElementTree as ElementTree
+        return cls(ElementTree.iterparse(resp, events=("start", "end")),
+                   fields=fields, lazy=lazy)
 
     def _mktag(self, name):
         return "{%s}%s" % (amazon_s3_ns_url, name)
 
+    _key_tag = "{%s}Key" % amazon_s3_ns_url
+    _modified_tag = "{%s}LastModified" % amazon_s3_ns_url
+    _etag_tag = "{%s}ETag" % amazon_s3_ns_url
+    _size_tag = "{%s}Size" % amazon_s3_ns_url
+
+    def _el2fields(self, el):
+        """Get the key, timestamp, etag and size of entry *el* in one pass."""
+        key = timestamp = etag = size = None
+        for child in el:
+            tag = child.tag
+            if tag == self._key_tag:
+                key = child.text
+            elif tag == self._modified_tag:
+                timestamp = child.text
+            elif tag == self._etag_tag:
+                etag = child.text
+            elif tag == self._size_tag:
+                size = int(child.text)
+        return key, timestamp, etag, size
+
+    @staticmethod
+    def make_item(key, timestamp, etag, size):
+        return (key, _iso8601_dt(timestamp), etag, size)
+
     def _el2item(self, el):
-        get = lambda tag: el.findtext(self._mktag(tag))
-        key = get("Key")
-        modify = _iso8601_dt(get("LastModified"))
-        etag = get("ETag")
-        size = int(get("Size"))
-        return (key, modify, etag, size)
-
-class S3Bucket(object):
+        return self.make_item(*self._el2fields(el))
+
+def _fields_maker(fields):
+    """Make a function picking *fields* out of an entry's fields."""
+    for field in fields:
+        if field not in list_fields:
+            raise ValueError("unknown listing field %r" % (field,))
+    parse = "modified" in fields
+    idxs = [list_fields.index(field) for field in fields]
+    def make_item(key, timestamp, etag, size):
+        if parse:
+            timestamp = _iso8601_dt(timestamp)
+        item = (key, timestamp, etag, size)
+        return tuple([item[idx] for idx in idxs])
+    return make_item
+
+class BaseS3Bucket(object):
+    """What buckets have in common however they send requests: building and
+    signing requests, and making URLs.
+
+    `S3Bucket` sends requests and waits for the responses, and
+    `simples3.aio.AsyncS3Bucket` sends them from coroutines.
+    """
+
     default_encoding = "utf-8"
     n_retries = 10
+    decompress_responses = False
 
     def __init__(self, name=None, access_key=None, secret_key=None,
-                 base_url=None, timeout=None, secure=False):
+                 base_url=None, timeout=None, secure=False, retry_policy=None):
         scheme = ("http", "https")[int(bool(secure))]
         if not base_url:
             base_url = "%s://%s" % (scheme, amazon_s3_domain)
@@ -219,12 +404,14 @@ class S3Bucket(object):
             if not base_url.startswith(scheme + "://"):
                 raise ValueError("secure=%r, url must use %s"
                                  % (secure, scheme))
-        self.opener = self.build_opener()
         self.name = name
         self.access_key = access_key
         self.secret_key = secret_key
         self.base_url = base_url
         self.timeout = timeout
+        if retry_policy is None:
+            retry_policy = RetryPolicy(max_attempts=self.n_retries)
+        self.retry_policy = retry_policy
 
     def __str__(self):
         return "<%s %s at %r>" % (self.__class__.__name__, self.name, self.base_url)
@@ -233,6 +420,150 @@ class S3Bucket(object):
         return self.__class__.__name__ + "(%r, access_key=%r, base_url=%r)" % (
             self.name, self.access_key, self.base_url)
 
+    @contextmanager
+    def timeout_disabled(self):
+        (prev_timeout, self.timeout) = (self.timeout, None)
+        try:
+            yield
+        finally:
+            self.timeout = prev_timeout
+
+    @property
+    def signer(self):
+        """The `S3Signer` for the bucket's current credentials."""
+        creds = (self.access_key, self.secret_key)
+        signer = self.__dict__.get("_signer")
+        if signer is None or signer[0] != creds:
+            signer = self._signer = (creds, S3Signer(*creds))
+        return signer[1]
+
+    def request(self, *a, **k):
+        k.setdefault("bucket", self.name)
+        return S3Request(*a, **k)
+
+    def put_request(self, key, data=None, acl=None, metadata={},
+                    mimetype=None, transformer=None, headers={},
+                    **conditions):
+        """Build the request for `put`."""
+        if isinstance(data, unicode):
+            data = data.encode(self.default_encoding)
+        headers = headers.copy()
+        if mimetype:
+            headers["Content-Type"] = str(mimetype)
+        elif "Content-Type" not in headers:
+            headers["Content-Type"] = guess_mimetype(key)
+        headers.update(metadata_headers(metadata))
+        headers.update(condition_headers(**conditions))
+        if acl: headers["X-AMZ-ACL"] = acl
+        if transformer: data = transformer(headers, data)
+        if "Content-Length" not in headers:
+            headers["Content-Length"] = str(len(data))
+        if "Content-MD5" not in headers:
+            headers["Content-MD5"] = aws_md5(data)
+        return self.request(method="PUT", key=key, data=data, headers=headers)
+
+    def delete_request(self, keys):
+        """Build the multi-object delete request for *keys*."""
+        fmt = "<Object><Key>%s</Key></Object>"
+        body = "".join(fmt % xml_escape(k) for k in keys)
+        data = ('<?xml version="1.0" encoding="UTF-8"?><Delete>'
+                "<Quiet>true</Quiet>%s</Delete>") % body
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        headers = {"Content-Type": "multipart/form-data"}
+        return self.request(method="POST", data=data, headers=headers,
+                            subresource="delete")
+
+    def copy_request(self, source, key, acl=None, metadata=None,
+                     mimetype=None, headers={}, **conditions):
+        """Build the request for `copy`."""
+        headers = headers.copy()
+        headers.update({"Content-Type": mimetype or guess_mimetype(key)})
+        headers["X-AMZ-Copy-Source"] = source
+        headers.update(copy_condition_headers(**conditions))
+        if acl: headers["X-AMZ-ACL"] = acl
+        if metadata is not None:
+            headers["X-AMZ-Metadata-Directive"] = "REPLACE"
+            headers.update(metadata_headers(metadata))
+        else:
+            headers["X-AMZ-Metadata-Directive"] = "COPY"
+        return self.request(method="PUT", key=key, headers=headers)
+
+    def make_url(self, key, args=None, arg_sep=";"):
+        s3req = self.request(key=key, args=args)
+        return s3req.url(self.base_url, arg_sep=arg_sep)
+
+    def make_url_authed(self, key, expire=datetime.timedelta(minutes=5)):
+        """Produce an authenticated URL for S3 object *key*.
+
+        *expire* is a delta or a datetime on which the authenticated URL
+        expires. It defaults to five minutes, and accepts a timedelta, an
+        integer delta in seconds, or a datetime.
+
+        To generate an unauthenticated URL for a key, see `B.make_url`.
+        """
+        # NOTE There is a usecase for having a headers argument to this
+        # function - Amazon S3 will validate the X-AMZ-* headers of the GET
+        # request, and so for the browser to send such a header, it would have
+        # to be listed in the signature description.
+        from .presign import Presigner
+        expire = expire2datetime(expire)
+        expire = time.mktime(expire.timetuple()[:9])
+        return Presigner(self).url(key, expires=int(expire))
+
+    def make_urls_authed(self, keys, expire=datetime.timedelta(minutes=5),
+                         granularity=60):
+        """Produce authenticated URLs for each of *keys*, in a list.
+
+        Unlike `make_url_authed`, *expire* must be a delta. The URLs expire
+        at the same time, rounded up to a multiple of *granularity* seconds
+        so that URLs made within that time are the same. See
+        `simples3.presign.Presigner`.
+        """
+        presigner = self.presigner(expire=expire, granularity=granularity)
+        return presigner.urls(keys)
+
+    def presigner(self, expire=datetime.timedelta(minutes=5), granularity=60,
+                  cache_size=0):
+        """Make a `simples3.presign.Presigner` for this bucket."""
+        from .presign import Presigner
+        return Presigner(self, expire=expire, granularity=granularity,
+                         cache_size=cache_size)
+
+    def url_for(self, key, authenticated=False,
+                expire=datetime.timedelta(minutes=5)):
+        msg = "use %s instead of url_for(authenticated=%r)"
+        dep_cls = DeprecationWarning
+        if authenticated:
+            warnings.warn(dep_cls(msg % ("make_url_authed", True)))
+            return self.make_url_authed(key, expire=expire)
+        else:
+            warnings.warn(dep_cls(msg % ("make_url", False)))
+            return self.make_url(key)
+
+class S3Bucket(BaseS3Bucket):
+    multipart_threshold = 64 << 20
+    multipart_part_size = 16 << 20
+    multipart_workers = 4
+    multipart_copy_threshold = 1 << 30
+    multipart_copy_part_size = 256 << 20
+    listing_min_keys = 8
+    listing_min_hits = 4
+    hooks = ()
+    _opener = None
+    _transport = None
+
+    def __init__(self, name=None, access_key=None, secret_key=None,
+                 base_url=None, timeout=None, secure=False, retry_policy=None,
+                 transport=None):
+        super(S3Bucket, self).__init__(name, access_key=access_key,
+                                       secret_key=secret_key,
+                                       base_url=base_url, timeout=timeout,
+                                       secure=secure,
+                                       retry_policy=retry_policy)
+        if transport is not None:
+            self.transport = transport
+
     def __getitem__(self, name): return self.get(name)
     def __delitem__(self, name): return self.delete(name)
     def __setitem__(self, name, value):
@@ -248,79 +579,281 @@ class S3Bucket(object):
         else:
             return True
 
-    @contextmanager
-    def timeout_disabled(self):
-        (prev_timeout, self.timeout) = (self.timeout, None)
-        try:
-            yield
-        finally:
-            self.timeout = prev_timeout
-
     @classmethod
     def build_opener(cls):
-        return urllib2.build_opener(StreamHTTPHandler, StreamHTTPSHandler)
+        from .opener import build_opener
+        return build_opener()
 
-    def request(self, *a, **k):
-        k.setdefault("bucket", self.name)
-        return S3Request(*a, **k)
+    @property
+    def opener(self):
+        """The urllib2 opener of the bucket, built on first use.
+
+        Requests only go through it if *transport* is a `Urllib2Transport`,
+        as it is by default if `build_opener` is overridden or this is set.
+        """
+        opener = self._opener
+        if opener is None:
+            opener = self._opener = self.build_opener()
+        return opener
+
+    @opener.setter
+    def opener(self, opener):
+        self._opener = opener
+        self._transport = None
+
+    def build_transport(self):
+        """Build the transport requests are sent with, see `transport`.
+
+        Requests go through urllib2 if `build_opener` is overridden, an
+        opener was set, or a proxy is set in the environment for
+        *base_url*, as `HTTPTransport` doesn't go through proxies.
+        """
+        overridden = (getattr(type(self).build_opener, "__func__", None)
+                      is not S3Bucket.build_opener.__func__)
+        if overridden or self._opener is not None or self._proxied():
+            from .opener import Urllib2Transport
+            return Urllib2Transport(self.opener)
+        from .transport import HTTPTransport
+        return HTTPTransport()
+
+    def _proxied(self):
+        """Whether the environment sets a proxy for requests to *base_url*."""
+        from urllib import getproxies, proxy_bypass
+        scheme, _, rest = self.base_url.partition("://")
+        host = rest.partition("/")[0]
+        return scheme in getproxies() and not proxy_bypass(host)
+
+    @property
+    def transport(self):
+        """The `simples3.transport.Transport` requests are sent with.
+
+        Unless given, built on first use by `build_transport`.
+        """
+        transport = self._transport
+        if transport is None:
+            transport = self._transport = self.build_transport()
+        return transport
+
+    @transport.setter
+    def transport(self, transport):
+        self._transport = transport
+
+    def add_hook(self, hook):
+        """Add *hook* to see each request sent, see `simples3.metrics`."""
+        self.hooks = self.hooks + (hook,)
+
+    def remove_hook(self, hook):
+        self.hooks = tuple(h for h in self.hooks if h is not hook)
 
     def send(self, s3req):
-        s3req.sign(self)
-        for retry_no in xrange(self.n_retries):
-            req = s3req.urllib(self)
+        retries = self.retry_policy.begin()
+        rewind = _rewinder(s3req.data)
+        attempt = 0
+        while True:
+            # Sign each attempt anew, or a retry after backing off might go
+            # out with a stale Date.
+            s3req.headers["Date"] = rfc822_fmtdate()
+            s3req.sign(self)
+            hooks = self.hooks
+            if hooks:
+                event = RequestEvent(s3req, attempt, hooks)
             try:
-                if self.timeout:
-                    return self.opener.open(req, timeout=self.timeout)
-                else:
-                    return self.opener.open(req)
-            except (urllib2.HTTPError, urllib2.URLError), e:
-                # If S3 gives HTTP 500, we should try again.
-                ecode = getattr(e, "code", None)
-                if ecode == 500:
-                    continue
-                elif ecode == 404:
-                    exc_cls = KeyNotFound
-                else:
-                    exc_cls = S3Error
-                raise exc_cls.from_urllib(e, key=s3req.key)
-        else:
-            raise RuntimeError("ran out of retries")  # Shouldn't happen.
+                resp = self._open(s3req)
+            except S3Error, e:
+                if hooks:
+                    event.failed(e)
+                delay = retries.next_delay(e) if rewind else None
+                if delay is None:
+                    raise
+            else:
+                return event.response(resp) if hooks else resp
+            time.sleep(delay)
+            rewind()
+            attempt += 1
+
+    def _open(self, s3req):
+        return self.transport.open(s3req, s3req.url(self.base_url),
+                                   timeout=self.timeout or None)
 
     def make_request(self, *a, **k):
         warnings.warn(DeprecationWarning("make_request() is deprecated, "
                                          "use request() and send()"))
         return self.send(self.request(*a, **k))
 
-    def get(self, key):
-        response = self.send(self.request(key=key))
-        response.s3_info = info_dict(dict(response.info()))
+    def get(self, key, headers={}, decompress=None, **conditions):
+        """Get *key*, returning the response with its `info` as *s3_info*.
+
+        If *decompress*, by default *decompress_responses*, a body with a
+        gzip or deflate ``Content-Encoding`` is decompressed as it is read;
+        *s3_info* is still that of the stored, compressed object.
+
+        The request can be made conditional with *if_match*, *if_none_match*
+        (ETags), *if_modified_since* and *if_unmodified_since* (datetimes).
+        If *key* is unchanged, `NotModified` is raised, carrying its `info`;
+        if a condition fails otherwise, `PreconditionFailed` is.
+        """
+        if conditions:
+            headers = dict(headers, **condition_headers(**conditions))
+        response = self.send(self.request(key=key, headers=headers))
+        response.s3_info = info_dict(_headers(response))
+        return self._decoded(response, decompress)
+
+    def _decoded(self, response, decompress=None):
+        """Wrap *response* to decompress it, if wanted and compressed."""
+        if decompress is None:
+            decompress = self.decompress_responses
+        encoding = response.s3_info["headers"].get("content-encoding")
+        if decompress and encoding:
+            from .compression import decompressing
+            response = decompressing(response, encoding)
         return response
 
-    def info(self, key):
-        response = self.send(self.request(method="HEAD", key=key))
-        rv = info_dict(dict(response.info()))
+    def get_file(self, key, dest, part_size=8 << 20, n_workers=4,
+                 progress=None):
+        """Download *key* to *dest*, a filename or a seekable file object.
+
+        The object is fetched in byte ranges of *part_size*, *n_workers* at a
+        time, and each range is written straight to its place in *dest*. A
+        range that fails is retried from where it left off.
+
+        *progress* is called like for `StreamingMixin.put_file`. Returns the
+        `info` of *key*.
+        """
+        from .download import download_file
+        return download_file(self, key, dest, part_size=part_size,
+                             n_workers=n_workers, progress=progress)
+
+    def get_resumable(self, key, path, progress=None, verify=True):
+        """Download *key* to *path* in one stream that can be resumed.
+
+        Data is written to *path*.part, which survives failures, and is
+        renamed to *path* once verified. Calling this again after a failure
+        resumes from the end of the ``.part`` file, unless *key* has changed.
+        See `simples3.download.resume_download`.
+        """
+        from .download import resume_download
+        return resume_download(self, key, path, progress=progress,
+                               verify=verify)
+
+    def sync_dir(self, path, prefix="", delete=False, checksum=False,
+                 dry_run=False, n_workers=4, report=None, **kwds):
+        """Upload what changed under directory *path* to keys under *prefix*.
+
+        With *delete*, keys under *prefix* with no local file are deleted.
+        See `simples3.sync.sync_dir`, which this calls.
+        """
+        from .sync import sync_dir
+        return sync_dir(self, path, prefix=prefix, delete=delete,
+                        checksum=checksum, dry_run=dry_run,
+                        n_workers=n_workers, report=report, **kwds)
+
+    def info(self, key, **conditions):
+        """Get the `info` dict of *key*, conditionally like with `get`."""
+        headers = condition_headers(**conditions)
+        response = self.send(self.request(method="HEAD", key=key,
+                                          headers=headers))
+        rv = info_dict(_headers(response))
         response.close()
         return rv
 
     def put(self, key, data=None, acl=None, metadata={}, mimetype=None,
-            transformer=None, headers={}):
-        if isinstance(data, unicode):
-            data = data.encode(self.default_encoding)
-        headers = headers.copy()
-        if mimetype:
-            headers["Content-Type"] = str(mimetype)
-        elif "Content-Type" not in headers:
-            headers["Content-Type"] = guess_mimetype(key)
-        headers.update(metadata_headers(metadata))
-        if acl: headers["X-AMZ-ACL"] = acl
-        if transformer: data = transformer(headers, data)
-        if "Content-Length" not in headers:
-            headers["Content-Length"] = str(len(data))
-        if "Content-MD5" not in headers:
-            headers["Content-MD5"] = aws_md5(data)
-        s3req = self.request(method="PUT", key=key, data=data, headers=headers)
+            transformer=None, headers={}, **conditions):
+        """Put *data* as *key*.
+
+        With *if_none_match* set to ``"*"``, *key* is only created if it
+        doesn't exist; with *if_match*, it is only replaced if it still has
+        that ETag. `PreconditionFailed` is raised if the condition fails.
+        """
+        s3req = self.put_request(key, data=data, acl=acl, metadata=metadata,
+                                 mimetype=mimetype, transformer=transformer,
+                                 headers=headers, **conditions)
         self.send(s3req).close()
 
+    def put_buffer(self, key, data, acl=None, metadata={}, mimetype=None,
+                   headers={}, part_size=None, n_workers=None, progress=None):
+        """Put buffer-like *data*, or the contents of file *data*, as *key*.
+
+        *data* is any object supporting the buffer interface, e.g., a
+        `bytearray`, a `memoryview` or an `mmap.mmap`; a filename or a file
+        object with a ``fileno()`` is memory-mapped. It is hashed and sent
+        straight from memory, without being copied into strings.
+
+        Like with `StreamingMixin.put_file`, at least *multipart_threshold*
+        bytes are uploaded in parts of *part_size*, *n_workers* at a time.
+        """
+        if isinstance(data, basestring) or hasattr(data, "fileno"):
+            return self._put_mapped(key, data, acl=acl, metadata=metadata,
+                                    mimetype=mimetype, headers=headers,
+                                    part_size=part_size, n_workers=n_workers,
+                                    progress=progress)
+        if isinstance(data, mmap.mmap):
+            # Anything with a read method is sent a few kilobytes at a time.
+            data = buffer(data)
+        if len(data) < self.multipart_threshold:
+            self.put(key, data=data, acl=acl, metadata=metadata,
+                     mimetype=mimetype, headers=headers)
+            if progress:
+                progress(len(data), len(data), 0)
+            return
+        from .multipart import upload_parts, iter_buffer_parts, part_size_for
+        part_size = part_size_for(len(data),
+                                  part_size or self.multipart_part_size)
+        upload_parts(self, key, iter_buffer_parts(data, part_size),
+                     n_workers=n_workers or self.multipart_workers,
+                     progress=progress, size=len(data), acl=acl,
+                     metadata=metadata, mimetype=mimetype, headers=headers)
+
+    def put_files(self, items, n_workers=8, n_hashers=None, progress=None):
+        """Upload many files, hashing some while uploading others.
+
+        *items* are (path, key) or (path, key, options) tuples, *options*
+        being keyword arguments to `put`. See
+        `simples3.bulkupload.upload_files`, which this calls.
+        """
+        from .bulkupload import upload_files
+        return upload_files(self, items, n_workers=n_workers,
+                            n_hashers=n_hashers, progress=progress)
+
+    def put_stream(self, key, fp, acl=None, metadata={}, mimetype=None,
+                   headers={}, part_size=None, n_workers=None,
+                   max_buffered=None, progress=None):
+        """Put what can be read from *fp* as *key*, however long it is.
+
+        *fp* is a file-like object, e.g. a pipe or a socket, or an iterable of
+        strings. It is uploaded in parts of *part_size* as it is read, at most
+        *max_buffered* parts of it being held in memory at a time, or in one
+        request if it's shorter than a part. See
+        `simples3.multipart.upload_stream`.
+        """
+        from .multipart import upload_stream
+        headers = headers.copy()
+        for header in ("Content-Length", "Content-MD5"):
+            headers.pop(header, None)
+        return upload_stream(self, key, fp,
+                             part_size=part_size or self.multipart_part_size,
+                             n_workers=n_workers or self.multipart_workers,
+                             max_buffered=max_buffered, progress=progress,
+                             acl=acl, metadata=metadata, mimetype=mimetype,
+                             headers=headers)
+
+    def _put_mapped(self, key, fp, **kwds):
+        do_close = not hasattr(fp, "fileno")
+        if do_close:
+            fp = open(fp, "rb")
+        try:
+            size = os.fstat(fp.fileno()).st_size
+            if not size:
+                # Empty files can't be mapped.
+                return self.put_buffer(key, bytearray(), **kwds)
+            mapped = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                return self.put_buffer(key, mapped, **kwds)
+            finally:
+                mapped.close()
+        finally:
+            if do_close:
+                fp.close()
+
     def delete(self, *keys):
         n_keys = len(keys)
         if not keys:
@@ -332,51 +865,204 @@ class S3Bucket(object):
             try:
                 resp = self.send(self.request(method="DELETE", key=keys[0]))
             except KeyNotFound, e:
-                e.fp.close()
+                if e.fp:
+                    e.fp.close()
                 return False
             else:
+                resp.close()
                 return 200 <= resp.code < 300
         else:
             if n_keys > 1000:
                 raise ValueError("cannot delete more than 1000 keys at a time")
-            fmt = "<Object><Key>%s</Key></Object>"
-            body = "".join(fmt % escape(k) for k in keys)
-            data = ('<?xml version="1.0" encoding="UTF-8"?><Delete>'
-                    "<Quiet>true</Quiet>%s</Delete>") % body
-            headers = {"Content-Type": "multipart/form-data"}
-            resp = self.send(self.request(method="POST", data=data,
-                                          headers=headers, subresource="delete"))
-            return 200 <= resp.code < 300
-
-    # TODO Expose the conditional headers, x-amz-copy-source-if-*
+            return not self._delete_batch(keys)
+
+    def _delete_batch(self, keys):
+        """Delete up to 1000 *keys* in one request, returning the failures.
+
+        Failures are (key, code, message) tuples parsed from the response.
+        """
+        resp = self.send(self.delete_request(keys))
+        try:
+            return parse_delete_result(resp)
+        finally:
+            resp.close()
+
+    def delete_many(self, keys, n_workers=4):
+        """Delete any number of *keys*, several batches at a time.
+
+        *keys* can be any iterable of keys, or of `listdir` entries, tuples
+        or `ListEntry` records. It is consumed lazily and split into batches
+        of 1000 keys, which are sent on *n_workers* threads.
+
+        Returns a dict with the number of keys *deleted* and a list of
+        *errors*, (key, code, message) tuples for keys S3 refused to delete.
+        """
+        keys = (key.key if isinstance(key, ListEntry) else
+                key[0] if isinstance(key, tuple) else key for key in keys)
+        def send(batch):
+            return len(batch), self._delete_batch(batch)
+        rv = {"deleted": 0, "errors": []}
+        for n_keys, errors in imap(send, chunked(keys, 1000),
+                                   n_workers=n_workers, ordered=False):
+            rv["deleted"] += n_keys - len(errors)
+            rv["errors"].extend(errors)
+        return rv
+
+    def delete_prefix(self, prefix, n_workers=4):
+        """Delete all keys starting with *prefix*, see `delete_many`.
+
+        The listing is read while earlier batches are being deleted.
+        """
+        if not prefix:
+            raise ValueError("refusing to delete every key in the bucket")
+        return self.delete_many(self.listdir(prefix=prefix, lazy=True),
+                                n_workers=n_workers)
+
     # TODO Add module-level documentation and doctests.
+
     def copy(self, source, key, acl=None, metadata=None,
-             mimetype=None, headers={}):
+             mimetype=None, headers={}, **conditions):
         """Copy S3 file *source* on format '<bucket>/<key>' to *key*.
 
         If metadata is not None, replaces the metadata with given metadata,
         otherwise copies the previous metadata.
 
         Note that *acl* is not copied, but set to *private* by S3 if not given.
+
+        The copy can be made conditional on the source with *if_match*,
+        *if_none_match* (ETags), *if_modified_since* and *if_unmodified_since*
+        (datetimes); if they don't hold, `PreconditionFailed` is raised.
+        """
+        self.send(self.copy_request(source, key, acl=acl, metadata=metadata,
+                                    mimetype=mimetype, headers=headers,
+                                    **conditions)).close()
+
+    def copy_prefix(self, prefix, dest_prefix, acl=None, metadata=None,
+                    skip_existing=True, n_workers=8, part_size=None):
+        """Copy every key under *prefix* to the same key under *dest_prefix*.
+
+        Keys are copied as they are listed, *n_workers* at a time, those of
+        *multipart_copy_threshold* bytes or more in parts. See
+        `simples3.bulkcopy.copy_prefix`, which this calls.
+        """
+        from .bulkcopy import copy_prefix
+        return copy_prefix(self, prefix, dest_prefix, acl=acl,
+                           metadata=metadata, skip_existing=skip_existing,
+                           n_workers=n_workers, part_size=part_size)
+
+    def move_prefix(self, prefix, dest_prefix, acl=None, metadata=None,
+                    skip_existing=True, n_workers=8, part_size=None):
+        """Like `copy_prefix`, deleting the source keys once copied.
+
+        Only keys with the ETag of the source are skipped as already copied.
+        """
+        from .bulkcopy import move_prefix
+        return move_prefix(self, prefix, dest_prefix, acl=acl,
+                           metadata=metadata, skip_existing=skip_existing,
+                           n_workers=n_workers, part_size=part_size)
+
+    def initiate_multipart(self, key, acl=None, metadata={}, mimetype=None,
+                           headers={}):
+        """Start a multipart upload of *key*, returning its upload ID.
+
+        The arguments are those of `put`, which apply to the object once the
+        upload is completed.
         """
         headers = headers.copy()
-        headers.update({"Content-Type": mimetype or guess_mimetype(key)})
-        headers["X-AMZ-Copy-Source"] = source
+        headers["Content-Type"] = str(mimetype or headers.get("Content-Type")
+                                      or guess_mimetype(key))
+        headers.update(metadata_headers(metadata))
         if acl: headers["X-AMZ-ACL"] = acl
-        if metadata is not None:
-            headers["X-AMZ-Metadata-Directive"] = "REPLACE"
-            headers.update(metadata_headers(metadata))
-        else:
-            headers["X-AMZ-Metadata-Directive"] = "COPY"
-        self.send(self.request(method="PUT", key=key, headers=headers)).close()
+        s3req = self.request(method="POST", key=key, data="", headers=headers,
+                             subresource="uploads")
+        resp = self.send(s3req)
+        try:
+            root = _parse_xml(resp)
+        finally:
+            resp.close()
+        return root.findtext("{%s}UploadId" % amazon_s3_ns_url)
+
+    def upload_part(self, key, upload_id, part_number, data, headers={}):
+        """Upload part *part_number* of a multipart upload, returning its ETag.
 
-    def _get_listing(self, args):
-        return S3Listing.parse(self.send(self.request(key='', args=args)))
+        Parts are numbered from 1, and all but the last must be at least 5 MB.
+        """
+        headers = headers.copy()
+        headers["Content-Length"] = str(len(data))
+        subresource = "partNumber=%d&uploadId=%s" % (part_number, upload_id)
+        s3req = self.request(method="PUT", key=key, data=data,
+                             headers=headers, subresource=subresource)
+        resp = self.send(s3req)
+        resp.close()
+        return _headers(resp).get("etag")
+
+    def upload_part_copy(self, key, upload_id, part_number, source,
+                         byte_range=None, headers={}, **conditions):
+        """Copy a part of a multipart upload from *source*, returning its ETag.
+
+        *source* is on format '<bucket>/<key>' like for `copy`, and
+        *byte_range* an inclusive (first, last) pair of offsets into it, or
+        None for all of it. Conditions are those of `copy`.
+        """
+        headers = headers.copy()
+        headers["X-AMZ-Copy-Source"] = source
+        if byte_range is not None:
+            headers["X-AMZ-Copy-Source-Range"] = "bytes=%d-%d" % byte_range
+        headers.update(copy_condition_headers(**conditions))
+        subresource = "partNumber=%d&uploadId=%s" % (part_number, upload_id)
+        s3req = self.request(method="PUT", key=key, headers=headers,
+                             subresource=subresource)
+        resp = self.send(s3req)
+        try:
+            root = _parse_xml(resp)
+        finally:
+            resp.close()
+        if root.tag == "Error":
+            raise S3Error(root.findtext("Message") or "HTTP error",
+                          code=root.findtext("Code"), key=key)
+        return root.findtext("{%s}ETag" % amazon_s3_ns_url)
 
-    def listdir(self, prefix=None, marker=None, limit=None, delimiter=None):
+    def complete_multipart(self, key, upload_id, parts):
+        """Complete multipart upload given *parts*, (part_number, etag) pairs.
+
+        Returns the ETag of the resulting object.
+        """
+        fmt = "<Part><PartNumber>%d</PartNumber><ETag>%s</ETag></Part>"
+        body = "".join(fmt % (n, xml_escape(etag)) for (n, etag) in sorted(parts))
+        data = ('<?xml version="1.0" encoding="UTF-8"?>'
+                "<CompleteMultipartUpload>%s</CompleteMultipartUpload>") % body
+        headers = {"Content-Type": "text/xml"}
+        s3req = self.request(method="POST", key=key, data=data, headers=headers,
+                             subresource="uploadId=%s" % (upload_id,))
+        resp = self.send(s3req)
+        try:
+            root = _parse_xml(resp)
+        finally:
+            resp.close()
+        # S3 can report an error with a 200 OK once it has started replying.
+        if root.tag == "Error":
+            raise S3Error(root.findtext("Message") or "HTTP error",
+                          code=root.findtext("Code"), key=key)
+        return root.findtext("{%s}ETag" % amazon_s3_ns_url)
+
+    def abort_multipart(self, key, upload_id):
+        """Abort multipart upload, discarding the parts uploaded so far."""
+        s3req = self.request(method="DELETE", key=key,
+                             subresource="uploadId=%s" % (upload_id,))
+        self.send(s3req).close()
+
+    def _get_listing(self, args, **kwds):
+        return S3Listing.parse(self.send(self.request(key='', args=args)),
+                               **kwds)
+
+    def listdir(self, prefix=None, marker=None, limit=None, delimiter=None,
+                fields=None, lazy=False):
         """List bucket contents.
 
-        Yields tuples of (key, modified, etag, size).
+        Yields tuples of (key, modified, etag, size), or if *fields* is given,
+        tuples of just those fields, e.g. ``("key", "size")``. Parsing dates is
+        the costly part of a listing, so leave out "modified" if you can. If
+        *lazy*, yields `ListEntry` records, which parse dates only on demand.
 
         *prefix*, if given, predicates `key.startswith(prefix)`.
         *marker*, if given, predicates `key > marker`, lexicographically.
@@ -387,60 +1073,209 @@ class S3Bucket(object):
         .. note:: This method can make several requests to S3 if the listing is
                   very long.
         """
-        m = (("prefix", prefix),
-             ("marker", marker),
-             ("max-keys", limit),
-             ("delimiter", delimiter))
-        args = dict((str(k), str(v)) for (k, v) in m if v is not None)
-
-        listing = self._get_listing(args)
-        while listing:
+        args = listdir_args(prefix=prefix, marker=marker, limit=limit,
+                            delimiter=delimiter)
+        for listing in self._listings(args, fields=fields, lazy=lazy):
             for item in listing:
                 yield item
 
-            if listing.truncated:
-                args["marker"] = listing.next_marker
-                listing = self._get_listing(args)
-            else:
+    def _listings(self, args, **kwds):
+        """Yield each page of the listing given by *args*.
+
+        Each listing must be iterated through before the next is requested.
+        Keyword arguments are passed to `S3Listing`.
+        """
+        args = args.copy()
+        while True:
+            listing = self._get_listing(args, **kwds)
+            yield listing
+            if not listing.truncated:
                 break
+            args["marker"] = _argstr(listing.next_marker)
 
-    def make_url(self, key, args=None, arg_sep=";"):
-        s3req = self.request(key=key, args=args)
-        return s3req.url(self.base_url, arg_sep=arg_sep)
+    def listdir_parallel(self, prefix="", prefixes=None, delimiter=None,
+                         n_splits=None, ordered=True, n_workers=8):
+        """List bucket contents, several ranges of keys at a time.
 
-    def make_url_authed(self, key, expire=datetime.timedelta(minutes=5)):
-        """Produce an authenticated URL for S3 object *key*.
+        Yields tuples of (key, modified, etag, size) just like `listdir`.
 
-        *expire* is a delta or a datetime on which the authenticated URL
-        expires. It defaults to five minutes, and accepts a timedelta, an
-        integer delta in seconds, or a datetime.
+        The key space is split into disjoint ranges which are listed
+        concurrently on *n_workers* threads. How it's split depends on what's
+        given:
 
-        To generate an unauthenticated URL for a key, see `B.make_url`.
+        * *prefixes*, a list of prefixes to list (overlapping ones are
+          merged, and *prefix* is ignored),
+        * *delimiter*, which lists *prefix* with the delimiter and then each of
+          the common prefixes found,
+        * otherwise, the key space under *prefix* is probed for the characters
+          that follow it until there are at least *n_splits* ranges (by default
+          four per worker).
+
+        If *ordered*, keys are yielded in lexicographic order, with later
+        ranges read ahead while earlier ones are yielded. Otherwise keys are
+        yielded as they come in, which is faster.
         """
-        # NOTE There is a usecase for having a headers argument to this
-        # function - Amazon S3 will validate the X-AMZ-* headers of the GET
-        # request, and so for the browser to send such a header, it would have
-        # to be listed in the signature description.
-        expire = expire2datetime(expire)
-        expire = time.mktime(expire.timetuple()[:9])
-        expire = str(int(expire))
-        s3req = self.request(key=key, headers={"Date": expire})
-        sign = s3req.sign(self)
-        s3req.args = (("AWSAccessKeyId", self.access_key),
-                      ("Expires", expire),
-                      ("Signature", sign))
-        return s3req.url(self.base_url, arg_sep="&")
+        if prefixes is not None:
+            units = [("prefix", p) for p in _disjoint_prefixes(prefixes)]
+        elif delimiter is not None:
+            units = self._fan_out(prefix, delimiter)
+        else:
+            units = self._split_keyspace(prefix, n_splits or 4 * n_workers)
+        pages = (self._unit_pages(unit) for unit in units)
+        if ordered:
+            pages = chain_ahead(pages, n_ahead=n_workers, maxsize=4)
+        else:
+            pages = interleave(pages, n_workers=n_workers)
+        for page in pages:
+            for item in page:
+                yield item
 
-    def url_for(self, key, authenticated=False,
-                expire=datetime.timedelta(minutes=5)):
-        msg = "use %s instead of url_for(authenticated=%r)"
-        dep_cls = DeprecationWarning
-        if authenticated:
-            warnings.warn(dep_cls(msg % ("make_url_authed", True)))
-            return self.make_url_authed(key, expire=expire)
+    def _unit_pages(self, unit):
+        kind, value = unit
+        if kind == "key":
+            yield [value]
         else:
-            warnings.warn(dep_cls(msg % ("make_url", False)))
-            return self.make_url(key)
+            for listing in self._listings({"prefix": _argstr(value)}):
+                yield list(listing)
+
+    def _fan_out(self, prefix, delimiter):
+        """List *prefix* with *delimiter* into a sorted list of units.
+
+        Units are ("key", item) for keys right under *prefix*, and
+        ("prefix", p) for each common prefix.
+        """
+        args = {"prefix": _argstr(prefix), "delimiter": _argstr(delimiter)}
+        units = []
+        for listing in self._listings(args):
+            units.extend(("key", item) for item in listing)
+            units.extend(("prefix", p) for p in listing.prefixes)
+        units.sort(key=_unit_sort_key)
+        return units
+
+    def _split_keyspace(self, prefix, n_splits, max_depth=3):
+        """Split keys under *prefix* into *n_splits* units or more.
+
+        Prefixes are expanded breadth-first into the prefixes one character
+        longer that actually exist, down to *max_depth* characters past
+        *prefix*.
+        """
+        units = [("prefix", prefix)]
+        for depth in xrange(max_depth):
+            expanded = []
+            for idx, (kind, value) in enumerate(units):
+                if len(expanded) + len(units) - idx >= n_splits:
+                    expanded.extend(units[idx:])
+                    break
+                elif kind == "prefix":
+                    expanded.extend(self._skip_scan(value))
+                else:
+                    expanded.append((kind, value))
+            units = expanded
+            if len(units) >= n_splits:
+                break
+        return units
+
+    def _skip_scan(self, prefix):
+        """Find the units one character longer than *prefix*.
+
+        Makes one single-key listing request per unit found, skipping over
+        all keys sharing that next character.
+        """
+        units = []
+        n = len(prefix)
+        marker = None
+        while True:
+            for item in self.listdir(prefix=prefix, marker=marker, limit=1):
+                break
+            else:
+                break
+            key = item[0]
+            if len(key) == n:
+                units.append(("key", item))
+                marker = key
+            else:
+                units.append(("prefix", key[:n + 1]))
+                marker = key[:n + 1] + max_key_char
+        return units
+
+    def exists_many(self, keys, n_workers=8):
+        """Check whether each of *keys* exists, returning a dict of booleans.
+
+        See `info_many`.
+        """
+        return dict((key, info is not None) for (key, info)
+                    in self.info_many(keys, n_workers=n_workers).iteritems())
+
+    def info_many(self, keys, n_workers=8):
+        """Look up *keys*, mapping each to (modified, etag, size) or None.
+
+        Sorted keys are grouped by "directory", i.e., up to the last slash.
+        Groups of at least *listing_min_keys* keys are answered from listing
+        pages, each starting at the next key yet to be answered, for as long
+        as a page answers *listing_min_hits* keys or more. Keys not answered
+        so are looked up with HEAD requests. Both run on *n_workers* threads.
+        """
+        originals = {}
+        for key in keys:
+            originals.setdefault(_unikey(key), []).append(key)
+        groups = [list(group) for (dirname, group)
+                  in itertools.groupby(sorted(originals), key=_dirname)]
+        found = {}
+        heads = []
+        listed = []
+        for group in groups:
+            if len(group) >= self.listing_min_keys:
+                listed.append(group)
+            else:
+                heads.extend(group)
+        for resolved, rest in imap(self._info_listed, listed,
+                                   n_workers=n_workers, ordered=False):
+            found.update(resolved)
+            heads.extend(rest)
+        found.update(imap(self._info_head, heads, n_workers=n_workers,
+                          ordered=False))
+        return dict((key, found[ukey]) for (ukey, keys)
+                    in originals.iteritems() for key in keys)
+
+    def _info_listed(self, group):
+        """Answer sorted keys *group* from listings of their directory.
+
+        Returns a dict of the answers, and a list of the keys left for HEAD
+        requests because listing became too sparse.
+        """
+        args = {"prefix": _argstr(_dirname(group[0]))}
+        resolved = {}
+        idx = 0
+        while idx < len(group):
+            marker = _key_before(group[idx])
+            if marker is not None:
+                args["marker"] = _argstr(marker)
+            hits = 0
+            listing = self._get_listing(args)
+            for item in listing:
+                key = _unikey(item[0])
+                while idx < len(group) and group[idx] < key:
+                    resolved[group[idx]] = None
+                    idx += 1
+                if idx < len(group) and group[idx] == key:
+                    resolved[key] = item[1:]
+                    idx += 1
+                    hits += 1
+            if not listing.truncated:
+                resolved.update((key, None) for key in group[idx:])
+                return resolved, []
+            elif hits < self.listing_min_hits:
+                return resolved, group[idx:]
+        return resolved, []
+
+    def _info_head(self, key):
+        try:
+            info = self.info(key)
+        except KeyNotFound:
+            return key, None
+        headers = info["headers"]
+        return key, (info["modify"], headers.get("etag"),
+                     int(headers["content-length"]))
 
     def put_bucket(self, config_xml=None, acl=None):
         if config_xml:
@@ -460,6 +1295,120 @@ class S3Bucket(object):
     def delete_bucket(self):
         return self.delete(None)
 
+def _headers(resp):
+    """The headers of *resp* as a dict, only copied if they aren't one."""
+    headers = resp.info()
+    if not isinstance(headers, dict):
+        headers = dict(headers)
+    return headers
+
+def _parse_xml(fp):
+    """Parse the XML document read from *fp*, returning its root element."""
+    from xml.etree import cElementTree as ElementTree
+    return ElementTree.parse(fp).getroot()
+
+def parse_delete_result(fp):
+    """Parse the (key, code, message) errors of a multi-object delete."""
+    root = _parse_xml(fp)
+    tag = lambda name: "{%s}%s" % (amazon_s3_ns_url, name)
+    return [(el.findtext(tag("Key")), el.findtext(tag("Code")),
+             el.findtext(tag("Message")))
+            for el in root.findall(tag("Error"))]
+
+def condition_headers(if_match=None, if_none_match=None,
+                      if_modified_since=None, if_unmodified_since=None,
+                      prefix=""):
+    """Make the If-* headers of a conditional request, named with *prefix*.
+
+    >>> sorted(condition_headers(if_none_match='"abc"').items())
+    [('If-None-Match', '"abc"')]
+    """
+    headers = {}
+    if if_match:
+        headers[prefix + "If-Match"] = if_match
+    if if_none_match:
+        headers[prefix + "If-None-Match"] = if_none_match
+    if if_modified_since:
+        headers[prefix + "If-Modified-Since"] = \
+            rfc822_fmtdate(if_modified_since)
+    if if_unmodified_since:
+        headers[prefix + "If-Unmodified-Since"] = \
+            rfc822_fmtdate(if_unmodified_since)
+    return headers
+
+def copy_condition_headers(if_match=None, if_none_match=None,
+                           if_modified_since=None, if_unmodified_since=None):
+    """Make the x-amz-copy-source-if-* headers for a copy.
+
+    >>> sorted(copy_condition_headers(if_match='"abc"').items())
+    [('X-AMZ-Copy-Source-If-Match', '"abc"')]
+    """
+    return condition_headers(if_match, if_none_match, if_modified_since,
+                             if_unmodified_since, prefix="X-AMZ-Copy-Source-")
+
+def listdir_args(prefix=None, marker=None, limit=None, delimiter=None):
+    """Make the query arguments of a listing request."""
+    m = (("prefix", prefix),
+         ("marker", marker),
+         ("max-keys", limit),
+         ("delimiter", delimiter))
+    return dict((str(k), _argstr(v)) for (k, v) in m if v is not None)
+
+def _rewinder(data):
+    """Make a function that rewinds request body *data* for another attempt,
+    or give None if it can't be sent again.
+    """
+    if not hasattr(data, "read"):
+        return lambda: None
+    try:
+        pos = data.tell()
+    except (AttributeError, IOError):
+        return None
+    return lambda: data.seek(pos)
+
+def _unikey(key):
+    if isinstance(key, str):
+        return key.decode("utf-8")
+    return key
+
+def _dirname(key):
+    return key[:key.rfind("/") + 1]
+
+def _key_before(key):
+    r"""Make a marker that lists *key* first, or None to list from the start.
+
+    >>> _key_before(u"ab") == u"aa" + max_key_char
+    True
+    >>> _key_before(u"a\x00"), _key_before(u"")
+    (u'a', None)
+    """
+    if not key:
+        return None
+    elif key[-1] == u"\x00":
+        return key[:-1] or None
+    return key[:-1] + unichr(ord(key[-1]) - 1) + max_key_char
+
+def _argstr(v):
+    if isinstance(v, unicode):
+        return v.encode("utf-8")
+    return str(v)
+
+def _unit_sort_key(unit):
+    kind, value = unit
+    return value[0] if kind == "key" else value
+
+def _disjoint_prefixes(prefixes):
+    """Sort *prefixes*, dropping those covered by a shorter one.
+
+    >>> _disjoint_prefixes(["b/", "a/x", "a/", "ab"])
+    ['a/', 'ab', 'b/']
+    """
+    rv = []
+    for prefix in sorted(prefixes):
+        if not rv or not prefix.startswith(rv[-1]):
+            rv.append(prefix)
+    return rv
+
 class ReadOnlyS3Bucket(S3Bucket):
     """Read-only S3 bucket.
 
@@ -470,3 +1419,36 @@ class ReadOnlyS3Bucket(S3Bucket):
 
     def build_opener(self):
         return None
+
+    def build_transport(self):
+        return None
+
+class _BucketModule(types.ModuleType):
+    """Stands in for this module in `sys.modules`, so that `_opener_names`
+    can be imported from it without importing `simples3.opener` up front.
+
+    Everything else is looked up on, and set on, the module itself, whose
+    namespace is also its `__dict__`, for `vars` and doctest.
+    """
+
+    def __init__(self, module):
+        types.ModuleType.__init__(self, module.__name__, module.__doc__)
+        types.ModuleType.__setattr__(self, "_module", module)
+
+    @property
+    def __dict__(self):
+        return self._module.__dict__
+
+    def __getattr__(self, name):
+        if name in _opener_names:
+            from . import opener
+            return getattr(opener, name)
+        return getattr(self._module, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._module, name, value)
+
+    def __delattr__(self, name):
+        delattr(self._module, name)
+
+sys.modules[__name__] = _BucketModule(sys.modules[__name__])
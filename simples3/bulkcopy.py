@@ -0,0 +1,167 @@
+"""Copying and moving prefixes server-side
+
+Every key under a prefix is copied to the same key under another prefix, as
+the keys are listed, by a pool of threads. Objects of *multipart_copy_threshold*
+bytes or more are copied in ranges with `simples3.multipart.copy_object`,
+which is also the only way to copy objects over 5 GB::
+
+    >>> rv = copy_prefix(bucket, "logs/2012/", "archive/logs/2012/")
+    >>> rv["copied"], rv["skipped"], rv["errors"]
+    (52310, 0, [])
+
+Each copy is made on condition that the source still has the ETag it was
+listed with, so a key overwritten meanwhile is reported as an error rather
+than copied in a state nobody listed. With *skip_existing*, the destination
+prefix is listed alongside the source, and keys already copied by an earlier
+run are skipped: that is, keys with the same size, and either the same ETag
+or a modification time no older than the source's.
+
+`move_prefix` deletes the source keys in batches as they are copied, or
+skipped as already copied, while the copying carries on. Since a source is
+lost once deleted, moves only take a key to be copied if it has the ETag of
+the source; any other is copied over.
+"""
+
+from __future__ import absolute_import
+
+from .bucket import S3Error
+from .utils import aws_urlquote
+from .concurrency import imap
+from .sync import _utf8
+
+def pair_listings(bucket, prefix, dest_prefix, skip_existing=True):
+    """Yield (entry, dest_entry) for every key listed under *prefix*.
+
+    *dest_entry* is the `ListEntry` of the key under *dest_prefix*, or None if
+    there is none or *skip_existing* is false.
+    """
+    cut, dest_cut = len(prefix), len(dest_prefix)
+    source = bucket.listdir(prefix=prefix, lazy=True)
+    if not skip_existing:
+        for entry in source:
+            yield entry, None
+        return
+    dest = bucket.listdir(prefix=dest_prefix, lazy=True)
+    dnext = next(dest, None)
+    for entry in source:
+        rkey = _utf8(entry.key)[cut:]
+        while dnext is not None and _utf8(dnext.key)[dest_cut:] < rkey:
+            dnext = next(dest, None)
+        if dnext is not None and _utf8(dnext.key)[dest_cut:] == rkey:
+            yield entry, dnext
+        else:
+            yield entry, None
+
+def is_copied(entry, dest, strict=False):
+    """Tell if *dest* looks like a copy of *entry*.
+
+    Unless *strict*, a key of the same size modified no earlier than *entry*
+    is taken to be a copy, even with another ETag, as those of objects
+    copied in parts are.
+    """
+    if dest is None or dest.size != entry.size:
+        return False
+    return dest.etag == entry.etag or (not strict and
+                                       dest.mtime >= entry.mtime)
+
+def copy_entry(bucket, entry, dest_key, acl=None, metadata=None,
+               part_size=None, n_workers=None):
+    """Copy the key of listing *entry* to *dest_key*, if it still has the
+    ETag it was listed with.
+
+    Large objects are copied in parts of *part_size*, *n_workers* at a time,
+    by default *multipart_copy_part_size* and *multipart_workers*.
+    """
+    source = aws_urlquote("%s/%s" % (bucket.name, _utf8(entry.key)))
+    conditions = {"if_match": entry.etag}
+    if entry.size < bucket.multipart_copy_threshold:
+        bucket.copy(source, dest_key, acl=acl, metadata=metadata,
+                    **conditions)
+        return
+    from .multipart import copy_object
+    mimetype = None
+    if metadata is None:
+        # Copying in parts copies nothing but the data.
+        info = bucket.info(entry.key)
+        metadata, mimetype = info["metadata"], info.get("mimetype")
+    copy_object(bucket, source, dest_key, entry.size,
+                part_size=part_size or bucket.multipart_copy_part_size,
+                n_workers=n_workers or bucket.multipart_workers,
+                conditions=conditions, acl=acl,
+                metadata=metadata, mimetype=mimetype)
+
+def iter_copy_prefix(bucket, prefix, dest_prefix, acl=None, metadata=None,
+                     skip_existing=True, n_workers=8, part_size=None,
+                     strict=False):
+    """Copy keys under *prefix*, yielding (entry, outcome) as they're done.
+
+    The *outcome* is "copied", "skipped", or for a source key that was
+    deleted or changed since it was listed, the `S3Error` raised copying it.
+    Any other error is raised. *strict* is passed on to `is_copied`.
+    """
+    prefix, dest_prefix = _utf8(prefix), _utf8(dest_prefix)
+    if prefix.startswith(dest_prefix) or dest_prefix.startswith(prefix):
+        raise ValueError("prefixes %r and %r overlap" % (prefix, dest_prefix))
+    cut = len(prefix)
+    def copy(pair):
+        entry, dest = pair
+        if is_copied(entry, dest, strict=strict):
+            return entry, "skipped"
+        dest_key = dest_prefix + _utf8(entry.key)[cut:]
+        try:
+            copy_entry(bucket, entry, dest_key, acl=acl, metadata=metadata,
+                       part_size=part_size)
+        except S3Error, e:
+            if e.code not in (404, 412):
+                raise
+            return entry, e
+        return entry, "copied"
+    pairs = pair_listings(bucket, prefix, dest_prefix,
+                          skip_existing=skip_existing)
+    return imap(copy, pairs, n_workers=n_workers, ordered=False)
+
+def _tally(rv, entry, outcome):
+    if isinstance(outcome, S3Error):
+        rv["errors"].append((entry.key, outcome.code, str(outcome)))
+        return False
+    rv[outcome] += 1
+    rv[outcome + "_bytes"] += entry.size
+    return True
+
+def _counts():
+    return {"copied": 0, "copied_bytes": 0, "skipped": 0, "skipped_bytes": 0,
+            "errors": []}
+
+def copy_prefix(bucket, prefix, dest_prefix, **kwds):
+    """Copy every key under *prefix* to the same key under *dest_prefix*.
+
+    Keyword arguments are those of `iter_copy_prefix`. Returns a dict with
+    the number of keys *copied* and *skipped*, the bytes of each
+    (*copied_bytes* and *skipped_bytes*), and a list of *errors*, (key, code,
+    message) tuples for keys deleted or changed since they were listed.
+    """
+    rv = _counts()
+    for entry, outcome in iter_copy_prefix(bucket, prefix, dest_prefix,
+                                           **kwds):
+        _tally(rv, entry, outcome)
+    return rv
+
+def move_prefix(bucket, prefix, dest_prefix, **kwds):
+    """Move every key under *prefix* to the same key under *dest_prefix*.
+
+    Like `copy_prefix`, except that source keys are deleted with
+    `S3Bucket.delete_many` once copied, and only keys with the ETag of the
+    source are skipped; the dict returned also has the number of keys
+    *deleted*, and errors deleting keys among the *errors*.
+    """
+    rv = _counts()
+    def moved():
+        for entry, outcome in iter_copy_prefix(bucket, prefix, dest_prefix,
+                                               strict=True, **kwds):
+            if _tally(rv, entry, outcome):
+                yield entry.key
+    deleted = bucket.delete_many(moved(),
+                                 n_workers=kwds.get("n_workers", 8))
+    rv["deleted"] = deleted["deleted"]
+    rv["errors"].extend(deleted["errors"])
+    return rv
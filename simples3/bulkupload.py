@@ -0,0 +1,121 @@
+"""Uploading many files
+
+Files are hashed by one pool of threads and uploaded by another, so that
+hashing the next files overlaps with sending the previous ones instead of
+taking turns with it on every upload thread. Files are hashed whole from
+memory mappings; hashlib lets go of the GIL while it hashes, so the hashing
+threads run on all cores. Only so many files are hashed ahead of the
+uploads::
+
+    >>> rv = upload_files(bucket, [("site/index.html", "www/index.html"),
+    ...                            ("site/logo.png", "www/logo.png",
+    ...                             {"acl": "public-read"})])
+    >>> rv["uploaded"], rv["uploaded_bytes"]
+    (2, 3150848)
+
+Files of *multipart_threshold* bytes or more skip the hashing pool, and are
+uploaded in parts, each hashed as it is sent. Files with a *transformer*,
+which changes what is sent, aren't hashed ahead either; they are put in one
+request whatever their size, like files given any other option only
+`S3Bucket.put` takes, such as *if_none_match*.
+"""
+
+from __future__ import absolute_import
+
+import os
+import mmap
+import multiprocessing
+from contextlib import contextmanager
+
+from .utils import aws_md5
+from .concurrency import imap
+
+# Options `S3Bucket.put_buffer` takes too, and so those files uploaded in parts
+# can be given.
+_buffer_options = frozenset(("acl", "metadata", "mimetype", "headers"))
+
+@contextmanager
+def mapped_file(path):
+    """Map the file at *path*, yielding the mapping, or "" if it's empty."""
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if not size:
+            # Empty files can't be mapped.
+            yield ""
+            return
+        mapped = mmap.mmap(fp.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+class FileUpload(object):
+    """A file at *path* to upload as *key*, with `S3Bucket.put` *options*.
+
+    *md5* is set once it's been hashed.
+    """
+
+    __slots__ = ("path", "key", "options", "size", "md5")
+
+    def __init__(self, path, key, options=None):
+        self.path = path
+        self.key = key
+        self.options = options or {}
+        self.size = os.path.getsize(path)
+        self.md5 = None
+
+    def __repr__(self):
+        return "<%s %r as %r>" % (self.__class__.__name__, self.path,
+                                  self.key)
+
+    def hash(self):
+        # What a transformer makes of the file is hashed as it is put.
+        if not self.options.get("transformer"):
+            with mapped_file(self.path) as data:
+                self.md5 = aws_md5(data)
+        return self
+
+    def send(self, bucket):
+        options = dict(self.options)
+        if self.md5 is None and _buffer_options.issuperset(options):
+            bucket.put_buffer(self.key, self.path, **options)
+            return
+        headers = dict(options.pop("headers", {}))
+        if self.md5 is not None:
+            headers["Content-Length"] = str(self.size)
+            headers["Content-MD5"] = self.md5
+        with mapped_file(self.path) as data:
+            bucket.put(self.key, data=buffer(data), headers=headers,
+                       **options)
+
+def upload_files(bucket, items, n_workers=8, n_hashers=None, progress=None):
+    """Upload files given by *items*, (path, key) or (path, key, options)
+    tuples, where *options* are keyword arguments to `S3Bucket.put`.
+
+    Files are hashed on *n_hashers* threads, by default one per CPU, and
+    uploaded on *n_workers* threads. *progress* is called as ``progress(sent,
+    None, size)`` as each file is done, *sent* being the bytes sent so far.
+    Returns a dict with the number of files *uploaded*, and their total size
+    *uploaded_bytes*.
+    """
+    if n_hashers is None:
+        n_hashers = multiprocessing.cpu_count()
+    threshold = bucket.multipart_threshold
+    def make_uploads():
+        for item in items:
+            yield FileUpload(*item)
+    def hash(upload):
+        if upload.size < threshold:
+            upload.hash()
+        return upload
+    def send(upload):
+        upload.send(bucket)
+        return upload
+    hashed = imap(hash, make_uploads(), n_workers=n_hashers, ordered=False)
+    rv = {"uploaded": 0, "uploaded_bytes": 0}
+    for upload in imap(send, hashed, n_workers=n_workers, ordered=False):
+        rv["uploaded"] += 1
+        rv["uploaded_bytes"] += upload.size
+        if progress:
+            progress(rv["uploaded_bytes"], None, upload.size)
+    return rv
@@ -0,0 +1,361 @@
+"""Read-through caching of objects on local disk
+
+Objects fetched with `get` are kept in a directory along with their headers,
+and fetched again only if S3 says they have changed: requests for cached keys
+are made with ``If-None-Match`` on the stored ETag, so an unchanged object
+costs a 304 reply and no body transfer. Missing keys are remembered for
+*negative_ttl* seconds. The least recently used objects are evicted to keep
+the cache within *max_size* bytes.
+
+Usage::
+
+    >>> bucket = CachingS3Bucket("foo.com", access_key=..., secret_key=...,
+    ...                          cache=DiskCache("/var/cache/foo"))
+    >>> bucket.get("my file").read()  # Fetched and stored,
+    'my content'
+    >>> bucket.get("my file").read()  # then only revalidated.
+    'my content'
+
+Writes made through the same bucket (`put`, `delete`, `copy` and the like)
+invalidate what they touch; writes made elsewhere are noticed on revalidation.
+"""
+
+from __future__ import absolute_import
+
+import os
+import time
+import errno
+import hashlib
+import tempfile
+import threading
+import cPickle as pickle
+from collections import OrderedDict
+
+from .bucket import S3Bucket, KeyNotFound, NotModified
+from .utils import info_dict
+
+class CacheEntry(object):
+    __slots__ = ("name", "size", "headers", "validated")
+
+    def __init__(self, name, size, headers, validated):
+        self.name = name
+        self.size = size
+        self.headers = headers
+        self.validated = validated
+
+    @property
+    def etag(self):
+        return self.headers.get("etag")
+
+class CachedResponse(object):
+    """A response served from the cache, with the interface of a urllib2
+    response.
+    """
+
+    code = 200
+    msg = "OK"
+
+    def __init__(self, fp, headers, url):
+        self.fp = fp
+        self.headers = headers
+        self.url = url
+        self.read = fp.read
+        self.readline = fp.readline
+        self.readlines = fp.readlines
+
+    def __iter__(self):
+        return iter(self.fp)
+
+    def close(self):
+        self.fp.close()
+
+    def info(self): return self.headers
+    def getcode(self): return self.code
+    def geturl(self): return self.url
+
+class DiskCache(object):
+    """Cache of objects in directory *path*, at most *max_size* bytes.
+
+    Objects larger than *max_entry_size* are not cached. Entries validated
+    less than *max_age* seconds ago are served without asking S3.
+    """
+
+    def __init__(self, path, max_size=256 << 20, max_entry_size=None,
+                 max_age=0.0, negative_ttl=5.0):
+        self.path = path
+        self.max_size = max_size
+        if max_entry_size is None:
+            max_entry_size = max_size // 4
+        self.max_entry_size = max_entry_size
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.missing = {}
+        self.size = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._load()
+
+    def __repr__(self):
+        return "<%s %r, %d entries, %d bytes>" % (
+            self.__class__.__name__, self.path, len(self.entries), self.size)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _load(self):
+        """Index the entries already in the directory, oldest used first."""
+        found = []
+        for fn in os.listdir(self.path):
+            if not fn.endswith(".meta"):
+                continue
+            name = fn[:-5]
+            try:
+                with open(self._file(name, "meta"), "rb") as fp:
+                    ckey, headers = pickle.load(fp)
+                st = os.stat(self._file(name, "body"))
+            except (EnvironmentError, ValueError, EOFError,
+                    pickle.UnpicklingError):
+                self._unlink(name)
+                continue
+            found.append((st.st_mtime, ckey, name, st.st_size, headers))
+        found.sort()
+        for mtime, ckey, name, size, headers in found:
+            self.entries[ckey] = CacheEntry(name, size, headers, 0.0)
+            self.size += size
+        self._evict()
+
+    def _file(self, name, ext):
+        return os.path.join(self.path, "%s.%s" % (name, ext))
+
+    def _unlink(self, name):
+        for ext in ("body", "meta"):
+            try:
+                os.unlink(self._file(name, ext))
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def _evict(self):
+        while self.size > self.max_size and self.entries:
+            ckey, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            self._unlink(entry.name)
+
+    def lookup(self, ckey):
+        """Get the entry of *ckey*, marking it as recently used, or None."""
+        with self.lock:
+            entry = self.entries.pop(ckey, None)
+            if entry is not None:
+                self.entries[ckey] = entry
+            return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.validated < self.max_age
+
+    def validated(self, entry):
+        """Note that S3 says *entry* is still current."""
+        entry.validated = time.time()
+        try:
+            os.utime(self._file(entry.name, "body"), None)
+        except OSError:
+            pass
+
+    def open(self, entry, url):
+        """Open *entry* as a `CachedResponse`, or give None if it's gone."""
+        try:
+            fp = open(self._file(entry.name, "body"), "rb")
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+        return CachedResponse(fp, entry.headers.copy(), url)
+
+    def cacheable(self, headers):
+        size = headers.get("content-length")
+        return ("etag" in headers and size is not None
+                and int(size) <= self.max_entry_size)
+
+    def store(self, ckey, headers, fp, chunk_size=64 << 10):
+        """Store the body read from *fp* with *headers* as *ckey*."""
+        name = hashlib.sha1(ckey).hexdigest()
+        # Temporary files by extension, until renamed into place.
+        tmp = {}
+        try:
+            fd, tmp["body"] = tempfile.mkstemp(dir=self.path, prefix=".body-")
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = fp.read(chunk_size)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                size = out.tell()
+            fd, tmp["meta"] = tempfile.mkstemp(dir=self.path, prefix=".meta-")
+            with os.fdopen(fd, "wb") as out:
+                pickle.dump((ckey, headers), out, pickle.HIGHEST_PROTOCOL)
+            entry = CacheEntry(name, size, headers, time.time())
+            with self.lock:
+                old = self.entries.pop(ckey, None)
+                if old is not None:
+                    self.size -= old.size
+                try:
+                    for ext in ("body", "meta"):
+                        os.rename(tmp[ext], self._file(name, ext))
+                        del tmp[ext]
+                except EnvironmentError:
+                    # Don't leave a body with another object's meta.
+                    self._unlink(name)
+                    raise
+                self.entries[ckey] = entry
+                self.size += size
+                self.missing.pop(ckey, None)
+                self._evict()
+        finally:
+            for path in tmp.itervalues():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        return entry
+
+    def discard(self, ckey):
+        """Forget anything known about *ckey*."""
+        with self.lock:
+            self._discard(ckey)
+
+    def _discard(self, ckey):
+        self.missing.pop(ckey, None)
+        entry = self.entries.pop(ckey, None)
+        if entry is not None:
+            self.size -= entry.size
+            self._unlink(entry.name)
+
+    def clear(self):
+        with self.lock:
+            for entry in self.entries.itervalues():
+                self._unlink(entry.name)
+            self.entries.clear()
+            self.missing.clear()
+            self.size = 0
+
+    def mark_missing(self, ckey):
+        with self.lock:
+            self._discard(ckey)
+            self.missing[ckey] = time.time() + self.negative_ttl
+
+    def is_missing(self, ckey):
+        expires = self.missing.get(ckey)
+        if expires is None:
+            return False
+        elif expires < time.time():
+            self.missing.pop(ckey, None)
+            return False
+        return True
+
+class CachingMixin(object):
+    """Serve `get` and `info` through *cache*, a `DiskCache`.
+
+    Requests with extra headers (e.g. ``Range``) bypass the cache.
+    """
+
+    cache = None
+
+    def __init__(self, *args, **kwds):
+        cache = kwds.pop("cache", None)
+        super(CachingMixin, self).__init__(*args, **kwds)
+        if cache is not None:
+            self.cache = cache
+
+    def _cache_key(self, key):
+        if isinstance(key, unicode):
+            key = key.encode("utf-8")
+        return "%s/%s" % (self.base_url, key)
+
+    def _cached(self, key):
+        """Look up *key*, raising KeyNotFound if it's known to be missing."""
+        ckey = self._cache_key(key)
+        if self.cache.is_missing(ckey):
+            raise KeyNotFound("key is missing (cached)", code=404, key=key)
+        return ckey, self.cache.lookup(ckey)
+
+    def _revalidate(self, ckey, key, entry, method):
+        """Send a conditional request for *key*, returning the response, or
+        None if *entry* is still current.
+        """
+        headers = {}
+        if entry is not None:
+            headers["If-None-Match"] = entry.etag
+        try:
+            return self.send(self.request(method=method, key=key,
+                                          headers=headers))
+        except KeyNotFound:
+            self.cache.mark_missing(ckey)
+            raise
+        except NotModified, e:
+            if entry is None:
+                raise
+            if e.fp:
+                e.fp.close()
+            self.cache.validated(entry)
+            return None
+
+    def get(self, key, headers={}, decompress=None, **conditions):
+        if self.cache is None or headers or conditions:
+            return super(CachingMixin, self).get(key, headers=headers,
+                                                 decompress=decompress,
+                                                 **conditions)
+        ckey, entry = self._cached(key)
+        url = self.request(key=key).url(self.base_url)
+        while True:
+            if entry is not None and self.cache.is_fresh(entry):
+                response = None
+            else:
+                response = self._revalidate(ckey, key, entry, "GET")
+            if response is not None:
+                resp_headers = dict(response.info())
+                if not self.cache.cacheable(resp_headers):
+                    self.cache.discard(ckey)
+                    response.s3_info = info_dict(resp_headers)
+                    return self._decoded(response, decompress)
+                try:
+                    entry = self.cache.store(ckey, resp_headers, response)
+                finally:
+                    response.close()
+            rv = self.cache.open(entry, url)
+            if rv is not None:
+                rv.s3_info = info_dict(dict(rv.info()))
+                return self._decoded(rv, decompress)
+            # Evicted in the meantime, so fetch it all over again.
+            entry = None
+
+    def info(self, key, **conditions):
+        if self.cache is None or conditions:
+            return super(CachingMixin, self).info(key, **conditions)
+        ckey, entry = self._cached(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            return info_dict(entry.headers.copy())
+        response = self._revalidate(ckey, key, entry, "HEAD")
+        if response is None:
+            return info_dict(entry.headers.copy())
+        headers = dict(response.info())
+        response.close()
+        if entry is not None and headers.get("etag") != entry.etag:
+            self.cache.discard(ckey)
+        return info_dict(headers)
+
+    def send(self, s3req):
+        # Anything but reading may change the key, so forget it whatever the
+        # outcome.
+        if (self.cache is not None and s3req.key
+                and s3req.method not in ("GET", "HEAD")):
+            self.cache.discard(self._cache_key(s3req.key))
+        return super(CachingMixin, self).send(s3req)
+
+    def _delete_batch(self, keys):
+        if self.cache is not None:
+            for key in keys:
+                self.cache.discard(self._cache_key(key))
+        return super(CachingMixin, self)._delete_batch(keys)
+
+class CachingS3Bucket(CachingMixin, S3Bucket): pass
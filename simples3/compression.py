@@ -0,0 +1,163 @@
+"""Compressing uploads and decompressing downloads on the fly
+
+`GzipTransformer` and `DeflateTransformer` are transformers for `S3Bucket.put`
+and `StreamingMixin.put_file`. Given a string, they compress it and set
+``Content-Encoding``; given a file, `put_file` reads it through a
+`CompressingReader`, which holds no more than a chunk of input and what it
+compresses to, and uploads the result in parts since its length isn't known
+in advance::
+
+    >>> bucket.put_file("logs/big.log", "big.log", transformer=gzip_transformer)
+
+`S3Bucket.get` undoes ``Content-Encoding`` if asked to, reading the response
+through a `DecompressingReader`::
+
+    >>> bucket.get("logs/big.log", decompress=True).read(15)
+    '127.0.0.1 - - ['
+"""
+
+from __future__ import absolute_import
+
+import zlib
+
+# Window bits for zlib to write or read a gzip header, or a zlib one.
+_wbits = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+class CompressingReader(object):
+    """File-like object reading *fp* compressed with *encoding*.
+
+    *fp* is read *chunk_size* bytes at a time, as more output is needed.
+    """
+
+    chunk_size = 64 << 10
+
+    def __init__(self, fp, encoding="gzip", level=6):
+        self.fp = fp
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                           _wbits[encoding])
+        self.buf = ""
+        self.eof = False
+
+    def read(self, n=-1):
+        while not self.eof and (n < 0 or len(self.buf) < n):
+            chunk = self.fp.read(self.chunk_size)
+            if chunk:
+                self.buf += self.compressor.compress(chunk)
+            else:
+                self.buf += self.compressor.flush()
+                self.eof = True
+        if n < 0:
+            n = len(self.buf)
+        data, self.buf = self.buf[:n], self.buf[n:]
+        return data
+
+    def close(self):
+        self.fp.close()
+
+class DecompressingReader(object):
+    """File-like object reading response *resp* decompressed from *encoding*.
+
+    Other attributes, such as *s3_info* and *code*, are those of *resp*.
+    """
+
+    chunk_size = 64 << 10
+
+    def __init__(self, resp, encoding="gzip"):
+        self.resp = resp
+        self.decompressor = zlib.decompressobj(_wbits[encoding])
+        self.buf = ""
+        self.eof = False
+
+    def __getattr__(self, name):
+        return getattr(self.resp, name)
+
+    def _fill(self, n):
+        while not self.eof and (n < 0 or len(self.buf) < n):
+            # Bound the output of a chunk compressing very well, too.
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = self.resp.read(self.chunk_size)
+            if data:
+                self.buf += self.decompressor.decompress(data,
+                                                         self.chunk_size)
+            else:
+                self.buf += self.decompressor.flush()
+                self.eof = True
+
+    def read(self, n=-1):
+        self._fill(n)
+        if n < 0:
+            n = len(self.buf)
+        data, self.buf = self.buf[:n], self.buf[n:]
+        return data
+
+    def readline(self, n=-1):
+        while "\n" not in self.buf and not self.eof:
+            self._fill(len(self.buf) + 1)
+        end = self.buf.find("\n") + 1 or len(self.buf)
+        if n >= 0:
+            end = min(end, n)
+        data, self.buf = self.buf[:end], self.buf[end:]
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def close(self):
+        self.resp.close()
+
+class CompressingTransformer(object):
+    """Transformer compressing to *encoding* at *level*.
+
+    Called as ``transformer(headers, data)`` by `S3Bucket.put`, and with
+    `stream` by `StreamingMixin.put_file`. Either way, sets
+    ``Content-Encoding`` in *headers*.
+    """
+
+    def __init__(self, encoding, level=6):
+        if encoding not in _wbits:
+            raise ValueError("unknown encoding %r" % (encoding,))
+        self.encoding = encoding
+        self.level = level
+
+    def __repr__(self):
+        return "%s(%r, level=%r)" % (self.__class__.__name__, self.encoding,
+                                     self.level)
+
+    def __call__(self, headers, data):
+        headers["Content-Encoding"] = self.encoding
+        if hasattr(data, "read"):
+            data = data.read()
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                      _wbits[self.encoding])
+        data = compressor.compress(data) + compressor.flush()
+        headers["Content-Length"] = str(len(data))
+        return data
+
+    def stream(self, headers, fp):
+        """Return a file-like object reading *fp* compressed."""
+        headers["Content-Encoding"] = self.encoding
+        return CompressingReader(fp, encoding=self.encoding, level=self.level)
+
+class GzipTransformer(CompressingTransformer):
+    def __init__(self, level=6):
+        super(GzipTransformer, self).__init__("gzip", level=level)
+
+class DeflateTransformer(CompressingTransformer):
+    def __init__(self, level=6):
+        super(DeflateTransformer, self).__init__("deflate", level=level)
+
+gzip_transformer = GzipTransformer()
+deflate_transformer = DeflateTransformer()
+
+def decompressing(resp, encoding):
+    """Wrap *resp* to decompress *encoding*, or return it as is if it's not
+    an encoding we know of.
+    """
+    if encoding in _wbits:
+        return DecompressingReader(resp, encoding)
+    return resp
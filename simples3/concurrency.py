@@ -0,0 +1,208 @@
+"""Thread-based concurrency helpers
+
+S3 requests spend nearly all of their time waiting on the network, so plain
+threads go a long way. The helpers here are all generators, and all of them
+bound how far ahead of the consumer they run, so they can be fed with listings
+of millions of keys without buffering them all up.
+
+Exceptions raised in a worker are re-raised in the consuming thread.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import Queue
+import threading
+
+def _spawn(target, *args):
+    t = threading.Thread(target=target, args=args)
+    t.daemon = True
+    t.start()
+    return t
+
+def _put(q, item, stop):
+    """Put *item* on *q*, giving up if *stop* gets set while blocked."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+        except Queue.Full:
+            continue
+        else:
+            return True
+    return False
+
+def _reraise(exc_info):
+    raise exc_info[0], exc_info[1], exc_info[2]
+
+def imap(func, iterable, n_workers=4, ordered=True, max_pending=None):
+    """Apply *func* to each item of *iterable* using *n_workers* threads.
+
+    Results are yielded in the order of *iterable* if *ordered*, otherwise as
+    they complete. Items are taken from *iterable* lazily, at most
+    *max_pending* (by default twice *n_workers*) ahead of what has been
+    yielded.
+    """
+    if max_pending is None:
+        max_pending = 2 * n_workers
+    tasks = Queue.Queue()
+    results = Queue.Queue()
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            idx, item = task
+            try:
+                results.put((idx, True, func(item)))
+            except BaseException:
+                results.put((idx, False, sys.exc_info()))
+
+    for i in xrange(n_workers):
+        _spawn(work)
+
+    items = enumerate(iterable)
+    pending = 0
+    buffered = {}
+    next_idx = 0
+    try:
+        while True:
+            while items is not None and pending < max_pending:
+                try:
+                    tasks.put(next(items))
+                except StopIteration:
+                    items = None
+                else:
+                    pending += 1
+            if not pending:
+                break
+            idx, ok, rv = results.get()
+            if not ok:
+                _reraise(rv)
+            if ordered:
+                buffered[idx] = rv
+                while next_idx in buffered:
+                    pending -= 1
+                    next_idx += 1
+                    yield buffered.pop(next_idx - 1)
+            else:
+                pending -= 1
+                yield rv
+    finally:
+        # Anything not yet started is dropped, then the workers are told to
+        # quit once they're done with what they have on their hands.
+        while True:
+            try:
+                tasks.get_nowait()
+            except Queue.Empty:
+                break
+        for i in xrange(n_workers):
+            tasks.put(None)
+
+class prefetch(object):
+    """Iterate over *iterable* in a background thread.
+
+    Up to *maxsize* items are read ahead of the consumer. Iteration starts as
+    soon as the object is created.
+    """
+
+    _end = object()
+
+    def __init__(self, iterable, maxsize=1):
+        self.queue = Queue.Queue(maxsize)
+        self.stop = threading.Event()
+        self.thread = _spawn(self._produce, iterable)
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not _put(self.queue, (True, item), self.stop):
+                    return
+        except BaseException:
+            _put(self.queue, (False, sys.exc_info()), self.stop)
+        else:
+            _put(self.queue, (True, self._end), self.stop)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.stop.is_set():
+            raise StopIteration
+        ok, item = self.queue.get()
+        if not ok:
+            self.stop.set()
+            _reraise(item)
+        elif item is self._end:
+            self.stop.set()
+            raise StopIteration
+        return item
+    __next__ = next
+
+    def close(self):
+        self.stop.set()
+
+def chain_ahead(iterables, n_ahead=4, maxsize=1):
+    """Chain *iterables* in order, running up to *n_ahead* of them ahead.
+
+    Each of the iterables is read in its own thread, *maxsize* items ahead.
+    """
+    running = []
+    iterables = iter(iterables)
+    try:
+        while True:
+            for it in iterables:
+                running.append(prefetch(it, maxsize=maxsize))
+                if len(running) >= n_ahead:
+                    break
+            if not running:
+                break
+            for item in running[0]:
+                yield item
+            running.pop(0)
+    finally:
+        for it in running:
+            it.close()
+
+def interleave(iterables, n_workers=4, maxsize=None):
+    """Yield items from *iterables* as they come, reading *n_workers* at once.
+
+    At most *maxsize* (by default *n_workers*) items are buffered.
+    """
+    if maxsize is None:
+        maxsize = n_workers
+    results = Queue.Queue(maxsize)
+    stop = threading.Event()
+    lock = threading.Lock()
+    iterables = iter(iterables)
+    done = object()
+
+    def work():
+        try:
+            while not stop.is_set():
+                with lock:
+                    it = next(iterables, done)
+                if it is done:
+                    break
+                for item in it:
+                    if not _put(results, (True, item), stop):
+                        return
+        except BaseException:
+            _put(results, (False, sys.exc_info()), stop)
+        else:
+            _put(results, (True, done), stop)
+
+    n_running = n_workers
+    for i in xrange(n_workers):
+        _spawn(work)
+    try:
+        while n_running:
+            ok, item = results.get()
+            if not ok:
+                _reraise(item)
+            elif item is done:
+                n_running -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
@@ -0,0 +1,213 @@
+"""Persistent HTTP connections for :mod:`simples3`
+
+S3 is happy to keep connections alive, so rather than setting up a new TCP
+(and possibly TLS) connection for every request, connections are kept in a
+:class:`ConnectionPool` and handed out again by the urllib2 handlers defined
+here. :meth:`simples3.bucket.S3Bucket.build_opener` uses them by default.
+
+A connection is only returned to the pool once its response has been read to
+the end; a response closed half-way through takes its connection with it.
+"""
+
+from __future__ import absolute_import
+
+import time
+import socket
+import select
+import httplib
+import urllib2
+import threading
+
+class ConnectionPool(object):
+    """Thread-safe pool of idle HTTP connections, kept per host.
+
+    At most *maxsize* idle connections are kept for each host, and those left
+    idle for more than *idle_timeout* seconds are closed rather than reused.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=60.0):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(conns) for conns in self._idle.itervalues())
+
+    def acquire(self, key, factory):
+        """Get a connection for *key*, calling *factory* if none is idle.
+
+        Returns a tuple of (connection, reused).
+        """
+        while True:
+            with self._lock:
+                conns = self._idle.get(key)
+                if not conns:
+                    break
+                conn, last_used = conns.pop()
+            if time.time() - last_used > self.idle_timeout or is_stale(conn):
+                conn.close()
+                continue
+            return conn, True
+        return factory(), False
+
+    def release(self, key, conn):
+        """Give *conn* back to the pool, or close it if the pool is full."""
+        if conn.sock is not None:
+            with self._lock:
+                conns = self._idle.setdefault(key, [])
+                if len(conns) < self.maxsize:
+                    conns.append((conn, time.time()))
+                    return
+        conn.close()
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.itervalues():
+            for conn, last_used in conns:
+                conn.close()
+
+def is_stale(conn):
+    """Check if idle connection *conn* was closed by the other end.
+
+    An idle keep-alive connection has nothing to read, so if the socket is
+    readable, the server either hung up or sent something unexpected.
+    """
+    if conn.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (select.error, socket.error, ValueError):
+        return True
+    return bool(readable)
+
+def _rewind(data, pos):
+    """Prepare request body *data* for being sent again, if at all possible."""
+    if data is None or not hasattr(data, "read"):
+        return True
+    elif pos is not None and hasattr(data, "seek"):
+        data.seek(pos)
+        return True
+    return False
+
+class PooledResponse(object):
+    """Socket-like wrapper releasing the connection when *response* is done.
+
+    Wrapped in a :class:`socket._fileobject` just like urllib2 does it.
+    """
+
+    def __init__(self, pool, key, conn, response):
+        self.pool = pool
+        self.key = key
+        self.conn = conn
+        self.response = response
+
+    def recv(self, amt):
+        response = self.response
+        if response is None:
+            return ""
+        data = response.read(amt)
+        if response.isclosed():
+            self._release()
+        return data
+
+    def close(self):
+        response = self.response
+        if response is None:
+            return
+        if response.isclosed() or response.length == 0:
+            response.close()
+            self._release()
+        else:
+            # Unread data remains, so the connection can't be reused.
+            response.close()
+            self.conn.close()
+            self.response = self.conn = None
+
+    def _release(self):
+        self.pool.release(self.key, self.conn)
+        self.response = self.conn = None
+
+class PooledHandlerMixin(object):
+    """Mixin for urllib2 HTTP handlers that reuses pooled connections."""
+
+    def do_pooled_open(self, http_class, req, **http_conn_args):
+        host = req.get_host()
+        if not host:
+            raise urllib2.URLError("no host given")
+        if req._tunnel_host:
+            # Proxy tunnels are rare enough to not warrant pooling.
+            return self.do_open(http_class, req, **http_conn_args)
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update((k, v) for (k, v) in req.headers.items()
+                       if k not in headers)
+        headers = dict((n.title(), v) for (n, v) in headers.iteritems())
+        data = req.get_data()
+        pos = data.tell() if hasattr(data, "tell") else None
+
+        key = (http_class, host)
+        def factory():
+            conn = http_class(host, timeout=req.timeout, **http_conn_args)
+            conn.connect()
+            # Headers and body go out in separate writes, which with Nagle's
+            # algorithm and delayed ACKs stalls every other request.
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return conn
+
+        while True:
+            try:
+                conn, reused = self.pool.acquire(key, factory)
+            except socket.error, e:
+                raise urllib2.URLError(e)
+            if reused:
+                timeout = req.timeout
+                if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+                    timeout = socket.getdefaulttimeout()
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+            conn.set_debuglevel(self._debuglevel)
+            try:
+                conn.request(req.get_method(), req.get_selector(), data,
+                             headers)
+                r = conn.getresponse(buffering=True)
+            except socket.timeout, e:
+                conn.close()
+                raise urllib2.URLError(e)
+            except (socket.error, httplib.HTTPException), e:
+                conn.close()
+                # A reused connection may have been closed by the server while
+                # we weren't looking; try again on a fresh one.
+                if reused and _rewind(data, pos):
+                    continue
+                raise urllib2.URLError(e)
+            break
+
+        fp = socket._fileobject(PooledResponse(self.pool, key, conn, r),
+                                close=True)
+        resp = urllib2.addinfourl(fp, r.msg, req.get_full_url())
+        resp.code = r.status
+        resp.msg = r.reason
+        return resp
+
+class PooledHTTPHandler(PooledHandlerMixin, urllib2.HTTPHandler):
+    def __init__(self, pool=None, debuglevel=0):
+        urllib2.HTTPHandler.__init__(self, debuglevel=debuglevel)
+        self.pool = ConnectionPool() if pool is None else pool
+
+    def http_open(self, req):
+        return self.do_pooled_open(httplib.HTTPConnection, req)
+
+class PooledHTTPSHandler(PooledHandlerMixin, urllib2.HTTPSHandler):
+    def __init__(self, pool=None, debuglevel=0, **kwds):
+        urllib2.HTTPSHandler.__init__(self, debuglevel=debuglevel, **kwds)
+        self.pool = ConnectionPool() if pool is None else pool
+
+    def https_open(self, req):
+        kwds = {}
+        if getattr(self, "_context", None) is not None:
+            kwds["context"] = self._context
+        return self.do_pooled_open(httplib.HTTPSConnection, req, **kwds)
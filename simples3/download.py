@@ -0,0 +1,305 @@
+"""Parallel ranged downloads
+
+An object is split into byte ranges, fetched concurrently with ``Range``
+headers, and each range is written straight to its offset in the destination
+file. All range requests are made with ``If-Match`` on the ETag the object had
+to begin with, so a concurrent overwrite fails the download rather than
+producing a file stitched together from two objects.
+
+Usage::
+
+    >>> download_file(bucket, "huge_cd.iso", "/tmp/huge_cd.iso", n_workers=8)  # doctest: +SKIP
+
+A single stream can instead be made to survive failures and restarts with
+`resume_download`, which keeps what it has so far in a ``.part`` file next to
+the destination and picks up from its end::
+
+    >>> resume_download(bucket, "huge_cd.iso", "/tmp/huge_cd.iso")  # doctest: +SKIP
+"""
+
+from __future__ import absolute_import
+
+import os
+import re
+import socket
+import httplib
+import hashlib
+import threading
+
+from .bucket import S3Error
+from .concurrency import imap
+
+def iter_ranges(size, part_size):
+    """Yield inclusive (first, last) byte ranges covering *size* bytes.
+
+    >>> list(iter_ranges(10, 4))
+    [(0, 3), (4, 7), (8, 9)]
+    >>> list(iter_ranges(0, 4))
+    []
+    """
+    for first in xrange(0, size, part_size):
+        yield first, min(first + part_size, size) - 1
+
+class PathWriter(object):
+    """Write at offsets of file *path*, one file descriptor per call."""
+
+    flags = os.O_WRONLY | getattr(os, "O_BINARY", 0)
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, offset, chunks):
+        fd = os.open(self.path, self.flags)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            for chunk in chunks:
+                while chunk:
+                    chunk = chunk[os.write(fd, chunk):]
+        finally:
+            os.close(fd)
+
+class FileWriter(object):
+    """Write at offsets of file object *fp*, seeking under a lock."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.lock = threading.Lock()
+
+    def __call__(self, offset, chunks):
+        for chunk in chunks:
+            with self.lock:
+                self.fp.seek(offset)
+                self.fp.write(chunk)
+            offset += len(chunk)
+
+# Errors reading a body once the response has begun, which the retry policy
+# of the bucket never sees.
+_read_errors = (socket.error, httplib.HTTPException)
+
+class RangeFetcher(object):
+    """Fetch byte ranges of *key*, passing chunks to *write*.
+
+    *write* is called as ``write(offset, chunks)`` with an iterable of chunks
+    to write starting at *offset*. A range whose body can't be read to the
+    end is requested again from where it broke off, up to *n_range_retries*
+    times in all; the requests themselves are retried by the bucket.
+    """
+
+    n_range_retries = 3
+    chunk_size = 64 << 10
+
+    def __init__(self, bucket, key, write, etag=None, progress=None):
+        self.bucket = bucket
+        self.key = key
+        self.write = write
+        self.etag = etag
+        self.progress = progress
+
+    def __call__(self, byte_range):
+        first, last = byte_range
+        pos = [first]
+        for retry_no in xrange(self.n_range_retries):
+            try:
+                self.write(pos[0], self._chunks(pos, last))
+                return byte_range
+            except _read_errors, e:
+                if retry_no + 1 == self.n_range_retries:
+                    raise S3Error("read error", key=self.key, read_error=e)
+
+    def _chunks(self, pos, last):
+        """Yield chunks of bytes *pos[0]* to *last*, advancing *pos[0]*."""
+        headers = {"Range": "bytes=%d-%d" % (pos[0], last)}
+        if self.etag:
+            headers["If-Match"] = self.etag
+        fp = self.bucket.get(self.key, headers=headers, decompress=False)
+        try:
+            if fp.code != 206 and pos[0] != 0:
+                raise S3Error("range request not honored", key=self.key,
+                              code=fp.code)
+            while pos[0] <= last:
+                chunk = fp.read(min(self.chunk_size, last - pos[0] + 1))
+                if not chunk:
+                    raise httplib.IncompleteRead("", last - pos[0] + 1)
+                yield chunk
+                pos[0] += len(chunk)
+                if self.progress:
+                    self.progress(len(chunk))
+        finally:
+            fp.close()
+
+def _progress_adder(progress, total):
+    lock = threading.Lock()
+    current = [0]
+    def add(n):
+        with lock:
+            current[0] += n
+            progress(current[0], total, n)
+    return add
+
+def download_file(bucket, key, dest, part_size=8 << 20, n_workers=4,
+                  progress=None):
+    """Download *key* to *dest* in ranges of *part_size*, returning its info.
+
+    *dest* is either a filename or a seekable file object open for writing.
+    """
+    info = bucket.info(key)
+    size = info["size"]
+    if hasattr(dest, "write"):
+        write = FileWriter(dest)
+    else:
+        with open(dest, "wb") as fp:
+            fp.truncate(size)
+        write = PathWriter(dest)
+    add_progress = _progress_adder(progress, size) if progress else None
+    fetch = RangeFetcher(bucket, key, write, etag=info["headers"].get("etag"),
+                         progress=add_progress)
+    ranges = iter_ranges(size, part_size)
+    for byte_range in imap(fetch, ranges, n_workers=n_workers, ordered=False):
+        pass
+    if progress:
+        progress(size, size, 0)
+    return info
+
+_content_range_re = re.compile(r"bytes (\d+)-(\d+)/(\d+)$")
+_md5_etag_re = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+class ResumableDownload(object):
+    """Download *key* to *path* through *path*.part, resuming where it left.
+
+    The ETag of the object is kept in *path*.part.etag. A ``.part`` file
+    left by an earlier attempt is continued with a ``Range: bytes=N-``
+    request made with ``If-Match`` on that ETag; should the object have
+    changed since, the download starts over.
+
+    A body that can't be read to the end is resumed on the spot, up to
+    *n_resumes* times; the requests themselves are retried by the bucket.
+    """
+
+    n_resumes = 3
+    chunk_size = 1 << 20
+
+    def __init__(self, bucket, key, path, progress=None, verify=True):
+        self.bucket = bucket
+        self.key = key
+        self.path = path
+        self.part_path = path + ".part"
+        self.etag_path = self.part_path + ".etag"
+        self.progress = progress
+        self.verify = verify
+
+    def __call__(self):
+        offset, etag = self._load()
+        for retry_no in xrange(self.n_resumes + 1):
+            try:
+                info = self._fetch(offset, etag)
+                break
+            except _read_errors, e:
+                if retry_no == self.n_resumes:
+                    raise S3Error("read error", key=self.key, read_error=e)
+            except S3Error, e:
+                if e.code not in (412, 416):
+                    raise
+                # Changed, or shorter than what we have: start over, which
+                # counts as another attempt.
+                self._discard()
+                if retry_no == self.n_resumes:
+                    raise
+            offset, etag = self._load()
+        self._check(info)
+        os.remove(self.etag_path)
+        if os.name == "nt" and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(self.part_path, self.path)
+        if self.progress:
+            self.progress(info["size"], info["size"], 0)
+        return info
+
+    def _load(self):
+        """Get the offset and ETag to resume from, (0, None) if none."""
+        try:
+            with open(self.etag_path, "rb") as fp:
+                etag = fp.read().strip()
+            offset = os.path.getsize(self.part_path)
+        except (IOError, OSError):
+            return 0, None
+        return offset, etag or None
+
+    def _discard(self):
+        for path in (self.part_path, self.etag_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _fetch(self, offset, etag):
+        headers = {}
+        if offset and etag:
+            headers["Range"] = "bytes=%d-" % (offset,)
+            headers["If-Match"] = etag
+        fp = self.bucket.get(self.key, headers=headers, decompress=False)
+        try:
+            info = fp.s3_info
+            if fp.code == 206:
+                m = _content_range_re.match(
+                    info["headers"].get("content-range", ""))
+                if not m or int(m.group(1)) != offset:
+                    raise S3Error("bad content range", key=self.key,
+                                  code=fp.code)
+                info["size"] = int(m.group(3))
+            else:
+                # Everything, whether asked for or not.
+                offset = 0
+                with open(self.etag_path, "wb") as etag_fp:
+                    etag_fp.write(info["headers"].get("etag", ""))
+            with open(self.part_path, "r+b" if offset else "wb") as out:
+                out.truncate(offset)
+                out.seek(offset)
+                info["size"] = self._copy(fp, out, offset, info.get("size"))
+        finally:
+            fp.close()
+        return info
+
+    def _copy(self, fp, out, offset, size):
+        """Copy *fp* to *out* until *size*, or EOF if None; return the end."""
+        while size is None or offset < size:
+            n = self.chunk_size if size is None else size - offset
+            chunk = fp.read(min(self.chunk_size, n))
+            if not chunk:
+                if size is None:
+                    break
+                raise httplib.IncompleteRead("", size - offset)
+            out.write(chunk)
+            offset += len(chunk)
+            if self.progress:
+                self.progress(offset, size, len(chunk))
+        return offset
+
+    def _check(self, info):
+        """Check the size, and the MD5 if the ETag is one."""
+        size = os.path.getsize(self.part_path)
+        if size != info["size"]:
+            self._discard()
+            raise S3Error("size mismatch", key=self.key, size=size,
+                          expected=info["size"])
+        m = _md5_etag_re.match(info["headers"].get("etag", ""))
+        if self.verify and m:
+            hasher = hashlib.md5()
+            with open(self.part_path, "rb") as fp:
+                while True:
+                    chunk = fp.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+            if hasher.hexdigest() != m.group(1):
+                self._discard()
+                raise S3Error("checksum mismatch", key=self.key,
+                              md5=hasher.hexdigest(), etag=m.group(1))
+
+def resume_download(bucket, key, path, progress=None, verify=True):
+    """Download *key* to *path*, resuming an earlier attempt if there was one.
+
+    Interrupted transfers are resumed up to *n_resumes* times on the spot; if
+    it still fails, calling this again carries on from the same place. If
+    *verify*, the result is checked against the ETag when that is an MD5 (it
+    is not for multipart uploads). Returns the `info` of *key*.
+    """
+    return ResumableDownload(bucket, key, path, progress=progress,
+                             verify=verify)()
@@ -0,0 +1,287 @@
+"""Request instrumentation
+
+Hooks added to a bucket with `S3Bucket.add_hook` see every attempt at every
+request `S3Bucket.send` makes: `before_request` is called as it is sent, and
+`after_request` once it is done with, i.e., when the response body has been
+read to the end or closed, or when the attempt failed. Both get a
+:class:`RequestEvent`. A bucket without hooks doesn't pay for any of this.
+
+:class:`MetricsCollector` is a hook aggregating latency histograms and
+counters per operation, which it can export in the Prometheus text format::
+
+    >>> metrics = MetricsCollector()
+    >>> bucket.add_hook(metrics)  # doctest: +SKIP
+    >>> bucket.get("my file").read()  # doctest: +SKIP
+    'my content'
+    >>> print metrics.prometheus()  # doctest: +SKIP
+    # HELP simples3_request_duration_seconds Time until response is done.
+    # TYPE simples3_request_duration_seconds histogram
+    simples3_request_duration_seconds_bucket{operation="get",le="0.005"} 0
+    ...
+
+Note that responses which are never read to the end nor closed are never
+reported.
+"""
+
+from __future__ import absolute_import
+
+import time
+import bisect
+import threading
+
+class RequestHook(object):
+    """Base class for hooks, doing nothing."""
+
+    def before_request(self, event):
+        pass
+
+    def after_request(self, event):
+        pass
+
+def operation_name(s3req):
+    """Name the kind of operation *s3req* is, e.g. "get" or "upload_part"."""
+    method = s3req.method
+    sub = s3req.subresource or ""
+    if method == "GET":
+        return "get" if s3req.key else "list"
+    elif method == "HEAD":
+        return "head"
+    elif method == "PUT":
+        if sub.startswith("partNumber="):
+            if "X-AMZ-Copy-Source" in s3req.headers:
+                return "upload_part_copy"
+            return "upload_part"
+        elif "X-AMZ-Copy-Source" in s3req.headers:
+            return "copy"
+        return "put" if s3req.key is not None else "put_bucket"
+    elif method == "DELETE":
+        return "abort_multipart" if sub.startswith("uploadId=") else "delete"
+    elif method == "POST":
+        if sub == "delete":
+            return "delete_many"
+        elif sub == "uploads":
+            return "initiate_multipart"
+        elif sub.startswith("uploadId="):
+            return "complete_multipart"
+    return method.lower()
+
+def _body_size(s3req):
+    length = s3req.headers.get("Content-Length")
+    if length is not None:
+        return int(length)
+    elif hasattr(s3req.data, "__len__"):
+        return len(s3req.data)
+    return 0
+
+class RequestEvent(object):
+    """One attempt at a request, as seen by hooks.
+
+    *attempt* counts from 0, so it is also the number of retries made before
+    it. *status* is the HTTP status, or None if there was no response.
+    *ttfb* (time to first byte) and *latency* are in seconds, from sending
+    the request to getting the response headers and to being done with the
+    response, respectively. *error* is the `S3Error` if the attempt failed.
+    """
+
+    __slots__ = ("method", "bucket", "key", "operation", "attempt", "status",
+                 "bytes_sent", "bytes_received", "ttfb", "latency", "error",
+                 "started", "hooks")
+
+    def __init__(self, s3req, attempt, hooks):
+        self.method = s3req.method
+        self.bucket = s3req.bucket
+        self.key = s3req.key
+        self.operation = operation_name(s3req)
+        self.attempt = attempt
+        self.status = None
+        self.bytes_sent = _body_size(s3req)
+        self.bytes_received = 0
+        self.ttfb = self.latency = self.error = None
+        self.hooks = hooks
+        self.started = time.time()
+        for hook in hooks:
+            hook.before_request(self)
+
+    def __repr__(self):
+        return "<%s %s %r attempt %d status %r>" % (
+            self.__class__.__name__, self.operation, self.key, self.attempt,
+            self.status)
+
+    def response(self, resp):
+        """Note response *resp*, returning it wrapped to notice its end."""
+        self.ttfb = time.time() - self.started
+        self.status = resp.code
+        return InstrumentedResponse(resp, self)
+
+    def failed(self, e):
+        self.ttfb = time.time() - self.started
+        self.status = e.code
+        self.error = e
+        self.finish()
+
+    def finish(self):
+        if self.latency is None:
+            self.latency = time.time() - self.started
+            for hook in self.hooks:
+                hook.after_request(self)
+
+class InstrumentedResponse(object):
+    """Wraps a response to count the bytes read and notice when it's done."""
+
+    def __init__(self, resp, event):
+        self.resp = resp
+        self.event = event
+        try:
+            self.remaining = int(resp.info()["content-length"])
+        except KeyError:
+            self.remaining = None
+        if self.remaining == 0 or event.method == "HEAD":
+            event.finish()
+
+    def __getattr__(self, name):
+        return getattr(self.resp, name)
+
+    def _count(self, data):
+        self.event.bytes_received += len(data)
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        if not data or self.remaining == 0:
+            self.event.finish()
+        return data
+
+    def read(self, *args):
+        return self._count(self.resp.read(*args))
+
+    def readline(self, *args):
+        return self._count(self.resp.readline(*args))
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def close(self):
+        self.resp.close()
+        self.event.finish()
+
+class Histogram(object):
+    """Cumulative histogram with upper *bounds*, Prometheus style."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def cumulative(self):
+        """Yield (bound, count) pairs, the last bound being "+Inf"."""
+        n = 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            n += count
+            yield bound, n
+
+class OperationStats(object):
+    def __init__(self, bounds):
+        self.latency = Histogram(bounds)
+        self.ttfb = Histogram(bounds)
+        self.statuses = {}
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+class MetricsCollector(RequestHook):
+    """Aggregates request metrics per operation in memory.
+
+    Latencies are counted into histogram buckets with upper *bounds* in
+    seconds.
+    """
+
+    default_bounds = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                      5.0, 10.0]
+
+    def __init__(self, bounds=None):
+        self.bounds = sorted(bounds or self.default_bounds)
+        self.lock = threading.Lock()
+        self.operations = {}
+
+    def after_request(self, event):
+        with self.lock:
+            stats = self.operations.get(event.operation)
+            if stats is None:
+                stats = self.operations[event.operation] = \
+                    OperationStats(self.bounds)
+            stats.latency.add(event.latency)
+            if event.ttfb is not None:
+                stats.ttfb.add(event.ttfb)
+            status = event.status or "error"
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if event.attempt:
+                stats.retries += 1
+            stats.bytes_sent += event.bytes_sent
+            stats.bytes_received += event.bytes_received
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+
+    def prometheus(self, prefix="simples3"):
+        """Export the metrics in the Prometheus text exposition format."""
+        lines = []
+        def metric(name, kind, help, samples):
+            name = "%s_%s" % (prefix, name)
+            lines.append("# HELP %s %s" % (name, help))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for suffix, labels, value in samples:
+                labels = ",".join('%s="%s"' % label for label in labels)
+                lines.append("%s%s{%s} %s" % (name, suffix, labels,
+                                              _fmtnum(value)))
+        def histogram(name, help, attr):
+            samples = []
+            for op, stats in ops:
+                hist = getattr(stats, attr)
+                for bound, count in hist.cumulative():
+                    le = bound if bound == "+Inf" else _fmtnum(bound)
+                    samples.append(("_bucket", [("operation", op),
+                                                ("le", le)], count))
+                samples.append(("_sum", [("operation", op)], hist.total))
+                samples.append(("_count", [("operation", op)], hist.count))
+            metric(name, "histogram", help, samples)
+        def counter(name, help, attr):
+            metric(name, "counter", help,
+                   [("", [("operation", op)], getattr(stats, attr))
+                    for op, stats in ops])
+
+        with self.lock:
+            ops = sorted(self.operations.items())
+            histogram("request_duration_seconds",
+                      "Time until response is done.", "latency")
+            histogram("time_to_first_byte_seconds",
+                      "Time until response headers are in.", "ttfb")
+            metric("requests_total", "counter", "Requests by status.",
+                   [("", [("operation", op), ("status", status)], n)
+                    for op, stats in ops
+                    for status, n in sorted(stats.statuses.items())])
+            counter("retries_total", "Retried requests.", "retries")
+            counter("sent_bytes_total", "Request body bytes.", "bytes_sent")
+            counter("received_bytes_total", "Response body bytes read.",
+                    "bytes_received")
+        return "\n".join(lines) + "\n"
+
+def _fmtnum(value):
+    """Format *value* for Prometheus.
+
+    >>> _fmtnum(3), _fmtnum(0.25), _fmtnum(1.0)
+    ('3', '0.25', '1')
+    """
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
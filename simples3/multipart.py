@@ -0,0 +1,279 @@
+"""Concurrent multipart uploads
+
+A file is read part by part and the parts are uploaded by a pool of threads,
+each part being hashed as it is sent. A part that fails is retried on its own,
+under the bucket's `simples3.retry.RetryPolicy`, and if the upload can't be
+completed it is aborted so S3 doesn't keep the parts around.
+
+Usage::
+
+    >>> upload_file(bucket, "huge_cd.iso", open("huge_cd.iso", "rb"),  # doctest: +SKIP
+    ...             part_size=16 << 20, n_workers=8)
+
+Objects already on S3 can be copied the same way, in ranges copied
+server-side with UploadPartCopy, which is how objects over 5 GB are copied::
+
+    >>> copy_object(bucket, "mybucket/huge_cd.iso", "backup/huge_cd.iso",  # doctest: +SKIP
+    ...             size=8 << 30, part_size=256 << 20, n_workers=8)
+"""
+
+from __future__ import absolute_import
+
+import sys
+import threading
+
+from .bucket import S3Error
+from .concurrency import imap
+from .download import iter_ranges
+
+min_part_size = 5 << 20
+max_parts = 10000
+
+def part_size_for(size, part_size):
+    """Grow *part_size* so that *size* bytes fit in S3's maximum part count.
+
+    >>> part_size_for(100 << 30, 8 << 20) == (100 << 30) // 10000 + 1
+    True
+    >>> part_size_for(1 << 20, 1 << 10) == min_part_size
+    True
+    """
+    part_size = max(part_size, min_part_size)
+    if size is not None and size > part_size * max_parts:
+        part_size = size // max_parts + 1
+    return part_size
+
+def read_full(fp, n):
+    """Read *n* bytes from *fp*, fewer only at end of file."""
+    data = fp.read(n)
+    if len(data) == n or not data:
+        return data
+    chunks = [data]
+    n -= len(data)
+    while n:
+        data = fp.read(n)
+        if not data:
+            break
+        chunks.append(data)
+        n -= len(data)
+    return "".join(chunks)
+
+def iter_parts(fp, part_size):
+    """Yield (part_number, data) pairs of *fp* split into *part_size* parts.
+
+    An empty *fp* still yields one empty part, as S3 needs at least one.
+    """
+    part_number = 1
+    while True:
+        data = read_full(fp, part_size)
+        if data or part_number == 1:
+            yield part_number, data
+        if len(data) < part_size:
+            break
+        part_number += 1
+
+def buffer_slice(data, offset, size):
+    """View *size* bytes of buffer-like *data* from *offset* without copying.
+
+    >>> str(buffer_slice(bytearray("abcdef"), 2, 3))
+    'cde'
+    """
+    if isinstance(data, memoryview):
+        return data[offset:offset + size]
+    return buffer(data, offset, size)
+
+def iter_buffer_parts(data, part_size):
+    """Like `iter_parts`, but slicing buffer-like *data* without copying."""
+    size = len(data)
+    yield 1, buffer_slice(data, 0, part_size)
+    for part_number, offset in enumerate(xrange(part_size, size, part_size)):
+        yield part_number + 2, buffer_slice(data, offset, part_size)
+
+class MultipartUpload(object):
+    """A multipart upload of *key* to *bucket* with ID *upload_id*."""
+
+    def __init__(self, bucket, key, upload_id):
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = upload_id
+
+    def __repr__(self):
+        return "<%s of %r to %s, id %r>" % (self.__class__.__name__, self.key,
+                                            self.bucket, self.upload_id)
+
+    @classmethod
+    def initiate(cls, bucket, key, **kwds):
+        """Start a new upload; keyword arguments are passed to
+        `S3Bucket.initiate_multipart`.
+        """
+        return cls(bucket, key, bucket.initiate_multipart(key, **kwds))
+
+    def upload_part(self, part_number, data):
+        """Upload a part, retried under the bucket's *retry_policy*."""
+        return self.bucket.upload_part(self.key, self.upload_id,
+                                       part_number, data)
+
+    def upload_parts(self, parts, n_workers=4, progress=None, size=None,
+                     max_buffered=None):
+        """Upload *parts*, (part_number, data) pairs, on *n_workers* threads.
+
+        Parts are taken from *parts* only as workers become available, so at
+        most *max_buffered* parts, by default *n_workers*, are held in memory
+        at a time.
+
+        *progress* is called as ``progress(current, total, last_sent)`` after
+        each part, *total* being *size*. Returns (part_number, etag) pairs.
+        """
+        lock = threading.Lock()
+        sent = [0]
+        def send(part):
+            part_number, data = part
+            etag = self.upload_part(part_number, data)
+            if progress:
+                with lock:
+                    sent[0] += len(data)
+                    progress(sent[0], size, len(data))
+            return part_number, etag
+        rv = list(imap(send, parts, n_workers=n_workers, ordered=False,
+                       max_pending=max_buffered or n_workers))
+        if progress:
+            progress(sent[0], size, 0)
+        return sorted(rv)
+
+    def copy_part(self, part_number, source, byte_range, **conditions):
+        """Copy a part from *source*, retried like `upload_part`.
+
+        Conditions are those of `S3Bucket.copy`.
+        """
+        return self.bucket.upload_part_copy(self.key, self.upload_id,
+                                            part_number, source,
+                                            byte_range=byte_range,
+                                            **conditions)
+
+    def copy_parts(self, source, size, part_size, n_workers=4, **conditions):
+        """Copy *size* bytes of *source* in parts of *part_size* bytes, on
+        *n_workers* threads. Returns (part_number, etag) pairs.
+        """
+        def send(part):
+            part_number, byte_range = part
+            return part_number, self.copy_part(part_number, source,
+                                               byte_range, **conditions)
+        parts = enumerate(iter_ranges(size, part_size), 1)
+        return sorted(imap(send, parts, n_workers=n_workers, ordered=False))
+
+    def complete(self, parts):
+        return self.bucket.complete_multipart(self.key, self.upload_id, parts)
+
+    def abort(self):
+        self.bucket.abort_multipart(self.key, self.upload_id)
+
+def _complete_or_abort(upload, make_parts):
+    """Complete *upload* with the parts *make_parts* returns, or abort it."""
+    try:
+        return upload.complete(make_parts())
+    except BaseException:
+        exc_info = sys.exc_info()
+        try:
+            upload.abort()
+        except S3Error:
+            pass
+        raise exc_info[0], exc_info[1], exc_info[2]
+
+def upload_parts(bucket, key, parts, n_workers=4, progress=None, size=None,
+                 max_buffered=None, **kwds):
+    """Upload *parts* to *key* as a multipart upload, and complete it.
+
+    If anything goes wrong, the upload is aborted. Keyword arguments are
+    passed to `S3Bucket.initiate_multipart`. Returns the object's ETag.
+    """
+    upload = MultipartUpload.initiate(bucket, key, **kwds)
+    return _complete_or_abort(upload, lambda: upload.upload_parts(
+        parts, n_workers=n_workers, progress=progress, size=size,
+        max_buffered=max_buffered))
+
+def copy_object(bucket, source, key, size, part_size=256 << 20, n_workers=4,
+                conditions={}, **kwds):
+    """Copy *size* bytes of *source*, '<bucket>/<key>', to *key* in parts.
+
+    Unlike `S3Bucket.copy`, nothing is copied along with the data: keyword
+    arguments are passed to `S3Bucket.initiate_multipart` for the metadata,
+    ACL and so on. *conditions* are those of `S3Bucket.copy`, applied to
+    every part. Returns the object's ETag.
+    """
+    part_size = part_size_for(size, part_size)
+    upload = MultipartUpload.initiate(bucket, key, **kwds)
+    return _complete_or_abort(upload, lambda: upload.copy_parts(
+        source, size, part_size, n_workers=n_workers, **conditions))
+
+class ChunkReader(object):
+    """File-like object reading from *chunks*, an iterable of strings."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = []
+        self.buffered = 0
+
+    def read(self, n=-1):
+        while n < 0 or self.buffered < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buf.append(chunk)
+            self.buffered += len(chunk)
+        data = "".join(self.buf)
+        if 0 <= n < len(data):
+            data, rest = data[:n], data[n:]
+            self.buf, self.buffered = [rest], len(rest)
+        else:
+            self.buf, self.buffered = [], 0
+        return data
+
+def upload_stream(bucket, key, fp, part_size=16 << 20, n_workers=4,
+                  progress=None, max_buffered=None, **kwds):
+    """Upload *fp*, of a length not known beforehand, in parts as it's read.
+
+    *fp* is a file-like object, or an iterable of strings. It is read one
+    *part_size* part at a time, and no further than *max_buffered* parts
+    (by default *n_workers*) ahead of the uploads.
+
+    The first part is read ahead: if that's all there is, it is sent with
+    `S3Bucket.put`, and otherwise as the first part of a multipart upload,
+    which is aborted if reading *fp* fails. Note that this limits *fp* to
+    *part_size* times *max_parts* bytes. Keyword arguments are those of
+    `S3Bucket.put`. Progress is reported with a total of None.
+    """
+    if not hasattr(fp, "read"):
+        fp = ChunkReader(fp)
+    part_size = max(part_size, min_part_size)
+    first = read_full(fp, part_size)
+    if len(first) < part_size:
+        bucket.put(key, data=first, **kwds)
+        if progress:
+            progress(len(first), None, len(first))
+            progress(len(first), None, 0)
+        return
+    # Held in a list so that it's let go of once it's been sent.
+    head = [first]
+    del first
+    def parts():
+        yield 1, head.pop()
+        for part_number in xrange(2, max_parts + 1):
+            data = read_full(fp, part_size)
+            if not data:
+                return
+            yield part_number, data
+        if fp.read(1):
+            raise ValueError("too much data for %d parts of %d bytes"
+                             % (max_parts, part_size))
+    return upload_parts(bucket, key, parts(), n_workers=n_workers,
+                        progress=progress, max_buffered=max_buffered, **kwds)
+
+def upload_file(bucket, key, fp, part_size=16 << 20, n_workers=4,
+                progress=None, size=None, **kwds):
+    """Upload file-like object *fp* to *key* in parts of *part_size*.
+
+    *size* is only used to report progress and to make sure the parts fit.
+    """
+    part_size = part_size_for(size, part_size)
+    return upload_parts(bucket, key, iter_parts(fp, part_size),
+                        n_workers=n_workers, progress=progress, size=size,
+                        **kwds)
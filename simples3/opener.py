@@ -0,0 +1,75 @@
+"""Sending requests through urllib2
+
+`Urllib2Transport` sends requests through a urllib2 opener, by default one
+built on the keep-alive handlers of `simples3.connpool`. It's the transport of
+buckets overriding `S3Bucket.build_opener`; see `simples3.transport`. This
+module, and with it urllib2, is only imported once it's needed, so that code
+which only signs URLs never pays for loading it.
+"""
+
+from __future__ import absolute_import
+
+import socket
+import httplib
+import urllib2
+
+from .bucket import S3Error, error_classes
+from .connpool import ConnectionPool, PooledHTTPHandler, PooledHTTPSHandler
+from .transport import Transport
+
+class StreamHTTPHandler(urllib2.HTTPHandler):
+    pass
+
+class StreamHTTPSHandler(urllib2.HTTPSHandler):
+    pass
+
+class AnyMethodRequest(urllib2.Request):
+    def __init__(self, method, *args, **kwds):
+        self.method = method
+        urllib2.Request.__init__(self, *args, **kwds)
+
+    def get_method(self):
+        return self.method
+
+def build_opener():
+    """Build the default opener, pooling connections."""
+    # Both handlers share one pool; it is keyed by connection class and host
+    # anyway.
+    pool = ConnectionPool()
+    return urllib2.build_opener(PooledHTTPHandler(pool),
+                                PooledHTTPSHandler(pool))
+
+def open_request(opener, req, key=None, timeout=None):
+    """Open urllib2 request *req* with *opener*, raising `S3Error` for an
+    error response or a failed connection.
+    """
+    try:
+        if timeout:
+            return opener.open(req, timeout=timeout)
+        else:
+            return opener.open(req)
+    except (urllib2.HTTPError, urllib2.URLError), e:
+        exc_cls = error_classes.get(getattr(e, "code", None), S3Error)
+        raise exc_cls.from_urllib(e, key=key)
+    except (socket.error, httplib.HTTPException), e:
+        raise S3Error("connection error", key=key, reason=e)
+
+class Urllib2Transport(Transport):
+    """Sends requests through urllib2 *opener*, by default `build_opener`.
+
+    Requests are made with the *urllib_request_cls* of the `S3Request`,
+    `AnyMethodRequest` unless overridden.
+    """
+
+    def __init__(self, opener=None):
+        self.opener = build_opener() if opener is None else opener
+
+    def open(self, s3req, url, timeout=None):
+        req = s3req.urllib_request_cls(s3req.method, url, data=s3req.data,
+                                       headers=s3req.headers)
+        return open_request(self.opener, req, key=s3req.key, timeout=timeout)
+
+    def close(self):
+        for handler in getattr(self.opener, "handlers", ()):
+            if hasattr(handler, "pool"):
+                handler.pool.clear()
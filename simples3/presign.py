@@ -0,0 +1,94 @@
+"""Authenticated URLs in bulk
+
+A `Presigner` makes query-string authenticated GET URLs for the keys of a
+bucket, building the string to sign directly rather than through an
+`S3Request`. Expiry times are rounded up to a multiple of *granularity*
+seconds, so for that long the same key gets the same URL, which browsers and
+CDNs can cache; a URL is then valid for between *expire* and *expire* plus
+*granularity* seconds. With *cache_size*, the URLs of the current expiry
+time are remembered, up to that many::
+
+    >>> presigner = bucket.presigner(expire=3600, granularity=600,  # doctest: +SKIP
+    ...                              cache_size=10000)
+    >>> urls = presigner.urls(["photos/a.jpg", "photos/b.jpg"])  # doctest: +SKIP
+
+`S3Bucket.make_urls_authed` is a shorthand for one-off batches.
+"""
+
+from __future__ import absolute_import
+
+import time
+import datetime
+
+from .utils import aws_urlquote, quote_plus
+
+class Presigner(object):
+    """Makes authenticated URLs for keys of *bucket*.
+
+    *expire* is the least time a URL is valid, in seconds or as a timedelta.
+    """
+
+    def __init__(self, bucket, expire=300, granularity=300, cache_size=0):
+        if isinstance(expire, datetime.timedelta):
+            expire = expire.days * 86400 + expire.seconds
+        self.expire = int(expire)
+        self.granularity = max(1, int(granularity))
+        self.cache_size = cache_size
+        self.cache = {}
+        self.cache_expires = None
+        signer = self.signer = bucket.signer
+        self.url_prefix = bucket.base_url + "/"
+        self.resource_prefix = "/"
+        if bucket.name:
+            self.resource_prefix += signer.quote_bucket(bucket.name)
+        self.resource_prefix += "/"
+        self.query_prefix = "?%s&Expires=" % (signer.access_key_arg,)
+
+    def expires(self, now=None):
+        """The expiry time of URLs made at *now*, by default the current time.
+
+        >>> p = Presigner.__new__(Presigner)
+        >>> p.expire, p.granularity = 300, 600
+        >>> p.expires(900), p.expires(901), p.expires(1500)
+        (1200, 1800, 1800)
+        """
+        if now is None:
+            now = time.time()
+        g = self.granularity
+        return -(-int(now + self.expire) // g) * g
+
+    def url(self, key, expires=None):
+        """Make the URL of *key*, expiring at *expires* or by `expires`."""
+        if expires is None:
+            expires = self.expires()
+        return self._url(aws_urlquote(key), str(expires))
+
+    def _url(self, quoted_key, expires):
+        desc = "GET\n\n\n%s\n%s%s" % (expires, self.resource_prefix,
+                                      quoted_key)
+        return "%s%s%s%s&Signature=%s" % (
+            self.url_prefix, quoted_key, self.query_prefix, expires,
+            quote_plus(self.signer.signature(desc)))
+
+    def urls(self, keys):
+        """Make the URLs of *keys*, all with the same expiry time."""
+        expires = self.expires()
+        if not self.cache_size:
+            expires = str(expires)
+            return [self._url(aws_urlquote(key), expires) for key in keys]
+        cache = self.cache
+        if expires != self.cache_expires:
+            # None of what's cached will be asked for again.
+            cache = self.cache = {}
+            self.cache_expires = expires
+        str_expires = str(expires)
+        rv = []
+        for key in keys:
+            url = cache.get(key)
+            if url is None:
+                url = self._url(aws_urlquote(key), str_expires)
+                if len(cache) >= self.cache_size:
+                    cache.clear()
+                cache[key] = url
+            rv.append(url)
+        return rv
@@ -0,0 +1,108 @@
+"""Retrying failed requests
+
+A :class:`RetryPolicy` decides whether a failed request is tried again, and
+how long to wait before doing so. Waits grow exponentially with "full jitter"
+(a random wait between zero and the exponential bound), so that clients
+throttled at the same time don't all come back at the same time either.
+
+Each bucket has its own policy, which also keeps a retry budget: every request
+earns a fraction of a retry, and every retry spends a whole one. When an
+endpoint fails persistently the budget runs dry, and requests fail right away
+instead of multiplying the load on it.
+
+Usage::
+
+    >>> bucket.retry_policy = RetryPolicy(max_attempts=5, deadline=30.0)
+"""
+
+from __future__ import absolute_import
+
+import time
+import random
+import threading
+
+class RetryPolicy(object):
+    """Exponential backoff with jitter, an overall deadline and a budget.
+
+    A request is made at most *max_attempts* times, and not retried if the wait
+    before it would pass *deadline* seconds after the first attempt. The n-th
+    retry waits a random time of at most ``base_delay * 2 ** (n - 1)``, capped
+    to *max_delay*.
+
+    The budget holds at most *budget_max* retries, and each request adds
+    *budget_ratio* of a retry to it.
+    """
+
+    max_attempts = 10
+    base_delay = 0.1
+    max_delay = 20.0
+    deadline = 300.0
+    budget_ratio = 0.2
+    budget_max = 20.0
+    retry_codes = frozenset((500, 502, 503, 504))
+
+    clock = staticmethod(time.time)
+    random = staticmethod(random.random)
+
+    def __init__(self, **kwds):
+        for name, value in kwds.iteritems():
+            if not hasattr(self, name):
+                raise TypeError("unknown retry policy option %r" % (name,))
+            setattr(self, name, value)
+        self.budget = self.budget_max
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "<%s max_attempts=%r deadline=%r budget=%.1f>" % (
+            self.__class__.__name__, self.max_attempts, self.deadline,
+            self.budget)
+
+    def retryable(self, e):
+        """Whether S3Error *e* is worth retrying: a server error, throttling
+        or no response at all (e.g., a connection reset or timeout).
+        """
+        code = e.code
+        return code is None or code in self.retry_codes
+
+    def delay(self, retry_no):
+        """Seconds to wait before retry number *retry_no*, counting from 1."""
+        bound = min(self.max_delay, self.base_delay * (2 ** (retry_no - 1)))
+        return self.random() * bound
+
+    def begin(self):
+        """Start a request, returning its `RetryState`."""
+        with self.lock:
+            self.budget = min(self.budget_max, self.budget + self.budget_ratio)
+        return RetryState(self)
+
+    def withdraw(self):
+        """Take one retry from the budget, returning False if there is none."""
+        with self.lock:
+            if self.budget < 1.0:
+                return False
+            self.budget -= 1.0
+            return True
+
+class RetryState(object):
+    """Retries of one request under *policy*."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.attempts = 1
+        self.started = policy.clock()
+
+    def next_delay(self, e):
+        """Seconds to wait before retrying after error *e*, or None to give
+        up and raise it.
+        """
+        policy = self.policy
+        if not policy.retryable(e) or self.attempts >= policy.max_attempts:
+            return None
+        delay = policy.delay(self.attempts)
+        if policy.deadline is not None:
+            if policy.clock() + delay - self.started > policy.deadline:
+                return None
+        if not policy.withdraw():
+            return None
+        self.attempts += 1
+        return delay
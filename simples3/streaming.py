@@ -6,11 +6,16 @@ Usage::
     >>> bucket.put_file("huge_cd.iso", "foo/huge_cd.iso", acl="public-read")
     >>> with open("foo/huge_cd.iso", "rb") as fp:
     ...     bucket.put_file("memdump.bin", fp)
+
+Files of *multipart_threshold* bytes or more are sent as multipart uploads,
+several parts at a time.
 """
 
 import os
+import stat
 import urllib2
 from simples3.bucket import S3Bucket
+from simples3.multipart import upload_file
 
 class ProgressCallingFile(object):
     __slots__ = ("fp", "pos", "size", "progress")
@@ -30,22 +35,42 @@ class ProgressCallingFile(object):
         self.progress(self.pos, self.size, len(chunk))
         return chunk
 
+def _regular_file_size(fp):
+    """Get the size of *fp* if it's a regular file, or None."""
+    try:
+        st = os.fstat(fp.fileno())
+    except (AttributeError, IOError, OSError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_size
+
 class StreamingMixin(object):
     def put_file(self, key, fp, acl=None, metadata={}, progress=None,
-                 size=None, mimetype=None, transformer=None, headers={}):
+                 size=None, mimetype=None, transformer=None, headers={},
+                 part_size=None, n_workers=None):
         """Put file-like object or filename *fp* on S3 as *key*.
 
         *fp* must have a read method that takes a buffer size, and must behave
         correctly with regards to seeking and telling.
 
         *size* can be specified as a size hint. Otherwise the size is figured
-        out via ``os.fstat``, and requires that *fp* have a functioning
-        ``fileno()`` method.
+        out via ``os.fstat`` if *fp* is a regular file. Files of unknown size,
+        such as pipes, are uploaded with `put_stream` unless there is a
+        *transformer*.
 
         *progress* is a callback that might look like ``p(current, total,
         last_read)``. ``current`` is the current position, ``total`` is the
         size, and ``last_read`` is how much was last read. ``last_read`` is
         zero on EOF.
+
+        If *size* is at least *multipart_threshold*, the file is uploaded in
+        parts of *part_size* bytes, *n_workers* parts at a time; progress is
+        then reported as each part is done. A *transformer* needs all of the
+        data at once, and so rules out multipart uploads, unless it has a
+        ``stream(headers, fp)`` method returning a file-like object, like
+        those of `simples3.compression`. What that reads is uploaded with
+        `put_stream`.
         """
         headers = headers.copy()
         do_close = False
@@ -53,20 +78,44 @@ class StreamingMixin(object):
             fp = open(fp, "rb")
             do_close = True
 
-        if size is None and hasattr(fp, "fileno"):
-            size = os.fstat(fp.fileno()).st_size
-        if "Content-Length" not in headers:
-            if size is None:
-                raise TypeError("no size given and fp does not have a fileno")
+        if size is None:
+            size = _regular_file_size(fp)
+        if hasattr(transformer, "stream") or (
+                size is None and "Content-Length" not in headers
+                and transformer is None):
+            if transformer is not None:
+                fp = transformer.stream(headers, fp)
+            try:
+                self.put_stream(key, fp, acl=acl, metadata=metadata,
+                                mimetype=mimetype, headers=headers,
+                                part_size=part_size, n_workers=n_workers,
+                                progress=progress)
+            finally:
+                if do_close:
+                    fp.close()
+            return
+
+        if "Content-Length" not in headers and transformer is None:
             headers["Content-Length"] = str(size)
 
-        if progress:
+        multipart = (transformer is None and size is not None
+                     and int(size) >= self.multipart_threshold)
+        if progress and not multipart and size is not None:
             fp = ProgressCallingFile(fp, int(size), progress)
 
         try:
-            self.put(key, data=fp, acl=acl, metadata=metadata,
-                     mimetype=mimetype, transformer=transformer,
-                     headers=headers)
+            if multipart:
+                for header in ("Content-Length", "Content-MD5"):
+                    headers.pop(header, None)
+                upload_file(self, key, fp, size=int(size), progress=progress,
+                            part_size=part_size or self.multipart_part_size,
+                            n_workers=n_workers or self.multipart_workers,
+                            acl=acl, metadata=metadata, mimetype=mimetype,
+                            headers=headers)
+            else:
+                self.put(key, data=fp, acl=acl, metadata=metadata,
+                         mimetype=mimetype, transformer=transformer,
+                         headers=headers)
         finally:
             if do_close:
                 fp.close()
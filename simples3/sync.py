@@ -0,0 +1,215 @@
+"""Mirroring local directories to a bucket
+
+The local tree is walked in key order and merge-joined against a listing of
+the destination prefix, so neither side has to be held in memory; uploads,
+and deletions in batches, are made as the walk goes. A file is
+uploaded if its key is missing, if the sizes differ, or if the local file was
+modified after the object was; with *checksum*, the local MD5 is compared
+against the ETag instead of looking at times. Keys with no local file left
+are deleted if asked to::
+
+    >>> rv = sync_dir(bucket, "site/", prefix="www/", delete=True)
+    >>> rv["uploaded"], rv["skipped_bytes"]
+    (3, 104857600)
+
+Pass *dry_run* to only see what would be done; *report* is called with each
+`SyncAction` as it is decided upon::
+
+    >>> def show(action): print action
+    >>> rv = sync_dir(bucket, "site/", prefix="www/", dry_run=True, report=show)
+    upload www/index.html (changed, 5120 bytes)
+    skip www/logo.png (3145728 bytes)
+"""
+
+from __future__ import absolute_import
+
+import os
+import stat
+import hashlib
+
+from .concurrency import imap
+
+# Keys deleted in one request, the most S3 takes.
+delete_batch_size = 1000
+
+class SyncAction(object):
+    """What to do about one key: "upload", "delete" or "skip".
+
+    *path* is the local file, None for deletions; *size* is the size that
+    gets uploaded, deleted or skipped. *reason* says why a file is uploaded:
+    "new", "size", "changed" or "checksum".
+    """
+
+    __slots__ = ("action", "key", "path", "size", "reason")
+
+    def __init__(self, action, key, path, size, reason=None):
+        self.action = action
+        self.key = key
+        self.path = path
+        self.size = size
+        self.reason = reason
+
+    def __repr__(self):
+        return "%s(%r, %r, %r, %r, %r)" % (
+            self.__class__.__name__, self.action, self.key, self.path,
+            self.size, self.reason)
+
+    def __str__(self):
+        if self.reason:
+            return "%s %s (%s, %d bytes)" % (self.action, self.key,
+                                             self.reason, self.size)
+        return "%s %s (%d bytes)" % (self.action, self.key, self.size)
+
+def walk_files(root):
+    """Yield (relative key, path, size, mtime) for files under *root*.
+
+    Files come in the order S3 lists keys, by the bytes of their keys, where
+    directory ``a`` contributes keys starting with ``a/``. Symbolic links to
+    directories are not followed.
+    """
+    entries = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Dangling link, or removed since it was listed.
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            if not os.path.islink(path):
+                entries.append((name + "/", path, None))
+        elif stat.S_ISREG(st.st_mode):
+            entries.append((name, path, st))
+    entries.sort()
+    for name, path, st in entries:
+        if st is None:
+            for key, subpath, size, mtime in walk_files(path):
+                yield name + key, subpath, size, mtime
+        else:
+            yield name, path, st.st_size, st.st_mtime
+
+def file_md5(path, chunk_size=1 << 20):
+    """Hex MD5 digest of the file at *path*."""
+    hasher = hashlib.md5()
+    with open(path, "rb") as fp:
+        while True:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _utf8(key):
+    if isinstance(key, unicode):
+        return key.encode("utf-8")
+    return key
+
+def compare(path, size, mtime, entry, checksum=False):
+    """Say why local file *path* differs from listing *entry*, or None.
+
+    The ETag of a multipart upload is no MD5 of the object, so for those the
+    modification times are compared even with *checksum*.
+    """
+    if size != entry.size:
+        return "size"
+    etag = entry.etag.strip('"')
+    if checksum and "-" not in etag:
+        if file_md5(path) != etag:
+            return "checksum"
+    elif mtime > entry.mtime:
+        return "changed"
+    return None
+
+def plan_sync(bucket, path, prefix="", delete=False, checksum=False):
+    """Yield a `SyncAction` for every file under *path* and key under
+    *prefix*, in key order.
+
+    *prefix* is taken to be a directory: a slash is added unless it is empty
+    or already ends in one, so that no keys but the ones under it are
+    considered for deletion. Without *delete*, keys missing locally are left
+    out of the plan altogether.
+    """
+    prefix = _utf8(prefix)
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    local = walk_files(path)
+    remote = bucket.listdir(prefix=prefix, lazy=True)
+    cut = len(prefix)
+    lnext = next(local, None)
+    rnext = next(remote, None)
+    while lnext is not None or rnext is not None:
+        rkey = _utf8(rnext.key)[cut:] if rnext is not None else None
+        if rnext is None or (lnext is not None and lnext[0] < rkey):
+            key, fpath, size, mtime = lnext
+            yield SyncAction("upload", prefix + key, fpath, size, "new")
+            lnext = next(local, None)
+        elif lnext is None or rkey < lnext[0]:
+            if delete:
+                yield SyncAction("delete", prefix + rkey, None, rnext.size)
+            rnext = next(remote, None)
+        else:
+            key, fpath, size, mtime = lnext
+            reason = compare(fpath, size, mtime, rnext, checksum=checksum)
+            if reason:
+                yield SyncAction("upload", prefix + key, fpath, size, reason)
+            else:
+                yield SyncAction("skip", prefix + key, fpath, size)
+            lnext = next(local, None)
+            rnext = next(remote, None)
+
+def sync_dir(bucket, path, prefix="", delete=False, checksum=False,
+             dry_run=False, n_workers=4, report=None, **kwds):
+    """Make the keys under *prefix* mirror the files under *path*.
+
+    See `plan_sync` for what is compared. Changed files are uploaded with
+    `S3Bucket.put_buffer`, *n_workers* at a time, passing on keyword
+    arguments such as *acl*; with *delete*, keys without a local file are
+    deleted in batches of *delete_batch_size*, sent on the same workers as
+    the walk reaches them. If *dry_run*, nothing is changed, but the plan is
+    reported and summed up all the same.
+
+    *report* is called with each `SyncAction`, as it is planned. Returns a
+    dict with the number of keys *uploaded*, *skipped* and *deleted*, the
+    bytes of each (*uploaded_bytes* and so on), and the *errors* of the
+    deletions, like for `S3Bucket.delete_many`.
+    """
+    rv = {"uploaded": 0, "uploaded_bytes": 0, "skipped": 0,
+          "skipped_bytes": 0, "deleted": 0, "deleted_bytes": 0, "errors": []}
+    counts = {"upload": "uploaded", "skip": "skipped", "delete": "deleted"}
+    def tally():
+        # Uploads one at a time, and deletions in lists of actions.
+        batch = []
+        for action in plan_sync(bucket, path, prefix=prefix, delete=delete,
+                                checksum=checksum):
+            if report:
+                report(action)
+            name = counts[action.action]
+            rv[name] += 1
+            rv[name + "_bytes"] += action.size
+            if dry_run:
+                continue
+            elif action.action == "upload":
+                yield action
+            elif action.action == "delete":
+                batch.append(action)
+                if len(batch) == delete_batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    def send(work):
+        if isinstance(work, list):
+            return work, bucket._delete_batch([a.key for a in work])
+        bucket.put_buffer(work.key, work.path, **kwds)
+        return work, None
+
+    # Uploads start while the rest of the tree is still being compared.
+    for work, errors in imap(send, tally(), n_workers=n_workers,
+                             ordered=False):
+        if errors:
+            sizes = dict((action.key, action.size) for action in work)
+            for key, code, message in errors:
+                rv["deleted"] -= 1
+                rv["deleted_bytes"] -= sizes.get(_utf8(key), 0)
+            rv["errors"].extend(errors)
+    return rv
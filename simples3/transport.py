@@ -0,0 +1,196 @@
+"""Transports sending requests for a bucket
+
+A transport takes a signed `S3Request` and the URL to send it to, and returns
+the response once its status line and headers are in, raising `S3Error` for
+an error response or a failed connection. `S3Bucket.transport` is by default
+an `HTTPTransport`, which talks to httplib directly over pooled keep-alive
+connections, and returns a `Response`::
+
+    >>> resp = bucket.get("photos/puppy.jpg")
+    >>> resp.status, resp.headers["content-type"]
+    (200, 'image/jpeg')
+
+`simples3.opener.Urllib2Transport` goes through a urllib2 opener instead, as
+all requests used to; buckets overriding `S3Bucket.build_opener` get it, and
+so do buckets given an opener, or for which the environment sets a proxy
+(``HTTP_PROXY`` and the like). It costs more per request, but handlers can be
+plugged into the opener, proxies are used, and redirects are followed. Other
+transports are set when making the bucket::
+
+    >>> bucket = S3Bucket("johnsmith", transport=Urllib2Transport(opener))
+"""
+
+from __future__ import absolute_import
+
+import socket
+import httplib
+
+from .bucket import S3Error, error_classes
+from .connpool import ConnectionPool, PooledResponse, _rewind
+
+class Transport(object):
+    """Sends requests; see the module documentation."""
+
+    def open(self, s3req, url, timeout=None):
+        """Send *s3req* to *url*, returning the response.
+
+        *timeout* is in seconds, None for the default socket timeout.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Close connections kept open for reuse, if any."""
+
+class Headers(dict):
+    """Response headers: a dict with lower-case names, in which names are
+    looked up whatever their case, and which has `getheader` like the
+    `mimetools.Message` headers of urllib2 responses.
+    """
+
+    def __init__(self, items=()):
+        dict.__init__(self, ((name.lower(), value) for name, value in items))
+
+    def __getitem__(self, name):
+        return dict.__getitem__(self, name.lower())
+
+    def __setitem__(self, name, value):
+        dict.__setitem__(self, name.lower(), value)
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name.lower())
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name.lower())
+
+    has_key = __contains__
+
+    def get(self, name, default=None):
+        return dict.get(self, name.lower(), default)
+
+    getheader = get
+
+    def copy(self):
+        return self.__class__(self.iteritems())
+
+class Response(object):
+    """Response to a request sent by `HTTPTransport`.
+
+    *status* and *reason* are those of the status line, and *headers* are
+    `Headers`. The body is read from *raw*, a file-like object,
+    or through `read`, `readline` and iteration on the response itself; the
+    connection goes back to the pool once it has been read to the end.
+
+    Like a urllib2 response, it also has *code* and *msg*, and `info`,
+    `getcode` and `geturl`, where `info` gives *headers*.
+    """
+
+    def __init__(self, status, reason, headers, raw, url):
+        self.status = self.code = status
+        self.reason = self.msg = reason
+        self.headers = headers
+        self.raw = raw
+        self.url = url
+        self.read = raw.read
+        self.readline = raw.readline
+
+    def __repr__(self):
+        return "<%s %d %s>" % (self.__class__.__name__, self.status,
+                               self.reason)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+    def geturl(self):
+        return self.url
+
+    def close(self):
+        self.raw.close()
+
+class HTTPTransport(Transport):
+    """Sends requests with httplib over connections kept in *pool*.
+
+    Non-2xx responses raise `S3Error`, or the subclass for their code, with
+    the message S3 gives; redirects are not followed, and proxies are not
+    used. *context* is the `ssl.SSLContext` for HTTPS connections, if not
+    the default.
+    """
+
+    def __init__(self, pool=None, context=None):
+        self.pool = ConnectionPool() if pool is None else pool
+        self.context = context
+
+    def open(self, s3req, url, timeout=None):
+        scheme, _, rest = url.partition("://")
+        host, slash, selector = rest.partition("/")
+        selector = slash + selector or "/"
+        if timeout is None:
+            timeout = socket.getdefaulttimeout()
+        if scheme == "https":
+            http_class = httplib.HTTPSConnection
+            conn_args = {} if self.context is None else {"context": self.context}
+        else:
+            http_class, conn_args = httplib.HTTPConnection, {}
+        data = s3req.data
+        pos = data.tell() if hasattr(data, "tell") else None
+
+        key = (http_class, host)
+        def factory():
+            conn = http_class(host, timeout=timeout, **conn_args)
+            conn.connect()
+            # Headers and body go out in separate writes, which with Nagle's
+            # algorithm and delayed ACKs stalls every other request.
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return conn
+
+        while True:
+            try:
+                conn, reused = self.pool.acquire(key, factory)
+            except socket.error, e:
+                raise S3Error("connection error", key=s3req.key, reason=e)
+            if reused:
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(s3req.method, selector, data, s3req.headers)
+                r = conn.getresponse(buffering=True)
+            except (socket.error, httplib.HTTPException), e:
+                conn.close()
+                # A reused connection may have been closed by the server while
+                # we weren't looking; try again on a fresh one.
+                if reused and not isinstance(e, socket.timeout) \
+                        and _rewind(data, pos):
+                    continue
+                raise S3Error("connection error", key=s3req.key, reason=e)
+            break
+
+        raw = socket._fileobject(PooledResponse(self.pool, key, conn, r),
+                                 close=True)
+        resp = Response(r.status, r.reason, Headers(r.getheaders()), raw, url)
+        if not 200 <= r.status < 300:
+            raise self.error(resp, key=s3req.key)
+        return resp
+
+    def error(self, resp, **extra):
+        """Make the `S3Error` for error response *resp*, reading its body."""
+        exc_cls = error_classes.get(resp.status, S3Error)
+        e = exc_cls("HTTP error", reason=resp.reason, code=resp.status,
+                    filename=resp.url, **extra)
+        e.headers = resp.headers
+        try:
+            data = resp.read()
+        except (socket.error, httplib.HTTPException), read_error:
+            e.extra["read_error"] = read_error
+        else:
+            if data:
+                e.set_data(data)
+        resp.close()
+        return e
+
+    def close(self):
+        self.pool.clear()
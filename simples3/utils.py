@@ -1,11 +1,10 @@
 """Misc. S3-related utilities."""
 
+import mmap
 import time
 import hashlib
 import datetime
-import mimetypes
 from base64 import b64encode
-from urllib import quote
 from calendar import timegm
 
 def _amz_canonicalize(headers):
@@ -38,15 +37,91 @@ def headers_metadata(headers):
 
 iso8601_fmt = '%Y-%m-%dT%H:%M:%S.000Z'
 
-def _iso8601_dt(v): return datetime.datetime.strptime(v, iso8601_fmt)
+def _iso8601_fields(v):
+    """Split ISO 8601 timestamp *v* into (year, month, day, hour, min, sec).
+
+    >>> _iso8601_fields("2009-10-12T17:50:30.000Z")
+    (2009, 10, 12, 17, 50, 30)
+    """
+    # S3 only ever gives this one format, and slicing it up is many times
+    # faster than strptime.
+    if len(v) == 24 and v[4] == v[7] == "-" and v[10] == "T" and v[19:] == ".000Z":
+        try:
+            return (int(v[:4]), int(v[5:7]), int(v[8:10]),
+                    int(v[11:13]), int(v[14:16]), int(v[17:19]))
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(v, iso8601_fmt).timetuple()[:6]
+
+def _iso8601_dt(v):
+    """Parse ISO 8601 timestamp *v* into a naive datetime in UTC.
+
+    >>> _iso8601_dt("2009-10-12T17:50:30.000Z")
+    datetime.datetime(2009, 10, 12, 17, 50, 30)
+    """
+    return datetime.datetime(*_iso8601_fields(v))
+
+def _iso8601_epoch(v):
+    """Parse ISO 8601 timestamp *v* into seconds since the epoch.
+
+    >>> _iso8601_epoch("1970-01-02T00:00:01.000Z")
+    86401
+    """
+    return timegm(_iso8601_fields(v))
+
+_weekdays = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_months = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+           "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+_month_numbers = dict((name, i + 1) for (i, name) in enumerate(_months))
+
+def _rfc822_format(t):
+    """Format seconds since the epoch *t* as an HTTP date.
+
+    >>> _rfc822_format(1255369830)
+    'Mon, 12 Oct 2009 17:50:30 GMT'
+    """
+    # What email.utils.formatdate(t, usegmt=True) gives, without importing
+    # the email package.
+    tm = time.gmtime(t)
+    return "%s, %02d %s %04d %02d:%02d:%02d GMT" % (
+        _weekdays[tm.tm_wday], tm.tm_mday, _months[tm.tm_mon - 1],
+        tm.tm_year, tm.tm_hour, tm.tm_min, tm.tm_sec)
+
+def _rfc822_fields(v):
+    """Split HTTP date *v* into (year, month, day, hour, min, sec).
+
+    >>> _rfc822_fields("Mon, 06 Sep 2010 19:34:18 GMT")
+    (2010, 9, 6, 19, 34, 18)
+    >>> _rfc822_fields("Monday, 06-Sep-10 19:34:18 GMT")
+    (2010, 9, 6, 19, 34, 18)
+    """
+    # S3 only ever sends this one format; anything else is left to the
+    # email package.
+    if len(v) == 29 and v[3:5] == ", " and v[25:] == " GMT":
+        month = _month_numbers.get(v[8:11])
+        if month:
+            try:
+                return (int(v[12:16]), month, int(v[5:7]),
+                        int(v[17:19]), int(v[20:22]), int(v[23:25]))
+            except ValueError:
+                pass
+    from email.utils import parsedate
+    return parsedate(v)[:6]
+
+_fmtdate_cache = (None, None)
 def rfc822_fmtdate(t=None):
-    from email.utils import formatdate
+    global _fmtdate_cache
     if t is None:
-        t = datetime.datetime.utcnow()
-    return formatdate(timegm(t.timetuple()), usegmt=True)
+        # Requests are dated to the second, so format once per second.
+        now = int(time.time())
+        cached_at, rv = _fmtdate_cache
+        if cached_at != now:
+            rv = _rfc822_format(now)
+            _fmtdate_cache = (now, rv)
+        return rv
+    return _rfc822_format(timegm(t.timetuple()))
 def rfc822_parsedate(v):
-    from email.utils import parsedate
-    return datetime.datetime.fromtimestamp(time.mktime(parsedate(v)))
+    return datetime.datetime(*_rfc822_fields(v))
 
 def expire2datetime(expire, base=None):
     """Force *expire* into a datetime relative to *base*.
@@ -85,13 +160,17 @@ def expire2datetime(expire, base=None):
         else:
             return datetime.datetime.fromtimestamp(expire)
 
-def aws_md5(data):
-    """Make an AWS-style MD5 hash (digest in base64)."""
+def aws_md5(data, chunk_size=1 << 20):
+    """Make an AWS-style MD5 hash (digest in base64).
+
+    *data* is a string, a buffer-like object such as a `bytearray` or an
+    `mmap.mmap`, or a file object, which is read *chunk_size* bytes at a time.
+    """
     hasher = hashlib.new("md5")
-    if hasattr(data, "read"):
+    if hasattr(data, "read") and not isinstance(data, mmap.mmap):
         data.seek(0)
         while True:
-            chunk = data.read(8192)
+            chunk = data.read(chunk_size)
             if not chunk:
                 break
             hasher.update(chunk)
@@ -100,15 +179,53 @@ def aws_md5(data):
         hasher.update(data)
     return b64encode(hasher.digest()).decode("ascii")
 
-def aws_urlquote(value):
+# Importing urllib for its quoting takes socket and ssl along, which is most
+# of what importing simples3 would cost; these are the same, for byte strings.
+_always_safe = ("ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                "abcdefghijklmnopqrstuvwxyz0123456789_.-")
+_quoters = {}
+
+def quote(s, safe="/"):
+    """Percent-encode byte string *s* but for *safe* characters, like
+    `urllib.quote`.
+
+    >>> quote("a b/c~")
+    'a%20b/c%7E'
+    """
+    try:
+        safe_chars, quote_map = _quoters[safe]
+    except KeyError:
+        safe_chars = _always_safe + safe
+        quote_map = {}
+        for i in xrange(256):
+            c = chr(i)
+            quote_map[c] = c if c in safe_chars else "%%%02X" % i
+        _quoters[safe] = safe_chars, quote_map
+    if not s.rstrip(safe_chars):
+        return s
+    return "".join(map(quote_map.__getitem__, s))
+
+def quote_plus(s, safe=""):
+    """Like `quote`, but spaces become plus signs, like `urllib.quote_plus`.
+
+    >>> quote_plus("a b/c")
+    'a+b%2Fc'
+    """
+    if " " in s:
+        return quote(s, safe + " ").replace(" ", "+")
+    return quote(s, safe)
+
+def aws_urlquote(value, safe="/"):
     r"""AWS-style quote a URL part.
 
     >>> aws_urlquote("/bucket/a key")
     '/bucket/a%20key'
+    >>> aws_urlquote("partNumber=1&uploadId=a b", safe="/=&")
+    'partNumber=1&uploadId=a%20b'
     """
     if isinstance(value, unicode):
         value = value.encode("utf-8")
-    return quote(value, "/")
+    return quote(value, safe)
 
 def guess_mimetype(fn, default="application/octet-stream"):
     """Guess a mimetype from filename *fn*.
@@ -122,8 +239,17 @@ def guess_mimetype(fn, default="application/octet-stream"):
         return default
     bfn, ext = fn.lower().rsplit(".", 1)
     if ext == "jpg": ext = "jpeg"
+    import mimetypes
     return mimetypes.guess_type(bfn + "." + ext)[0] or default
 
+def xml_escape(s):
+    """Escape *s* for XML character data.
+
+    >>> xml_escape("a<b & c>d")
+    'a&lt;b &amp; c&gt;d'
+    """
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
 def info_dict(headers):
     rv = {"headers": headers, "metadata": headers_metadata(headers)}
     if "content-length" in headers:
@@ -136,6 +262,23 @@ def info_dict(headers):
         rv["modify"] = rfc822_parsedate(headers["last-modified"])
     return rv
 
+def chunked(iterable, n):
+    """Split *iterable* into lists of *n* items, the last one possibly shorter.
+
+    >>> list(chunked(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    >>> list(chunked([], 2))
+    []
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == n:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
 def name(o):
     """Find the name of *o*.
 
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+import os
+import sys
 import datetime
 import urllib2
 from nose.tools import eq_
@@ -13,6 +15,11 @@ except ImportError:
 import simples3
 from simples3.utils import rfc822_fmtdate
 
+# Tests over real connections run against the in-process S3 of the benchmarks.
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir,
+                             "benchmarks"))
+import s3standin
+
 # httplib.HTTPMessage is useless for mocking contexts, use own
 class MockHTTPMessage(object):
     def __init__(self, d=None):
@@ -0,0 +1,152 @@
+from __future__ import with_statement
+
+import gzip
+import unittest
+from nose.tools import eq_, assert_raises
+from nose.plugins.skip import SkipTest
+from cStringIO import StringIO
+
+import simples3
+from simples3 import aio
+from simples3.retry import RetryPolicy
+from tests import s3standin
+
+class AsyncBucketTests(unittest.TestCase):
+    def setUp(self):
+        if aio.asyncio is None:
+            raise SkipTest("trollius is not installed")
+        self.server = s3standin.start()
+        self.loop = aio.asyncio.new_event_loop()
+        self.bucket = aio.AsyncS3Bucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url=self.server.url,
+            loop=self.loop, max_concurrency=4)
+
+    def tearDown(self):
+        self.bucket.close()
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def contents(self):
+        return dict((key, obj.data)
+                    for (key, obj) in self.server.objects.items())
+
+    def test_put_get(self):
+        self.wait(self.bucket.put("foo.txt", "bar"))
+        eq_(self.contents(), {"foo.txt": "bar"})
+        fp = self.wait(self.bucket.get("foo.txt"))
+        eq_(fp.code, 200)
+        eq_(fp.s3_info["mimetype"], "text/plain")
+        eq_(self.wait(fp.read()), "bar")
+        eq_(self.wait(self.bucket.info("foo.txt"))["size"], 3)
+
+    def test_concurrent_reuse(self):
+        for i in xrange(20):
+            self.server.objects["k%d" % i] = s3standin.StoredObject(
+                "v%d" % i)
+        @aio.coroutine
+        def fetch(key):
+            fp = yield aio.From(self.bucket.get(key))
+            data = yield aio.From(fp.read())
+            raise aio.Return(data)
+        coros = [fetch("k%d" % i) for i in xrange(20)]
+        rv = self.wait(aio.asyncio.gather(*coros, loop=self.loop))
+        eq_(rv, ["v%d" % i for i in xrange(20)])
+        assert len(self.server.peers) <= 4, self.server.peers
+
+    def test_not_found(self):
+        try:
+            self.wait(self.bucket.get("nope"))
+        except simples3.KeyNotFound, e:
+            eq_(e.code, 404)
+            eq_(e.msg, "The specified key does not exist.")
+        else:
+            assert False, "KeyNotFound not raised"
+        # The connection is still good for the next request.
+        self.server.objects["foo"] = s3standin.StoredObject("bar")
+        fp = self.wait(self.bucket.get("foo"))
+        eq_(self.wait(fp.read()), "bar")
+
+    def test_truncated_error(self):
+        self.bucket = aio.AsyncS3Bucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url=self.bucket.base_url, loop=self.loop,
+            max_concurrency=2,
+            retry_policy=RetryPolicy(max_attempts=2, base_delay=0))
+        self.server.faults["truncated"] = lambda h: h.truncated_error(
+            503, "SlowDown", "Please reduce your request rate.")
+        for call in (self.bucket.get, self.bucket.delete, self.bucket.get):
+            try:
+                self.wait(aio.asyncio.wait_for(call("truncated"), 5,
+                                               loop=self.loop))
+            except simples3.S3Error, e:
+                eq_(e.code, 503)
+                assert "read_error" in e.extra
+            else:
+                assert False, "S3Error not raised"
+        # Every attempt gave its slot back.
+        eq_(self.wait(self.bucket.put("foo", "bar")), None)
+
+    def test_delete(self):
+        self.server.objects["foo"] = s3standin.StoredObject("bar")
+        assert self.wait(self.bucket.delete("foo"))
+        eq_(self.contents(), {})
+        assert_raises(TypeError, self.wait, self.bucket.delete())
+
+    def test_listdir(self):
+        for key in "abc":
+            self.server.objects[key] = s3standin.StoredObject(key * 2)
+        # One key per page.
+        listing = self.bucket.listdir(limit=1)
+        keys = []
+        while True:
+            entry = self.wait(listing.next_entry())
+            if entry is None:
+                break
+            keys.append((entry[0], entry[3]))
+        eq_(keys, [("a", 2), ("b", 2), ("c", 2)])
+
+    def test_conditions(self):
+        self.wait(self.bucket.put("foo", "bar", if_none_match="*"))
+        assert_raises(simples3.PreconditionFailed, self.wait,
+                      self.bucket.put("foo", "baz", if_none_match="*"))
+        eq_(self.contents(), {"foo": "bar"})
+        etag = self.server.objects["foo"].etag
+        assert_raises(simples3.NotModified, self.wait,
+                      self.bucket.get("foo", if_none_match=etag))
+        assert_raises(simples3.NotModified, self.wait,
+                      self.bucket.info("foo", if_none_match=etag))
+        fp = self.wait(self.bucket.get("foo", if_none_match='"y"'))
+        eq_(self.wait(fp.read()), "bar")
+        self.wait(self.bucket.copy("johnsmith/foo", "bar", if_match=etag))
+        assert_raises(simples3.PreconditionFailed, self.wait,
+                      self.bucket.copy("johnsmith/foo", "baz",
+                                       if_match='"y"'))
+        eq_(self.contents(), {"foo": "bar", "bar": "bar"})
+
+    def test_decompress(self):
+        text = "hello world\n" * 10000
+        buf = StringIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as fp:
+            fp.write(text)
+        self.server.objects["log.gz"] = s3standin.StoredObject(
+            buf.getvalue(), {"content-encoding": "gzip"})
+        fp = self.wait(self.bucket.get("log.gz", decompress=True))
+        eq_(fp.s3_info["size"], len(buf.getvalue()))
+        eq_(self.wait(fp.read(5)), "hello")
+        eq_(self.wait(fp.read()), text[5:])
+        fp = self.wait(self.bucket.get("log.gz"))
+        eq_(self.wait(fp.read()), buf.getvalue())
+
+    def test_no_sync_operations(self):
+        # Operations waiting on responses aren't inherited half-working.
+        assert_raises(TypeError, lambda: "foo" in self.bucket)
+        for name in ("delete_many", "info_many", "get_file", "sync_dir"):
+            assert not hasattr(self.bucket, name), name
+        eq_(self.bucket.make_url("foo"), self.bucket.base_url + "/foo")
@@ -4,9 +4,11 @@ import StringIO
 import urllib2
 import unittest
 import datetime
-from nose.tools import eq_
+import tempfile
+from nose.tools import eq_, assert_raises
 
 import simples3
+from simples3.bucket import ListEntry
 from simples3.utils import aws_md5, aws_urlquote
 from simples3.utils import rfc822_fmtdate, rfc822_parsedate
 from tests import MockHTTPResponse, BytesIO, g
@@ -110,6 +112,20 @@ class GetTests(S3BucketTestCase):
                         "key='foo.txt', filename='http://johnsmith.s3."
                         "amazonaws.com/foo.txt')")
 
+    def test_get_not_modified(self):
+        g.bucket.add_resp("/foo.txt", g.H("text/plain", ("etag", '"abc"'),
+                                          ("x-amz-meta-foo", "bar")), "",
+                          status="304 Not Modified")
+        try:
+            g.bucket.get("foo.txt", if_none_match='"abc"')
+        except simples3.NotModified, e:
+            eq_(e.code, 304)
+            eq_(e.info["headers"]["etag"], '"abc"')
+            eq_(e.info["metadata"], {"foo": "bar"})
+        else:
+            assert False, "NotModified not raised"
+        eq_(g.bucket.mock_requests[-1].headers["If-none-match"], '"abc"')
+
 class InfoTests(S3BucketTestCase):
     headers = g.H("text/plain",
                   ("x-amz-meta-foo", "bar"),
@@ -122,6 +138,18 @@ class InfoTests(S3BucketTestCase):
         eq_(info["mimetype"], "text/plain")
         eq_(info["metadata"], {"foo": "bar"})
 
+    def test_info_conditional(self):
+        g.bucket.add_resp("/foo.txt", self.headers, "",
+                          status="412 Precondition Failed")
+        since = datetime.datetime(2009, 10, 12, 17, 50, 30)
+        assert_raises(simples3.PreconditionFailed, g.bucket.info, "foo.txt",
+                      if_match='"abc"', if_unmodified_since=since)
+        req = g.bucket.mock_requests[-1]
+        eq_(req.get_method(), "HEAD")
+        eq_(req.headers["If-match"], '"abc"')
+        eq_(req.headers["If-unmodified-since"],
+            "Mon, 12 Oct 2009 17:50:30 GMT")
+
     def test_mapping(self):
         g.bucket.add_resp("/foo.txt", self.headers, "")
         assert "foo.txt" in g.bucket
@@ -152,6 +180,13 @@ class PutTests(S3BucketTestCase):
         self._put_contents("bar.txt", "hi mom, how are you")
         self._put_contents("foo.txt", "hello")
 
+    def test_put_if_none_match(self):
+        g.bucket.add_resp("/foo.txt", g.H("application/xml"), "",
+                          status="412 Precondition Failed")
+        assert_raises(simples3.PreconditionFailed, g.bucket.put, "foo.txt",
+                      "hello", if_none_match="*")
+        eq_(g.bucket.mock_requests[-1].headers["If-none-match"], "*")
+
     def test_put_s3file(self):
         g.bucket.add_resp("/foo.txt", g.H("application/xml"), "OK!")
         g.bucket["foo.txt"] = simples3.S3File("hello")
@@ -171,6 +206,25 @@ class PutTests(S3BucketTestCase):
             eq_(req.get_selector(), "/foo.txt")
         eq_(g.bucket.mock_responses, [])
 
+    def test_put_buffer(self):
+        g.bucket.add_resp("/foo.txt", g.H("application/xml"), "OK!")
+        g.bucket.put_buffer("foo.txt", bytearray("hello"))
+        req = g.bucket.mock_requests[-1]
+        self._verify_headers("hello", req.headers)
+        eq_(str(req.get_data()), "hello")
+
+    def test_put_buffer_file(self):
+        fp = tempfile.NamedTemporaryFile()
+        fp.write("hello")
+        fp.flush()
+        g.bucket.add_resp("/foo.txt", g.H("application/xml"), "OK!")
+        g.bucket.put_buffer("foo.txt", fp.name)
+        req = g.bucket.mock_requests[-1]
+        self._verify_headers("hello", req.headers)
+        # Sent from the mapping itself, not a copy of it.
+        assert isinstance(req.get_data(), buffer)
+        fp.close()
+
 class DeleteTests(S3BucketTestCase):
     def test_delete(self):
         g.bucket.add_resp("/foo.txt", g.H("application/xml"), "<ok />")
@@ -185,6 +239,41 @@ class DeleteTests(S3BucketTestCase):
         g.bucket.add_resp("/?delete", g.H("application/xml"), expected)
         assert g.bucket.delete("foo.txt", "bar.txt", "baz.txt")
 
+    def test_delete_many(self):
+        ok = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<DeleteResult xmlns="http://s3.amazonaws.com/doc/2006-'
+              '03-01/">%s</DeleteResult>')
+        err = ("<Error><Key>k1500</Key><Code>AccessDenied</Code>"
+               "<Message>Access Denied</Message></Error>")
+        g.bucket.add_resp("/?delete", g.H("application/xml"), ok % "")
+        g.bucket.add_resp("/?delete", g.H("application/xml"), ok % err)
+        g.bucket.add_resp("/?delete", g.H("application/xml"), ok % "")
+        keys = ("k%d" % i for i in xrange(2500))
+        rv = g.bucket.delete_many(keys, n_workers=1)
+        eq_(rv, {"deleted": 2499,
+                 "errors": [("k1500", "AccessDenied", "Access Denied")]})
+        eq_([req.get_data().count("<Key>") for req in g.bucket.mock_requests],
+            [1000, 1000, 500])
+
+    def test_delete_prefix(self):
+        g.bucket.add_resp(listing_path(("prefix", u"a/")),
+                          g.H("application/xml"), listing_xml(["a/1", "a/2"]))
+        g.bucket.add_resp("/?delete", g.H("application/xml"),
+                          "<DeleteResult />")
+        eq_(g.bucket.delete_prefix("a/", n_workers=1),
+            {"deleted": 2, "errors": []})
+        assert "<Key>a/2</Key>" in g.bucket.mock_requests[-1].get_data()
+
+    def test_delete_many_entries(self):
+        g.bucket.add_resp("/?delete", g.H("application/xml"),
+                          "<DeleteResult />")
+        entries = [ListEntry(u"a/1", "2009-10-12T17:50:30.000Z", '"x"', 1),
+                   (u"a/2", None, '"y"', 2), u"a/3"]
+        eq_(g.bucket.delete_many(entries, n_workers=1),
+            {"deleted": 3, "errors": []})
+        data = g.bucket.mock_requests[-1].get_data()
+        eq_(data.count("<Key>a/"), 3)
+
     def test_delete_not_found(self):
         g.bucket.add_resp("/foo.txt", g.H("application/xml"),
                           "<notfound />", status="404 Not Found")
@@ -216,6 +305,16 @@ class CopyTests(S3BucketTestCase):
         req = g.bucket.mock_requests[-1]
         eq_(req.headers["X-amz-metadata-directive"], "REPLACE")
 
+    def test_copy_conditional(self):
+        g.bucket.add_resp("/bar", g.H("application/xml"), "<ok />")
+        since = datetime.datetime(2009, 10, 12, 17, 50, 30)
+        g.bucket.copy("foo/bar", "bar", if_match='"abc"',
+                      if_unmodified_since=since)
+        req = g.bucket.mock_requests[-1]
+        eq_(req.headers["X-amz-copy-source-if-match"], '"abc"')
+        eq_(req.headers["X-amz-copy-source-if-unmodified-since"],
+            "Mon, 12 Oct 2009 17:50:30 GMT")
+
 class ListDirTests(S3BucketTestCase):
     def test_listdir(self):
         xml = """
@@ -262,6 +361,49 @@ class ListDirTests(S3BucketTestCase):
             eq_(tup, next_reftup())
             key, mtype, etag, size = tup
 
+    def test_listdir_truncated(self):
+        page = """
+<?xml version="1.0" encoding="UTF-8"?>
+<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+    <Name>bucket</Name>
+    <IsTruncated>%s</IsTruncated>
+    <Contents>
+        <Key>%s</Key>
+        <LastModified>2009-10-12T17:50:30.000Z</LastModified>
+        <ETag>&quot;fba9dede5f27731c9771645a39863328&quot;</ETag>
+        <Size>1</Size>
+    </Contents>
+</ListBucketResult>
+""".lstrip()
+        g.bucket.add_resp("/", g.H("application/xml"), page % ("true", "a"))
+        g.bucket.add_resp("/?marker=a", g.H("application/xml"),
+                          page % ("false", "b"))
+        eq_(["a", "b"], [key for (key, _, _, _) in g.bucket.listdir()])
+
+    def test_listdir_fields(self):
+        page = listing_xml(["a", "b"])
+        g.bucket.add_resp("/", g.H("application/xml"), page)
+        eq_(list(g.bucket.listdir(fields=("size", "key"))),
+            [(1, "a"), (1, "b")])
+        g.bucket.add_resp("/", g.H("application/xml"), page)
+        entry = next(g.bucket.listdir(lazy=True))
+        eq_(entry, ("a", datetime.datetime(2009, 10, 12, 17, 50, 30), '"x"', 1))
+        eq_(entry.mtime, 1255369830)
+        eq_((entry.key, entry.size), ("a", 1))
+
+    def test_listing_incremental(self):
+        head = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/'
+                '2006-03-01/"><IsTruncated>false</IsTruncated>')
+        entry = ("<Contents><Key>%d</Key><LastModified>2009-10-12T17:50:30"
+                 ".000Z</LastModified><ETag>x</ETag><Size>1</Size></Contents>")
+        body = head + "".join(entry % i for i in xrange(5000))
+        body += "</ListBucketResult>"
+        fp = BytesIO(body)
+        listing = simples3.bucket.S3Listing.parse(fp)
+        eq_(next(iter(listing))[0], "0")
+        assert fp.tell() < len(body), "read all before yielding"
+
     def test_empty_listing(self):
         xml = """
 <?xml version="1.0" encoding="UTF-8"?>
@@ -276,6 +418,96 @@ class ListDirTests(S3BucketTestCase):
         g.bucket.add_resp("/", g.H("application/xml"), xml)
         eq_([], list(g.bucket.listdir()))
 
+def listing_xml(keys, prefixes=(), truncated=False):
+    entry = ("<Contents><Key>%s</Key><LastModified>2009-10-12T17:50:30.000Z"
+             "</LastModified><ETag>&quot;x&quot;</ETag><Size>1</Size>"
+             "</Contents>")
+    common = "<CommonPrefixes><Prefix>%s</Prefix></CommonPrefixes>"
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            '<IsTruncated>%s</IsTruncated>%s%s</ListBucketResult>') % (
+        str(truncated).lower(),
+        "".join(entry % key for key in keys),
+        "".join(common % prefix for prefix in prefixes))
+
+def listing_path(*args):
+    args = dict((k, v.encode("utf-8")) for (k, v) in args)
+    return simples3.bucket.S3Request(key="", args=args).url("")
+
+class InfoManyTests(S3BucketTestCase):
+    def add_listing(self, args, *a, **k):
+        g.bucket.add_resp(listing_path(*args), g.H("application/xml"),
+                          listing_xml(*a, **k))
+
+    def add_head(self, key, status="200 OK"):
+        g.bucket.add_resp("/" + key, g.H("text/plain",
+            ("etag", '"y"'), ("content-length", "3"),
+            ("last-modified", "Mon, 12 Oct 2009 17:50:30 GMT")), "",
+            status=status)
+
+    def test_listed(self):
+        keys = ["d/%d" % i for i in xrange(8)]
+        self.add_listing([("prefix", u"d/"),
+                          ("marker", u"d//\U0010ffff")],
+                         ["d/0"] + keys[2:] + ["d/9"])
+        self.add_head("x")
+        rv = g.bucket.info_many(keys + ["x"], n_workers=1)
+        modified = datetime.datetime(2009, 10, 12, 17, 50, 30)
+        eq_(rv["d/0"], (modified, '"x"', 1))
+        eq_(rv["d/1"], None)
+        eq_(rv["x"], (modified, '"y"', 3))
+        eq_(len(g.bucket.mock_requests), 2)
+
+    def test_sparse(self):
+        keys = ["d/%s" % c for c in "abcdefgh"]
+        self.add_listing([("prefix", u"d/"),
+                          ("marker", u"d/`\U0010ffff")],
+                         ["d/a", "d/a1", "d/a2"], truncated=True)
+        for key in keys[1:-1]:
+            self.add_head(key)
+        self.add_head(keys[-1], status="404 Not Found")
+        rv = g.bucket.exists_many(keys, n_workers=1)
+        eq_(rv, dict((key, key != "d/h") for key in keys))
+
+class ParallelListDirTests(S3BucketTestCase):
+    def add_listing(self, args, *a, **k):
+        g.bucket.add_resp(listing_path(*args), g.H("application/xml"),
+                          listing_xml(*a, **k))
+
+    def keys(self, **kwds):
+        kwds.setdefault("n_workers", 1)
+        return [key for (key, _, _, _) in g.bucket.listdir_parallel(**kwds)]
+
+    def test_prefixes(self):
+        self.add_listing([("prefix", u"a/")], ["a/1", "a/x/2"])
+        self.add_listing([("prefix", u"b/")], ["b/1"])
+        eq_(self.keys(prefixes=["b/", "a/x", "a/"]), ["a/1", "a/x/2", "b/1"])
+
+    def test_delimiter(self):
+        self.add_listing([("prefix", u""), ("delimiter", u"/")],
+                         ["top.txt"], ["a/", "z/"])
+        self.add_listing([("prefix", u"a/")], ["a/1", "a/2"], truncated=True)
+        self.add_listing([("prefix", u"a/"), ("marker", u"a/2")], ["a/3"])
+        self.add_listing([("prefix", u"z/")], ["z/1"])
+        eq_(self.keys(delimiter="/"), ["a/1", "a/2", "a/3", "top.txt", "z/1"])
+
+    def test_split(self):
+        self.add_listing([("prefix", u""), ("max-keys", u"1")], ["apple"],
+                         truncated=True)
+        self.add_listing([("prefix", u""), ("marker", u"a\U0010ffff"),
+                          ("max-keys", u"1")], ["banana"])
+        self.add_listing([("prefix", u""), ("marker", u"b\U0010ffff"),
+                          ("max-keys", u"1")], [])
+        self.add_listing([("prefix", u"a")], ["apple", "avocado"])
+        self.add_listing([("prefix", u"b")], ["banana"])
+        eq_(self.keys(n_splits=2), ["apple", "avocado", "banana"])
+
+    def test_unordered(self):
+        self.add_listing([("prefix", u"a/")], ["a/1"])
+        self.add_listing([("prefix", u"b/")], ["b/1"])
+        eq_(sorted(self.keys(prefixes=["a/", "b/"], ordered=False)),
+            ["a/1", "b/1"])
+
 class ModifyBucketTests(S3BucketTestCase):
     def test_bucket_put(self):
         g.bucket.add_resp("/", g.H("application/xml"), "<ok />")
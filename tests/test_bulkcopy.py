@@ -0,0 +1,64 @@
+import unittest
+from nose.tools import eq_, assert_raises
+
+from tests import g
+from tests.test_bucket import listing_path
+from tests.test_sync import listing_xml
+
+class PrefixCopyTests(unittest.TestCase):
+    def setUp(self):
+        g.bucket.mock_reset()
+        g.bucket.add_resp(listing_path(("prefix", u"b/")),
+                          g.H("application/xml"),
+                          listing_xml([("b/2", "e2", 2), ("b/3", "x", 9)]))
+        g.bucket.add_resp(listing_path(("prefix", u"a/")),
+                          g.H("application/xml"),
+                          listing_xml([("a/1", "e1", 1), ("a/2", "e2", 2),
+                                       ("a/3", "e3", 3)]))
+        g.bucket.add_resp("/b/1", g.H("application/xml"), "<ok />")
+        g.bucket.add_resp("/b/3", g.H("application/xml"), "",
+                          status="412 Precondition Failed")
+
+    def tearDown(self):
+        eq_(g.bucket.mock_responses, [])
+
+    def test_copy_prefix(self):
+        rv = g.bucket.copy_prefix("a/", "b/", n_workers=1)
+        eq_((rv["copied"], rv["copied_bytes"], rv["skipped"],
+             rv["skipped_bytes"]), (1, 1, 1, 2))
+        eq_([(key, code) for (key, code, message) in rv["errors"]],
+            [("a/3", 412)])
+        req = g.bucket.mock_requests[2]
+        eq_(req.headers["X-amz-copy-source"], "johnsmith/a/1")
+        eq_(req.headers["X-amz-copy-source-if-match"], '"e1"')
+
+    def test_move_prefix(self):
+        g.bucket.add_resp("/?delete", g.H("application/xml"),
+                          '<DeleteResult xmlns="http://s3.amazonaws.com/doc/'
+                          '2006-03-01/"></DeleteResult>')
+        rv = g.bucket.move_prefix("a/", "b/", n_workers=1)
+        eq_(rv["deleted"], 2)
+        data = g.bucket.mock_requests[-1].get_data()
+        assert "<Key>a/1</Key>" in data and "<Key>a/2</Key>" in data
+        assert "<Key>a/3</Key>" not in data
+
+def test_move_prefix_other_etag():
+    g.bucket.mock_reset()
+    # Same size and time as the source, but not a copy of it.
+    g.bucket.add_resp(listing_path(("prefix", u"b/")), g.H("application/xml"),
+                      listing_xml([("b/1", "x", 1)]))
+    g.bucket.add_resp(listing_path(("prefix", u"a/")), g.H("application/xml"),
+                      listing_xml([("a/1", "e1", 1)]))
+    g.bucket.add_resp("/b/1", g.H("application/xml"), "<ok />")
+    g.bucket.add_resp("/?delete", g.H("application/xml"),
+                      '<DeleteResult xmlns="http://s3.amazonaws.com/doc/'
+                      '2006-03-01/"></DeleteResult>')
+    rv = g.bucket.move_prefix("a/", "b/", n_workers=1)
+    eq_((rv["copied"], rv["skipped"], rv["deleted"]), (1, 0, 1))
+    eq_(g.bucket.mock_requests[2].headers["X-amz-copy-source"],
+        "johnsmith/a/1")
+    eq_(g.bucket.mock_responses, [])
+
+def test_overlapping_prefixes():
+    assert_raises(ValueError, g.bucket.copy_prefix, "a/", "a/b/")
+    assert_raises(ValueError, g.bucket.copy_prefix, "a/", "")
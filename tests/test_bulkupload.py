@@ -0,0 +1,59 @@
+from __future__ import with_statement
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from nose.tools import eq_
+
+from simples3.utils import aws_md5
+from simples3.compression import gzip_transformer
+from tests import g
+
+class PutFilesTests(unittest.TestCase):
+    files = [("a.txt", "hello"), ("b.html", "<p>hi</p>"), ("empty", "")]
+
+    def setUp(self):
+        g.bucket.mock_reset()
+        self.tmpdir = tempfile.mkdtemp()
+        for name, data in self.files:
+            with open(os.path.join(self.tmpdir, name), "wb") as fp:
+                fp.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        eq_(g.bucket.mock_responses, [])
+
+    def test_put_files(self):
+        L = []
+        items = [(os.path.join(self.tmpdir, name), "up/" + name)
+                 for (name, data) in self.files]
+        items[0] += ({"acl": "public-read"},)
+        for name, data in self.files:
+            g.bucket.add_resp("/up/" + name, g.H("application/xml"), "")
+        rv = g.bucket.put_files(items, n_workers=1, n_hashers=1,
+                                progress=lambda *a: L.append(a))
+        eq_(rv, {"uploaded": 3, "uploaded_bytes": 14})
+        eq_(L, [(5, None, 5), (14, None, 9), (14, None, 0)])
+        reqs = g.bucket.mock_requests
+        for req, (name, data) in zip(reqs, self.files):
+            eq_(req.headers["Content-length"], str(len(data)))
+            eq_(req.headers["Content-md5"], aws_md5(data))
+        eq_(reqs[0].headers["X-amz-acl"], "public-read")
+        eq_(reqs[1].headers["Content-type"], "text/html")
+
+    def test_put_options(self):
+        path = os.path.join(self.tmpdir, "a.txt")
+        items = [(path, "up/a.txt", {"transformer": gzip_transformer,
+                                     "if_none_match": "*"})]
+        g.bucket.add_resp("/up/a.txt", g.H("application/xml"), "")
+        g.bucket.put_files(items, n_workers=1, n_hashers=1)
+        req, = g.bucket.mock_requests
+        data = req.get_data()
+        eq_(req.headers["Content-encoding"], "gzip")
+        eq_(req.headers["If-none-match"], "*")
+        eq_(req.headers["Content-length"], str(len(data)))
+        eq_(req.headers["Content-md5"], aws_md5(data))
+        eq_(gzip.GzipFile(fileobj=StringIO(data)).read(), "hello")
@@ -0,0 +1,106 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+from StringIO import StringIO
+from nose.tools import eq_, assert_raises
+
+import simples3
+from simples3.cache import DiskCache, CachingS3Bucket
+from tests import MockBucketMixin, H
+
+class CachingMockBucket(MockBucketMixin, CachingS3Bucket):
+    pass
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = DiskCache(self.path, max_size=10, max_entry_size=5)
+        self.bucket = CachingMockBucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url="http://johnsmith.s3.amazonaws.com",
+            cache=self.cache)
+
+    def tearDown(self):
+        eq_(self.bucket.mock_responses, [])
+        shutil.rmtree(self.path)
+
+    def add_obj(self, key, data, etag='"1"'):
+        self.bucket.add_resp("/" + key, H("text/plain", ("etag", etag),
+                             ("content-length", str(len(data)))), data)
+
+    def add_not_modified(self, key):
+        self.bucket.add_resp("/" + key, H("text/plain"), "",
+                             status="304 Not Modified")
+
+    def test_revalidated(self):
+        self.add_obj("foo", "abc")
+        eq_(self.bucket.get("foo").read(), "abc")
+        self.add_not_modified("foo")
+        fp = self.bucket.get("foo")
+        eq_(fp.read(), "abc")
+        eq_(fp.s3_info["size"], 3)
+        req = self.bucket.mock_requests[-1]
+        eq_(req.headers["If-none-match"], '"1"')
+
+    def test_changed(self):
+        self.add_obj("foo", "abc")
+        self.bucket.get("foo").close()
+        self.add_obj("foo", "xyz", etag='"2"')
+        eq_(self.bucket.get("foo").read(), "xyz")
+        eq_(self.cache.lookup(self.bucket._cache_key("foo")).etag, '"2"')
+
+    def test_info(self):
+        self.add_obj("foo", "abc")
+        self.bucket.get("foo").close()
+        self.add_not_modified("foo")
+        eq_(self.bucket.info("foo")["size"], 3)
+        eq_(self.bucket.mock_requests[-1].get_method(), "HEAD")
+
+    def test_negative(self):
+        self.bucket.add_resp("/nope", H("application/xml"), "",
+                             status="404 Not Found")
+        assert_raises(simples3.KeyNotFound, self.bucket.get, "nope")
+        # Second time around, no request is made.
+        assert_raises(simples3.KeyNotFound, self.bucket.get, "nope")
+        assert "nope" not in self.bucket
+        eq_(len(self.bucket.mock_requests), 1)
+
+    def test_store_failed(self):
+        # Headers that can't be pickled fail the store, leaving no files.
+        assert_raises(pickle.PicklingError, self.cache.store, "ckey",
+                      {"etag": '"1"', "bad": lambda: None}, StringIO("abc"))
+        eq_(os.listdir(self.path), [])
+        eq_(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.add_obj("a", "aaaa")
+        self.add_obj("b", "bbbb")
+        self.bucket.get("a").close()
+        self.bucket.get("b").close()
+        self.cache.lookup(self.bucket._cache_key("a"))
+        self.add_obj("c", "cccc")
+        self.bucket.get("c").close()
+        eq_(self.cache.size, 8)
+        eq_(self.cache.lookup(self.bucket._cache_key("b")), None)
+        # Entries survive a restart.
+        eq_(len(DiskCache(self.path, max_size=10)), 2)
+
+    def test_invalidated_by_put(self):
+        self.add_obj("foo", "abc")
+        self.bucket.get("foo").close()
+        self.bucket.add_resp("/foo", H("application/xml"), "")
+        self.bucket.put("foo", "new")
+        eq_(len(self.cache), 0)
+        self.add_obj("foo", "new", etag='"2"')
+        eq_(self.bucket.get("foo").read(), "new")
+        assert "If-none-match" not in self.bucket.mock_requests[-1].headers
+
+    def test_ranged_bypass(self):
+        self.add_obj("foo", "ab")
+        eq_(self.bucket.get("foo", headers={"Range": "bytes=0-1"}).read(), "ab")
+        eq_(len(self.cache), 0)
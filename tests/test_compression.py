@@ -0,0 +1,104 @@
+import os
+import gzip
+import zlib
+import unittest
+from StringIO import StringIO
+from nose.tools import eq_
+
+from simples3.compression import (CompressingReader, DecompressingReader,
+                                  gzip_transformer, deflate_transformer)
+from tests import g, H, MockHTTPResponse
+from tests.test_multipart import initiate_xml, complete_xml
+from tests.test_streaming import StreamingMockBucket
+
+text = "".join("line %d of a log file\n" % i for i in xrange(5000))
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO(str(data))).read()
+
+def test_compressing_reader():
+    reader = CompressingReader(StringIO(text))
+    reader.chunk_size = 1000
+    chunks = []
+    while True:
+        chunk = reader.read(100)
+        if not chunk:
+            break
+        assert len(chunk) <= 100
+        chunks.append(chunk)
+    eq_(gunzip("".join(chunks)), text)
+    reader = CompressingReader(StringIO(text), encoding="deflate")
+    eq_(zlib.decompress(reader.read()), text)
+
+def test_decompressing_reader():
+    reader = DecompressingReader(StringIO(gzip_transformer({}, text)))
+    reader.chunk_size = 100
+    eq_(reader.readline(), "line 0 of a log file\n")
+    eq_(reader.read(5), "line ")
+    eq_(list(reader)[-1], "line 4999 of a log file\n")
+    reader = DecompressingReader(StringIO(deflate_transformer({}, text)),
+                                 encoding="deflate")
+    eq_(reader.read(), text)
+
+class CompressionTests(unittest.TestCase):
+    def setUp(self):
+        g.bucket.mock_reset()
+
+    def tearDown(self):
+        eq_(g.bucket.mock_responses, [])
+
+    def test_put(self):
+        g.bucket.add_resp("/log.txt", H("application/xml"), "")
+        g.bucket.put("log.txt", text, transformer=gzip_transformer)
+        req = g.bucket.mock_requests[-1]
+        eq_(req.headers["Content-encoding"], "gzip")
+        eq_(int(req.headers["Content-length"]), len(req.get_data()))
+        eq_(gunzip(req.get_data()), text)
+
+    def test_get(self):
+        data = gzip_transformer({}, text)
+        for i in xrange(2):
+            # Binary, so not through add_resp.
+            g.bucket.add_resp_obj(MockHTTPResponse(StringIO(data),
+                H("text/plain", ("content-encoding", "gzip"),
+                  ("content-length", str(len(data)))),
+                g.bucket.base_url + "/log.txt"))
+        eq_(g.bucket.get("log.txt", decompress=True).read(), text)
+        fp = g.bucket.get("log.txt")
+        eq_(fp.read(), data)
+        eq_(fp.s3_info["size"], len(data))
+
+class StreamingCompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.bucket = StreamingMockBucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url="http://johnsmith.s3.amazonaws.com")
+
+    def tearDown(self):
+        eq_(self.bucket.mock_responses, [])
+
+    def test_put_file_small(self):
+        self.bucket.add_resp("/log.txt", H("application/xml"), "")
+        self.bucket.put_file("log.txt", StringIO(text),
+                             transformer=gzip_transformer)
+        req = self.bucket.mock_requests[-1]
+        eq_(req.headers["Content-encoding"], "gzip")
+        eq_(gunzip(req.get_data()), text)
+
+    def test_put_file_parts(self):
+        data = os.urandom(6 << 20)
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        for n in (1, 2):
+            self.bucket.add_resp("/big?partNumber=%d&uploadId=ID" % n,
+                                 H("text/plain", ("etag", '"etag%d"' % n)),
+                                 "")
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        self.bucket.put_file("big", StringIO(data), part_size=5 << 20,
+                             n_workers=1, transformer=gzip_transformer)
+        reqs = self.bucket.mock_requests
+        eq_(reqs[0].headers["Content-encoding"], "gzip")
+        eq_(len(reqs[1].get_data()), 5 << 20)
+        eq_(gunzip(reqs[1].get_data() + reqs[2].get_data()), data)
@@ -0,0 +1,59 @@
+import time
+from nose.tools import eq_, assert_raises
+
+from simples3.concurrency import imap, prefetch, chain_ahead, interleave
+
+def test_imap_ordered():
+    def f(x):
+        time.sleep((5 - x) * 0.001)
+        return x * 2
+    eq_(list(imap(f, xrange(5), n_workers=3)), [0, 2, 4, 6, 8])
+
+def test_imap_unordered():
+    eq_(sorted(imap(lambda x: x, xrange(20), ordered=False)), range(20))
+
+def test_imap_lazy():
+    taken = []
+    def items():
+        for i in xrange(100):
+            taken.append(i)
+            yield i
+    it = imap(lambda x: x, items(), n_workers=2, max_pending=4)
+    eq_(next(it), 0)
+    assert len(taken) <= 5, taken
+    it.close()
+
+def test_imap_error():
+    def f(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+    assert_raises(ValueError, list, imap(f, xrange(10)))
+
+def test_prefetch():
+    eq_(list(prefetch(iter("abc"), maxsize=2)), ["a", "b", "c"])
+
+def test_prefetch_error():
+    def gen():
+        yield 1
+        raise KeyError("x")
+    it = prefetch(gen())
+    eq_(next(it), 1)
+    assert_raises(KeyError, next, it)
+
+def test_chain_ahead():
+    started = []
+    def gen(n):
+        started.append(n)
+        for i in xrange(3):
+            yield (n, i)
+    its = (gen(n) for n in xrange(4))
+    rv = list(chain_ahead(its, n_ahead=2))
+    eq_(rv, [(n, i) for n in xrange(4) for i in xrange(3)])
+    eq_(sorted(started), range(4))
+
+def test_interleave():
+    its = [iter(range(n * 10, n * 10 + 5)) for n in xrange(5)]
+    rv = list(interleave(its, n_workers=3))
+    eq_(sorted(rv), sorted(sum((range(n * 10, n * 10 + 5)
+                                for n in xrange(5)), [])))
@@ -0,0 +1,56 @@
+from __future__ import with_statement
+
+import socket
+import urllib2
+import unittest
+from nose.tools import eq_
+
+from simples3.connpool import ConnectionPool, PooledHTTPHandler
+from tests import s3standin
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.server = s3standin.start()
+        for key in ("a", "b", "0", "1", "2", "3", "4"):
+            self.server.objects[key] = s3standin.StoredObject(
+                "hello from /" + key)
+        self.pool = ConnectionPool(maxsize=2)
+        self.opener = urllib2.build_opener(PooledHTTPHandler(self.pool))
+        self.url = self.server.url
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuse(self):
+        for i in range(5):
+            resp = self.opener.open(self.url + "/%d" % i)
+            eq_(resp.read(), "hello from /%d" % i)
+            resp.close()
+        eq_(len(self.server.peers), 1)
+        eq_(len(self.pool), 1)
+
+    def test_unread_not_reused(self):
+        resp = self.opener.open(self.url + "/a")
+        resp.close()
+        eq_(len(self.pool), 0)
+
+    def test_stale_reconnect(self):
+        self.opener.open(self.url + "/a").read()
+        (conns,) = self.pool._idle.values()
+        conns[0][0].sock.shutdown(socket.SHUT_RDWR)
+        eq_(self.opener.open(self.url + "/b").read(), "hello from /b")
+        eq_(len(self.server.peers), 2)
+
+    def test_maxsize(self):
+        resps = [self.opener.open(self.url + "/%d" % i) for i in range(4)]
+        for resp in resps:
+            resp.read()
+        eq_(len(self.pool), 2)
+
+    def test_idle_timeout(self):
+        self.pool.idle_timeout = -1
+        self.opener.open(self.url + "/a").read()
+        self.opener.open(self.url + "/b").read()
+        eq_(len(self.server.peers), 2)
@@ -0,0 +1,199 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from nose.tools import eq_, assert_raises
+
+import simples3
+from simples3.download import ResumableDownload
+from simples3.retry import RetryPolicy
+from tests import g
+
+class DownloadTests(unittest.TestCase):
+    data = "0123456789"
+
+    def setUp(self):
+        g.bucket.mock_reset()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "dest")
+        self.add_info()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        eq_(g.bucket.mock_responses, [])
+
+    def add_info(self):
+        g.bucket.add_resp("/foo", g.H("text/plain",
+                          ("content-length", str(len(self.data))),
+                          ("etag", '"abc"')), "")
+
+    def add_range(self, first, last, data=None, status="206 Partial Content",
+                  headers=()):
+        if data is None:
+            data = self.data[first:last + 1]
+        g.bucket.add_resp("/foo", g.H("text/plain", *headers), data,
+                          status=status)
+
+    def range_headers(self):
+        return [req.headers.get("Range")
+                for req in g.bucket.mock_requests[1:]]
+
+    def test_get_file(self):
+        L = []
+        for first in (0, 4, 8):
+            self.add_range(first, min(first + 3, 9))
+        g.bucket.get_file("foo", self.path, part_size=4, n_workers=1,
+                          progress=lambda *a: L.append(a))
+        eq_(open(self.path, "rb").read(), self.data)
+        eq_(self.range_headers(), ["bytes=0-3", "bytes=4-7", "bytes=8-9"])
+        eq_(g.bucket.mock_requests[1].headers["If-match"], '"abc"')
+        eq_(L[-1], (10, 10, 0))
+
+    def test_get_file_obj(self):
+        self.add_range(0, 4)
+        self.add_range(5, 9)
+        fp = StringIO()
+        g.bucket.get_file("foo", fp, part_size=5, n_workers=1)
+        eq_(fp.getvalue(), self.data)
+
+    def test_range_resumed(self):
+        self.add_range(0, 4, data="01")
+        self.add_range(2, 4)
+        self.add_range(5, 9)
+        g.bucket.get_file("foo", self.path, part_size=5, n_workers=1)
+        eq_(open(self.path, "rb").read(), self.data)
+        eq_(self.range_headers(), ["bytes=0-4", "bytes=2-4", "bytes=5-9"])
+
+    def test_not_decompressed(self):
+        # Ranges of a gzipped object are written as they are, not inflated.
+        self.add_range(0, 4, headers=[("content-encoding", "gzip")])
+        self.add_range(5, 9, headers=[("content-encoding", "gzip")])
+        g.bucket.decompress_responses = True
+        try:
+            g.bucket.get_file("foo", self.path, part_size=5, n_workers=1)
+        finally:
+            del g.bucket.decompress_responses
+        eq_(open(self.path, "rb").read(), self.data)
+
+    def test_range_error_not_retried(self):
+        # Errors getting a response are the bucket's retry policy's to retry.
+        self.add_range(0, 9, data="", status="503 Slow Down")
+        policy, g.bucket.retry_policy = (g.bucket.retry_policy,
+                                         RetryPolicy(max_attempts=1))
+        try:
+            assert_raises(simples3.S3Error, g.bucket.get_file, "foo",
+                          self.path, n_workers=1)
+        finally:
+            g.bucket.retry_policy = policy
+        eq_(len(g.bucket.mock_requests), 2)
+
+    def test_changed_object(self):
+        self.add_range(0, 9, data="", status="412 Precondition Failed")
+        assert_raises(simples3.S3Error, g.bucket.get_file, "foo", self.path,
+                      n_workers=1)
+
+class ResumeTests(unittest.TestCase):
+    data = "0123456789"
+    etag = '"781e5e245d69b566979b86e28d23f2c7"'
+
+    def setUp(self):
+        g.bucket.mock_reset()
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "dest")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        eq_(g.bucket.mock_responses, [])
+
+    def add_get(self, data=None, first=None, status="200 OK", length=None):
+        if data is None:
+            data = self.data if first is None else self.data[first:]
+        headers = [("etag", self.etag),
+                   ("content-length", str(length or len(data)))]
+        if first is not None:
+            headers.append(("content-range", "bytes %d-%d/%d" % (
+                first, first + len(data) - 1, len(self.data))))
+        g.bucket.add_resp("/foo", g.H("text/plain", *headers), data,
+                          status=status)
+
+    def leave_part(self, data, etag=None):
+        with open(self.path + ".part", "wb") as fp:
+            fp.write(data)
+        with open(self.path + ".part.etag", "wb") as fp:
+            fp.write(etag or self.etag)
+
+    def test_download(self):
+        L = []
+        self.add_get()
+        info = g.bucket.get_resumable("foo", self.path,
+                                      progress=lambda *a: L.append(a))
+        eq_(open(self.path, "rb").read(), self.data)
+        eq_(info["size"], 10)
+        eq_(L, [(10, 10, 10), (10, 10, 0)])
+        eq_(os.listdir(self.tmpdir), ["dest"])
+
+    def test_resume_dropped(self):
+        self.add_get(data="0123", length=10)
+        self.add_get(first=4, status="206 Partial Content")
+        g.bucket.get_resumable("foo", self.path)
+        eq_(open(self.path, "rb").read(), self.data)
+        req = g.bucket.mock_requests[1]
+        eq_(req.headers["Range"], "bytes=4-")
+        eq_(req.headers["If-match"], self.etag)
+
+    def test_resume_part(self):
+        self.leave_part("012345")
+        self.add_get(first=6, status="206 Partial Content")
+        g.bucket.get_resumable("foo", self.path)
+        eq_(open(self.path, "rb").read(), self.data)
+        eq_(g.bucket.mock_requests[0].headers["Range"], "bytes=6-")
+
+    def test_changed_object(self):
+        self.leave_part("abcdef", etag='"old"')
+        self.add_get(data="", status="412 Precondition Failed")
+        self.add_get()
+        g.bucket.get_resumable("foo", self.path)
+        eq_(open(self.path, "rb").read(), self.data)
+        assert "Range" not in g.bucket.mock_requests[1].headers
+
+    def test_resume_not_decompressed(self):
+        self.leave_part("012345")
+        g.bucket.add_resp("/foo", g.H("text/plain", ("etag", self.etag),
+                                      ("content-encoding", "gzip"),
+                                      ("content-range", "bytes 6-9/10")),
+                          "6789", status="206 Partial Content")
+        g.bucket.decompress_responses = True
+        try:
+            g.bucket.get_resumable("foo", self.path)
+        finally:
+            del g.bucket.decompress_responses
+        eq_(open(self.path, "rb").read(), self.data)
+
+    def test_changed_last_attempt(self):
+        self.leave_part("abcdef", etag='"old"')
+        self.add_get(data="", status="412 Precondition Failed")
+        download = ResumableDownload(g.bucket, "foo", self.path)
+        download.n_resumes = 0
+        assert_raises(simples3.PreconditionFailed, download)
+        eq_(os.listdir(self.tmpdir), [])
+
+    def test_error_not_resumed(self):
+        self.add_get(data="", status="503 Slow Down")
+        policy, g.bucket.retry_policy = (g.bucket.retry_policy,
+                                         RetryPolicy(max_attempts=1))
+        try:
+            assert_raises(simples3.S3Error, g.bucket.get_resumable, "foo",
+                          self.path)
+        finally:
+            g.bucket.retry_policy = policy
+        eq_(len(g.bucket.mock_requests), 1)
+
+    def test_checksum_mismatch(self):
+        self.leave_part("abcdef")
+        self.add_get(first=6, status="206 Partial Content")
+        assert_raises(simples3.S3Error, g.bucket.get_resumable, "foo",
+                      self.path)
+        eq_(os.listdir(self.tmpdir), [])
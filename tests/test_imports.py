@@ -0,0 +1,42 @@
+import os
+import sys
+import subprocess
+from nose.tools import eq_
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def loaded_by(code):
+    """Run *code* in a new interpreter, returning the modules it loaded."""
+    code = ("import sys\nbefore = set(sys.modules)\n%s\n"
+            "print ' '.join(m for m in set(sys.modules) - before\n"
+            "               if sys.modules[m])\n") % (code,)
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=root)
+    return set(out.split())
+
+heavy = set(["urllib2", "httplib", "socket", "email", "cgi", "mimetypes",
+             "xml.etree.cElementTree"])
+
+def test_import_is_light():
+    eq_(loaded_by("import simples3") & heavy, set())
+
+def test_make_url_authed_is_light():
+    loaded = loaded_by("import simples3\n"
+                       "bucket = simples3.S3Bucket('johnsmith', "
+                       "access_key='a', secret_key='s')\n"
+                       "bucket.make_url_authed('photos/puppy.jpg')")
+    eq_(loaded & heavy, set())
+
+def test_opener_loads_urllib2():
+    loaded = loaded_by("import simples3\n"
+                       "simples3.S3Bucket('johnsmith').opener")
+    assert "urllib2" in loaded and "simples3.opener" in loaded
+
+def test_moved_names():
+    loaded = loaded_by("import simples3.bucket")
+    assert "urllib2" not in loaded
+    loaded = loaded_by("from simples3.bucket import (AnyMethodRequest,\n"
+                       "    StreamHTTPHandler, StreamHTTPSHandler, S3Request)\n"
+                       "import urllib2\n"
+                       "assert issubclass(AnyMethodRequest, urllib2.Request)\n"
+                       "assert S3Request.urllib_request_cls is AnyMethodRequest")
+    assert "simples3.opener" in loaded
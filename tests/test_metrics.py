@@ -0,0 +1,82 @@
+import unittest
+from nose.tools import eq_
+
+from simples3.metrics import RequestHook, MetricsCollector
+from simples3.retry import RetryPolicy
+from tests import MockBucket, H
+
+class EventRecorder(RequestHook):
+    def __init__(self):
+        self.before = []
+        self.after = []
+
+    def before_request(self, event):
+        self.before.append(event)
+
+    def after_request(self, event):
+        self.after.append(event)
+
+class HookTests(unittest.TestCase):
+    def setUp(self):
+        self.bucket = MockBucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url="http://johnsmith.s3.amazonaws.com",
+            retry_policy=RetryPolicy(base_delay=0.0))
+        self.events = EventRecorder()
+        self.bucket.add_hook(self.events)
+
+    def tearDown(self):
+        eq_(self.bucket.mock_responses, [])
+
+    def test_get(self):
+        self.bucket.add_resp("/foo.txt", H("text/plain",
+                             ("content-length", "5")), "hello")
+        fp = self.bucket.get("foo.txt")
+        eq_(len(self.events.before), 1)
+        eq_(self.events.after, [])
+        eq_(fp.read(2), "he")
+        eq_(fp.read(), "llo")
+        event, = self.events.after
+        eq_((event.operation, event.key, event.status, event.attempt),
+            ("get", "foo.txt", 200, 0))
+        eq_(event.bytes_received, 5)
+        assert 0 <= event.ttfb <= event.latency
+        eq_(fp.s3_info["mimetype"], "text/plain")
+
+    def test_put_retried(self):
+        self.bucket.add_resp("/foo.txt", H("application/xml"), "",
+                             status="503 Slow Down")
+        self.bucket.add_resp("/foo.txt", H("application/xml"), "")
+        self.bucket.put("foo.txt", "hello")
+        eq_([(e.status, e.attempt, e.bytes_sent) for e in self.events.after],
+            [(503, 0, 5), (200, 1, 5)])
+
+    def test_removed(self):
+        self.bucket.remove_hook(self.events)
+        self.bucket.add_resp("/foo.txt", H("application/xml"), "")
+        self.bucket.put("foo.txt", "hello")
+        eq_(self.events.before, [])
+
+def test_prometheus():
+    bucket = MockBucket("johnsmith", access_key="a", secret_key="b",
+                        base_url="http://johnsmith.s3.amazonaws.com")
+    metrics = MetricsCollector(bounds=[1.0, 60.0])
+    bucket.add_hook(metrics)
+    bucket.add_resp("/foo.txt", H("text/plain"), "hi")
+    bucket.get("foo.txt").close()
+    bucket.add_resp("/nope", H("application/xml"), "", status="404 Not Found")
+    try:
+        bucket.get("nope")
+    except KeyError:
+        pass
+    text = metrics.prometheus()
+    lines = text.splitlines()
+    assert "# TYPE simples3_request_duration_seconds histogram" in lines
+    assert ('simples3_request_duration_seconds_bucket{operation="get",'
+            'le="+Inf"} 2') in lines
+    assert ('simples3_request_duration_seconds_count{operation="get"} 2'
+            in lines)
+    assert 'simples3_requests_total{operation="get",status="200"} 1' in lines
+    assert 'simples3_requests_total{operation="get",status="404"} 1' in lines
+    assert 'simples3_retries_total{operation="get"} 0' in lines
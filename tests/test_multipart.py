@@ -0,0 +1,195 @@
+from __future__ import with_statement
+
+import os
+import unittest
+from StringIO import StringIO
+from nose.tools import eq_, assert_raises
+
+import simples3
+from simples3 import multipart
+from simples3.retry import RetryPolicy
+from tests import H
+from tests.test_streaming import StreamingMockBucket
+
+initiate_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<InitiateMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+<Bucket>johnsmith</Bucket><Key>big</Key><UploadId>ID</UploadId>
+</InitiateMultipartUploadResult>"""
+
+complete_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CompleteMultipartUploadResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+<Key>big</Key><ETag>"abc-3"</ETag>
+</CompleteMultipartUploadResult>"""
+
+copy_part_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<CopyPartResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+<LastModified>2009-10-12T17:50:30.000Z</LastModified><ETag>"etag%d"</ETag>
+</CopyPartResult>"""
+
+def test_iter_parts():
+    parts = list(multipart.iter_parts(StringIO("abcdefg"), 3))
+    eq_(parts, [(1, "abc"), (2, "def"), (3, "g")])
+    eq_(list(multipart.iter_parts(StringIO("abcdef"), 3)),
+        [(1, "abc"), (2, "def")])
+    eq_(list(multipart.iter_parts(StringIO(""), 3)), [(1, "")])
+
+def test_iter_buffer_parts():
+    parts = multipart.iter_buffer_parts(bytearray("abcdefg"), 3)
+    eq_([(n, str(data)) for (n, data) in parts],
+        [(1, "abc"), (2, "def"), (3, "g")])
+    parts = multipart.iter_buffer_parts(memoryview("abcdef"), 3)
+    eq_([(n, data.tobytes()) for (n, data) in parts], [(1, "abc"), (2, "def")])
+    eq_([(n, str(data)) for (n, data) in
+         multipart.iter_buffer_parts(bytearray(), 3)], [(1, "")])
+
+class MultipartTests(unittest.TestCase):
+    def setUp(self):
+        self.bucket = StreamingMockBucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url="http://johnsmith.s3.amazonaws.com")
+        self.bucket.multipart_threshold = 1 << 20
+        self.data = "".join(chr(i % 256) * 1024 for i in xrange(11 << 10))
+
+    def tearDown(self):
+        eq_(self.bucket.mock_responses, [])
+
+    def add_part(self, n, status="200 OK"):
+        self.bucket.add_resp("/big?partNumber=%d&uploadId=ID" % n,
+                             H("text/plain", ("etag", '"etag%d"' % n)), "",
+                             status=status)
+
+    def test_put_file(self):
+        L = []
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        for n in (1, 2, 3):
+            self.add_part(n)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        self.bucket.put_file("big", StringIO(self.data), size=len(self.data),
+                             part_size=5 << 20, n_workers=1,
+                             progress=lambda *a: L.append(a))
+        reqs = self.bucket.mock_requests
+        eq_([req.get_method() for req in reqs], ["POST", "PUT", "PUT", "PUT",
+                                                "POST"])
+        eq_("".join(req.get_data() for req in reqs[1:4]), self.data)
+        eq_(reqs[1].headers["Content-md5"],
+            simples3.utils.aws_md5(self.data[:5 << 20]))
+        assert '<ETag>"etag3"</ETag>' in reqs[-1].get_data()
+        eq_(L[-1], (len(self.data), len(self.data), 0))
+
+    def test_part_retried(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        self.add_part(1)
+        self.add_part(2, status="503 Slow Down")
+        self.add_part(2)
+        self.add_part(3)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        self.bucket.put_file("big", StringIO(self.data), size=len(self.data),
+                             part_size=5 << 20, n_workers=1)
+        eq_(len(self.bucket.mock_requests), 6)
+
+    def test_part_retries_bounded(self):
+        # Parts get the bucket's retry policy, and no retries on top of it.
+        self.bucket.retry_policy = RetryPolicy(max_attempts=2, base_delay=0)
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        self.add_part(1, status="503 Slow Down")
+        self.add_part(1, status="503 Slow Down")
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"), "")
+        assert_raises(simples3.S3Error, self.bucket.put_file, "big",
+                      StringIO(self.data), size=len(self.data),
+                      part_size=5 << 20, n_workers=1)
+        eq_([req.get_method() for req in self.bucket.mock_requests],
+            ["POST", "PUT", "PUT", "DELETE"])
+
+    def test_aborted(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        self.add_part(1, status="403 Forbidden")
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"), "")
+        assert_raises(simples3.S3Error, self.bucket.put_file, "big",
+                      StringIO(self.data), size=len(self.data),
+                      part_size=5 << 20, n_workers=1)
+        eq_(self.bucket.mock_requests[-1].get_method(), "DELETE")
+
+    def test_put_buffer(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        for n in (1, 2, 3):
+            self.add_part(n)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        data = bytearray(self.data)
+        self.bucket.put_buffer("big", data, part_size=5 << 20, n_workers=1)
+        reqs = self.bucket.mock_requests
+        eq_("".join(str(req.get_data()) for req in reqs[1:4]), self.data)
+        assert all(isinstance(req.get_data(), buffer) for req in reqs[1:4])
+
+    def chunks(self, fail_at=None):
+        for offset in xrange(0, len(self.data), 1 << 20):
+            if offset == fail_at:
+                raise IOError("broken pipe")
+            yield self.data[offset:offset + (1 << 20)]
+
+    def test_put_stream(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        for n in (1, 2, 3):
+            self.add_part(n)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        self.bucket.put_stream("big", self.chunks(), part_size=5 << 20,
+                               n_workers=1, max_buffered=1)
+        reqs = self.bucket.mock_requests
+        eq_("".join(req.get_data() for req in reqs[1:4]), self.data)
+
+    def test_put_stream_short(self):
+        self.bucket.add_resp("/big", H("application/xml"), "")
+        self.bucket.put_stream("big", iter(["ab", "", "c"]))
+        eq_(self.bucket.mock_requests[0].get_data(), "abc")
+
+    def test_put_stream_aborted(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        self.add_part(1)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"), "")
+        assert_raises(IOError, self.bucket.put_stream, "big",
+                      self.chunks(fail_at=6 << 20), part_size=5 << 20,
+                      n_workers=1)
+        eq_(self.bucket.mock_requests[-1].get_method(), "DELETE")
+
+    def test_put_file_pipe(self):
+        rfd, wfd = os.pipe()
+        os.write(wfd, "hello")
+        os.close(wfd)
+        self.bucket.add_resp("/foo.txt", H("application/xml"), "")
+        with os.fdopen(rfd, "rb") as fp:
+            self.bucket.put_file("foo.txt", fp)
+        req = self.bucket.mock_requests[0]
+        eq_(req.get_data(), "hello")
+        eq_(req.headers["Content-length"], "5")
+
+    def test_copy_object(self):
+        self.bucket.add_resp("/big?uploads", H("application/xml"),
+                             initiate_xml)
+        for n in (1, 2):
+            self.bucket.add_resp("/big?partNumber=%d&uploadId=ID" % n,
+                                 H("application/xml"), copy_part_xml % n)
+        self.bucket.add_resp("/big?uploadId=ID", H("application/xml"),
+                             complete_xml)
+        etag = multipart.copy_object(self.bucket, "johnsmith/src", "big",
+                                     (6 << 20) + 1, part_size=1 << 20,
+                                     n_workers=1,
+                                     conditions={"if_match": '"abc"'})
+        eq_(etag, '"abc-3"')
+        reqs = self.bucket.mock_requests[1:3]
+        eq_([req.headers["X-amz-copy-source-range"] for req in reqs],
+            ["bytes=0-5242879", "bytes=5242880-6291456"])
+        eq_(reqs[0].headers["X-amz-copy-source"], "johnsmith/src")
+        eq_(reqs[0].headers["X-amz-copy-source-if-match"], '"abc"')
+        complete = self.bucket.mock_requests[-1]
+        assert '<ETag>"etag2"</ETag>' in complete.get_data()
@@ -0,0 +1,108 @@
+import socket
+import unittest
+from nose.tools import eq_, assert_raises
+
+import simples3
+from simples3.retry import RetryPolicy
+from tests import MockBucket, H
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_delay_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, random=lambda: 1.0)
+    eq_([policy.delay(n) for n in (1, 2, 3, 4)], [1.0, 2.0, 4.0, 5.0])
+    policy.random = lambda: 0.5
+    eq_(policy.delay(3), 2.0)
+
+def test_retryable():
+    policy = RetryPolicy()
+    assert policy.retryable(simples3.S3Error("x", code=503))
+    assert policy.retryable(simples3.S3Error("x"))
+    assert not policy.retryable(simples3.S3Error("x", code=403))
+    assert not policy.retryable(simples3.KeyNotFound("x", code=404))
+
+def test_max_attempts():
+    policy = RetryPolicy(max_attempts=3, random=lambda: 0.0)
+    state = policy.begin()
+    e = simples3.S3Error("x", code=500)
+    eq_([state.next_delay(e) for i in xrange(3)], [0.0, 0.0, None])
+
+def test_deadline():
+    clock = FakeClock()
+    policy = RetryPolicy(deadline=10.0, base_delay=4.0, random=lambda: 1.0,
+                         clock=clock)
+    state = policy.begin()
+    e = simples3.S3Error("x", code=503)
+    eq_(state.next_delay(e), 4.0)
+    clock.now = 4.0
+    # Waiting another 8 seconds would end after the deadline.
+    eq_(state.next_delay(e), None)
+
+def test_budget():
+    policy = RetryPolicy(budget_max=2.0, budget_ratio=0.5, random=lambda: 0.0)
+    e = simples3.S3Error("x", code=500)
+    state = policy.begin()
+    eq_(state.next_delay(e), 0.0)
+    eq_(state.next_delay(e), 0.0)
+    eq_(state.next_delay(e), None)
+    eq_(policy.begin().next_delay(e), None)
+    state = policy.begin()
+    eq_(state.next_delay(e), 0.0)
+
+def test_unknown_option():
+    assert_raises(TypeError, RetryPolicy, retries=3)
+
+class BrokenResponse(object):
+    """Stands in for a response, failing as a reset connection would."""
+
+    def geturl(self):
+        raise socket.error(104, "Connection reset by peer")
+
+class SendRetryTests(unittest.TestCase):
+    def setUp(self):
+        self.bucket = MockBucket("johnsmith",
+            access_key="0PN5J17HBGZHT7JJ3X82",
+            secret_key="uV3F3YluFJax1cknvbcGwgjvx4QpvB+leU8dUj2o",
+            base_url="http://johnsmith.s3.amazonaws.com",
+            retry_policy=RetryPolicy(base_delay=0.0))
+
+    def tearDown(self):
+        eq_(self.bucket.mock_responses, [])
+
+    def test_throttled(self):
+        self.bucket.add_resp("/foo.txt", H("application/xml"),
+                             "<Error><Message>Slow Down</Message></Error>",
+                             status="503 Slow Down")
+        self.bucket.add_resp("/foo.txt", H("text/plain"), "hi")
+        eq_(self.bucket.get("foo.txt").read(), "hi")
+        reqs = self.bucket.mock_requests
+        eq_(len(reqs), 2)
+        assert reqs[1].headers["Authorization"].startswith("AWS ")
+
+    def test_connection_reset(self):
+        self.bucket.mock_responses.append(BrokenResponse())
+        self.bucket.add_resp("/foo.txt", H("text/plain"), "hi")
+        eq_(self.bucket.get("foo.txt").read(), "hi")
+
+    def test_gives_up(self):
+        self.bucket.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.0)
+        for i in xrange(2):
+            self.bucket.add_resp("/foo.txt", H("application/xml"), "",
+                                 status="503 Slow Down")
+        try:
+            self.bucket.get("foo.txt")
+        except simples3.S3Error, e:
+            eq_(e.code, 503)
+        else:
+            assert False, "S3Error not raised"
+
+    def test_not_retried(self):
+        self.bucket.add_resp("/foo.txt", H("application/xml"), "",
+                             status="403 Forbidden")
+        assert_raises(simples3.S3Error, self.bucket.get, "foo.txt")
+        eq_(len(self.bucket.mock_requests), 1)
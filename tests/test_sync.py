@@ -0,0 +1,130 @@
+from __future__ import with_statement
+
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from nose.tools import eq_
+
+from simples3 import sync
+from simples3.sync import walk_files, plan_sync
+from tests import g
+from tests.test_bucket import listing_path
+
+def listing_xml(entries):
+    entry = ("<Contents><Key>%s</Key><LastModified>2009-10-12T17:50:30.000Z"
+             "</LastModified><ETag>&quot;%s&quot;</ETag><Size>%d</Size>"
+             "</Contents>")
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            '<IsTruncated>false</IsTruncated>%s</ListBucketResult>') % (
+        "".join(entry % e for e in entries))
+
+class SyncTests(unittest.TestCase):
+    def setUp(self):
+        g.bucket.mock_reset()
+        self.root = tempfile.mkdtemp()
+        self.write("a.txt", "hello", mtime=946684800)
+        self.write("b.txt", "bb")
+        self.write("b/c.txt", "new")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        eq_(g.bucket.mock_responses, [])
+
+    def write(self, name, data, mtime=None):
+        path = os.path.join(self.root, *name.split("/"))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as fp:
+            fp.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def add_listing(self):
+        md5 = hashlib.md5("hello").hexdigest()
+        g.bucket.add_resp(listing_path(("prefix", u"www/")),
+                          g.H("application/xml"),
+                          listing_xml([("www/a.txt", md5, 5),
+                                       ("www/b.txt", "x", 1),
+                                       ("www/old.txt", "y", 7)]))
+
+    def test_walk_files(self):
+        eq_([(key, size) for (key, path, size, mtime)
+             in walk_files(self.root)],
+            [("a.txt", 5), ("b.txt", 2), ("b/c.txt", 3)])
+
+    def test_plan(self):
+        self.add_listing()
+        plan = plan_sync(g.bucket, self.root, prefix="www", delete=True)
+        eq_([str(action) for action in plan],
+            ["skip www/a.txt (5 bytes)",
+             "upload www/b.txt (size, 2 bytes)",
+             "upload www/b/c.txt (new, 3 bytes)",
+             "delete www/old.txt (7 bytes)"])
+
+    def test_checksum(self):
+        self.write("a.txt", "hello")
+        self.add_listing()
+        plan = plan_sync(g.bucket, self.root, prefix="www/")
+        eq_([(action.action, action.reason) for action in plan],
+            [("upload", "changed"), ("upload", "size"), ("upload", "new")])
+        self.add_listing()
+        plan = plan_sync(g.bucket, self.root, prefix="www/", checksum=True)
+        eq_([(action.action, action.reason) for action in plan],
+            [("skip", None), ("upload", "size"), ("upload", "new")])
+
+    def test_sync_dir(self):
+        self.add_listing()
+        for key in ("www/b.txt", "www/b/c.txt"):
+            g.bucket.add_resp("/" + key, g.H("application/xml"), "")
+        g.bucket.add_resp("/?delete", g.H("application/xml"),
+                          '<DeleteResult xmlns="http://s3.amazonaws.com/doc/'
+                          '2006-03-01/"></DeleteResult>')
+        rv = g.bucket.sync_dir(self.root, prefix="www/", delete=True,
+                               n_workers=1)
+        eq_(rv, {"uploaded": 2, "uploaded_bytes": 5, "skipped": 1,
+                 "skipped_bytes": 5, "deleted": 1, "deleted_bytes": 7,
+                 "errors": []})
+        puts = g.bucket.mock_requests[1:3]
+        eq_([(req.get_selector(), req.headers["Content-length"])
+             for req in puts], [("/www/b.txt", "2"), ("/www/b/c.txt", "3")])
+        assert "<Key>www/old.txt</Key>" in g.bucket.mock_requests[3].get_data()
+
+    def test_deletes_streamed(self):
+        md5 = hashlib.md5("hello").hexdigest()
+        g.bucket.add_resp(listing_path(("prefix", u"www/")),
+                          g.H("application/xml"),
+                          listing_xml([("www/0.txt", "y", 3),
+                                       ("www/a.txt", md5, 5),
+                                       ("www/z.txt", "y", 4)]))
+        result = ('<DeleteResult xmlns="http://s3.amazonaws.com/doc/'
+                  '2006-03-01/">%s</DeleteResult>')
+        g.bucket.add_resp("/?delete", g.H("application/xml"), result % "")
+        for key in ("www/b.txt", "www/b/c.txt"):
+            g.bucket.add_resp("/" + key, g.H("application/xml"), "")
+        g.bucket.add_resp("/?delete", g.H("application/xml"), result % (
+            "<Error><Key>www/z.txt</Key><Code>AccessDenied</Code>"
+            "<Message>Access Denied</Message></Error>"))
+        sync.delete_batch_size = 1
+        try:
+            rv = g.bucket.sync_dir(self.root, prefix="www/", delete=True,
+                                   n_workers=1)
+        finally:
+            sync.delete_batch_size = 1000
+        eq_((rv["deleted"], rv["deleted_bytes"]), (1, 3))
+        eq_(rv["errors"], [(u"www/z.txt", "AccessDenied", "Access Denied")])
+        # The first deletion goes out before the walk reaches the uploads.
+        eq_([req.get_method() for req in g.bucket.mock_requests],
+            ["GET", "POST", "PUT", "PUT", "POST"])
+        assert "<Key>www/0.txt</Key>" in g.bucket.mock_requests[1].get_data()
+
+    def test_dry_run(self):
+        self.add_listing()
+        actions = []
+        rv = g.bucket.sync_dir(self.root, prefix="www/", delete=True,
+                               dry_run=True, report=actions.append)
+        eq_(len(actions), 4)
+        eq_((rv["uploaded"], rv["deleted"]), (2, 1))
+        eq_(len(g.bucket.mock_requests), 1)
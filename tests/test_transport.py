@@ -0,0 +1,164 @@
+from __future__ import with_statement
+
+import os
+import socket
+import urllib2
+import unittest
+from nose.tools import eq_, assert_raises
+
+import simples3
+from simples3.retry import RetryPolicy
+from simples3.opener import Urllib2Transport
+from simples3.transport import HTTPTransport, Headers, Response
+from tests import MockBucket, s3standin
+
+class HTTPTransportTests(unittest.TestCase):
+    def setUp(self):
+        self.server = s3standin.start()
+        self.server.requests = []
+        self.bucket = simples3.S3Bucket("johnsmith", access_key="key",
+                                        secret_key="secret",
+                                        base_url=self.server.url)
+
+    def tearDown(self):
+        self.bucket.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_default(self):
+        assert isinstance(self.bucket.transport, HTTPTransport)
+
+    def test_put_get(self):
+        self.bucket.put("a b.txt", "hello", metadata={"x": "y"})
+        method, path, headers = self.server.requests[-1]
+        eq_((method, path), ("PUT", "/a%20b.txt"))
+        eq_(headers["x-amz-meta-x"], "y")
+        assert headers["authorization"].startswith("AWS key:")
+        resp = self.bucket.get("a b.txt")
+        assert isinstance(resp, Response)
+        eq_(resp.status, 200)
+        eq_(resp.headers["content-type"], "text/plain")
+        # Names are looked up whatever their case, as in urllib2 responses.
+        eq_(resp.info()["Content-Type"], "text/plain")
+        etag = self.server.objects["a b.txt"].etag
+        eq_(resp.info().getheader("ETag"), etag)
+        assert "Content-Length" in resp.headers
+        eq_(resp.s3_info["size"], 5)
+        eq_(resp.read(), "hello")
+        resp.close()
+        eq_(self.bucket.info("a b.txt")["headers"]["etag"], etag)
+        eq_(len(self.server.peers), 1)
+
+    def test_not_found(self):
+        try:
+            self.bucket.get("nope")
+        except simples3.KeyNotFound, e:
+            eq_(e.code, 404)
+            eq_(e.msg, "The specified key does not exist.")
+        else:
+            assert False, "KeyNotFound not raised"
+        # The error body was read, so the connection is reused.
+        self.server.objects["a"] = s3standin.StoredObject("x")
+        eq_(self.bucket.get("a").read(), "x")
+        eq_(len(self.server.peers), 1)
+
+    def test_not_modified(self):
+        obj = self.server.objects["a"] = s3standin.StoredObject("abc")
+        try:
+            self.bucket.get("a", if_none_match=obj.etag)
+        except simples3.NotModified, e:
+            eq_(e.info["headers"]["etag"], obj.etag)
+        else:
+            assert False, "NotModified not raised"
+        eq_(self.bucket.get("a", if_none_match='"2"').read(), "abc")
+
+    def test_delete(self):
+        self.server.objects["a"] = s3standin.StoredObject("x")
+        eq_(self.bucket.delete("a"), True)
+        eq_(self.server.objects, {})
+        self.server.faults["a"] = lambda h: h.error(
+            404, "NoSuchKey", "The specified key does not exist.")
+        eq_(self.bucket.delete("a"), False)
+
+    def test_error(self):
+        self.server.faults["forbidden"] = lambda h: h.error(
+            403, "AccessDenied", "Access Denied")
+        try:
+            self.bucket.get("forbidden")
+        except simples3.S3Error, e:
+            eq_(e.code, 403)
+            eq_(e.msg, "Access Denied")
+            eq_(e.headers["content-type"], "application/xml")
+        else:
+            assert False, "S3Error not raised"
+        # The error body was read, so the connection is reused.
+        eq_(len(self.bucket.transport.pool), 1)
+
+    def test_precondition_failed(self):
+        self.bucket.put("a", "x", if_none_match="*")
+        assert_raises(simples3.PreconditionFailed, self.bucket.put, "a", "y",
+                      if_none_match="*")
+        eq_(self.server.objects["a"].data, "x")
+
+    def test_connection_error(self):
+        self.server.shutdown()
+        self.server.server_close()
+        bucket = simples3.S3Bucket("johnsmith", access_key="key",
+                                   secret_key="secret",
+                                   base_url=self.server.url,
+                                   retry_policy=RetryPolicy(max_attempts=1))
+        try:
+            bucket.get("a")
+        except simples3.S3Error, e:
+            eq_(e.code, None)
+            eq_(e.msg, "connection error")
+        else:
+            assert False, "S3Error not raised"
+
+    def test_stale_reconnect(self):
+        self.server.objects["a"] = s3standin.StoredObject("x")
+        self.bucket.get("a").read()
+        (conns,) = self.bucket.transport.pool._idle.values()
+        conns[0][0].sock.shutdown(socket.SHUT_RDWR)
+        eq_(self.bucket.get("a").read(), "x")
+        eq_(len(self.server.peers), 2)
+
+    def test_urllib2(self):
+        self.bucket.transport = Urllib2Transport()
+        self.server.objects["a"] = s3standin.StoredObject("x")
+        eq_(self.bucket.get("a").read(), "x")
+        assert_raises(simples3.KeyNotFound, self.bucket.get, "nope")
+
+def test_opener_transport():
+    bucket = MockBucket("johnsmith")
+    assert isinstance(bucket.transport, Urllib2Transport)
+    bucket = simples3.S3Bucket("johnsmith")
+    bucket.opener = urllib2.build_opener()
+    eq_(bucket.transport.opener, bucket.opener)
+
+def test_proxy_transport():
+    saved = dict(os.environ)
+    try:
+        for name in ("http_proxy", "HTTP_PROXY", "no_proxy", "NO_PROXY"):
+            os.environ.pop(name, None)
+        os.environ["http_proxy"] = "http://proxy.example.com:3128"
+        bucket = simples3.S3Bucket("johnsmith")
+        assert isinstance(bucket.transport, Urllib2Transport)
+        bucket = simples3.S3Bucket("johnsmith", secure=True)
+        assert isinstance(bucket.transport, HTTPTransport)
+        os.environ["no_proxy"] = "s3.amazonaws.com"
+        bucket = simples3.S3Bucket("johnsmith")
+        assert isinstance(bucket.transport, HTTPTransport)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+def test_headers():
+    headers = Headers([("Content-Type", "text/plain")])
+    eq_(dict(headers), {"content-type": "text/plain"})
+    eq_(headers["CONTENT-TYPE"], "text/plain")
+    eq_(headers.getheader("content-type"), "text/plain")
+    eq_(headers.get("x-nope", "default"), "default")
+    headers["X-Amz-Meta-A"] = "b"
+    eq_(headers.copy()["x-amz-meta-a"], "b")
+    assert isinstance(headers.copy(), Headers)
@@ -1,3 +1,4 @@
+import time
 import unittest
 from tests import g
 from nose.tools import eq_
@@ -23,3 +24,50 @@ class URLGenerationTests(unittest.TestCase):
                              expire=1175139620))
         eq_(g.bucket.make_url("photos/puppy.jpg"),
             g.bucket.url_for("photos/puppy.jpg"))
+
+    def test_signer_follows_credentials(self):
+        signer = g.bucket.signer
+        assert g.bucket.signer is signer
+        url = g.bucket.make_url_authed("photos/puppy.jpg", expire=1175139620)
+        secret_key = g.bucket.secret_key
+        g.bucket.secret_key = "other"
+        try:
+            assert g.bucket.signer is not signer
+            assert url != g.bucket.make_url_authed("photos/puppy.jpg",
+                                                   expire=1175139620)
+        finally:
+            g.bucket.secret_key = secret_key
+
+class PresignerTests(unittest.TestCase):
+    def signed_url(self, key, expires):
+        """Make the URL by signing an `S3Request`, as S3 checks it."""
+        s3req = g.bucket.request(key=key, headers={"Date": str(expires)})
+        sign = s3req.sign(g.bucket)
+        s3req.args = (("AWSAccessKeyId", g.bucket.access_key),
+                      ("Expires", str(expires)), ("Signature", sign))
+        return s3req.url(g.bucket.base_url, arg_sep="&")
+
+    def test_matches_signed_request(self):
+        presigner = g.bucket.presigner()
+        for key in ("photos/puppy dog.jpg", "a+b=c&d", u"caf\xe9/~x"):
+            url = self.signed_url(key, 1175139620)
+            eq_(presigner.url(key, expires=1175139620), url)
+            eq_(g.bucket.make_url_authed(key, expire=1175139620), url)
+
+    def test_expiry_rounded(self):
+        urls = g.bucket.make_urls_authed(["a", "b"], expire=3600,
+                                         granularity=600)
+        expires = int(urls[0].split("Expires=")[1].split("&")[0])
+        eq_(expires % 600, 0)
+        assert 3600 <= expires - time.time() <= 4200
+        eq_(urls, [g.bucket.make_url_authed(key, expire=expires)
+                   for key in ("a", "b")])
+
+    def test_cache(self):
+        presigner = g.bucket.presigner(cache_size=2)
+        urls = presigner.urls(["a", "b"])
+        eq_(presigner.cache, dict(zip(["a", "b"], urls)))
+        eq_(presigner.urls(["b", "c"]), [urls[1], presigner.url("c")])
+        eq_(len(presigner.cache), 1)
+        presigner.cache["c"] = "cached"
+        eq_(presigner.urls(["c"]), ["cached"])